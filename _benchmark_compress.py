@@ -0,0 +1,60 @@
+# 对比不同数据块大小下分块并行lzma压缩与解压缩的吞吐量，用于选择 compress.default_lzma_block_size
+import lzma
+import os
+import sys
+import time
+
+from compress import (compress_in_memory_with_lzma,
+                      decompress_in_memory_with_lzma)
+from util import human_readable_size
+
+benchmark_block_sizes = [
+    256 * 1024,
+    1024 * 1024,
+    4 * 1024 * 1024,
+    16 * 1024 * 1024,
+]
+
+
+def load_benchmark_data(filepath: str = "", size: int = 64 * 1024 * 1024) -> bytes:
+    if filepath != "":
+        with open(filepath, "rb") as f:
+            return f.read()
+
+    # 未指定文件时，使用部分可压缩的数据来模拟发布包中的各类文件
+    chunk = os.urandom(64 * 1024) + "DNF蚊子腿小助手".encode() * 16 * 1024
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def throughput(size: int, seconds: float) -> str:
+    return f"{human_readable_size(size / max(seconds, 1e-9))}/s"
+
+
+def benchmark(data: bytes):
+    print(f"测试数据大小为 {human_readable_size(len(data))}，cpu数目为 {os.cpu_count()}")
+
+    start_time = time.time()
+    compressed = lzma.compress(data)
+    used_seconds = time.time() - start_time
+    print(f"{'单线程lzma':>16}: 压缩后 {human_readable_size(len(compressed)):>10} 压缩 {throughput(len(data), used_seconds):>12}")
+
+    for block_size in benchmark_block_sizes:
+        start_time = time.time()
+        compressed = compress_in_memory_with_lzma(data, block_size)
+        compress_seconds = time.time() - start_time
+
+        start_time = time.time()
+        decompressed = decompress_in_memory_with_lzma(compressed)
+        decompress_seconds = time.time() - start_time
+
+        assert decompressed == data
+
+        print(
+            f"{'块大小 ' + human_readable_size(block_size):>16}: 压缩后 {human_readable_size(len(compressed)):>10}"
+            f" 压缩 {throughput(len(data), compress_seconds):>12}"
+            f" 解压 {throughput(len(data), decompress_seconds):>12}"
+        )
+
+
+if __name__ == '__main__':
+    benchmark(load_benchmark_data(sys.argv[1] if len(sys.argv) >= 2 else ""))
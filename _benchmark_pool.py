@@ -0,0 +1,79 @@
+# 对比不同进程创建方式下，进程池中各个进程从创建到就绪的用时，以及各进程的内存占用（rss为常驻内存，uss为该进程独占、未与其他进程共享的内存）
+# 示例：python _benchmark_pool.py --workers 4 --methods fork spawn forkserver
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from typing import List
+
+import psutil
+
+import main_def  # noqa: F401 与 main.py 一样，在主进程中导入各个模块，使得各个创建方式的子进程需要准备的内容与实际运行时一致
+from game_info import get_game_info
+from log import color, logger
+from pool import get_pool_context, on_worker_ready
+from setting import dnf_server_id_to_name, zzconfig
+from util import human_readable_size
+
+
+def touch_readonly_data(_) -> int:
+    # 模拟各个进程实际运行时会用到的只读数据
+    zzconfig()
+    dnf_server_id_to_name("11")
+    get_game_info("地下城与勇士")
+
+    return os.getpid()
+
+
+def benchmark(method: str, workers: int):
+    if method == "forkserver":
+        ctx = get_pool_context(use_forkserver=True)
+    else:
+        ctx = multiprocessing.get_context(method)
+
+    ready_queue = ctx.Queue()
+    start_time = time.time()
+    pool = ctx.Pool(workers, initializer=on_worker_ready, initargs=(ready_queue, start_time))
+    try:
+        ready_seconds = []  # type: List[float]
+        for _ in range(workers):
+            try:
+                ready_seconds.append(ready_queue.get(timeout=120))
+            except queue.Empty:
+                break
+        all_ready_seconds = time.time() - start_time
+
+        pool.map(touch_readonly_data, range(workers * 4))
+
+        rss_list, uss_list = [], []
+        for process in pool._pool:
+            memory_info = psutil.Process(process.pid).memory_full_info()
+            rss_list.append(memory_info.rss)
+            uss_list.append(memory_info.uss)
+    finally:
+        pool.close()
+        pool.join()
+
+    hrs = human_readable_size
+    logger.info(
+        color("bold_green") + f"{method:>10}: 全部就绪 {all_ready_seconds:.2f} 秒，单个进程就绪 平均 {sum(ready_seconds) / max(len(ready_seconds), 1):.2f} 秒 最长 {max(ready_seconds, default=0):.2f} 秒，"
+                              f"单个进程内存 rss {hrs(sum(rss_list) / len(rss_list))} uss {hrs(sum(uss_list) / len(uss_list))}"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--methods", nargs="+", default=multiprocessing.get_all_start_methods(), help="默认对比当前系统支持的所有创建方式，其中第一个为当前系统默认使用的方式")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    logger.info(f"主进程 rss {human_readable_size(psutil.Process().memory_info().rss)}，当前系统默认的创建方式为 {multiprocessing.get_start_method()}")
+    for method in args.methods:
+        benchmark(method, args.workers)
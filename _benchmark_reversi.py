@@ -0,0 +1,129 @@
+# 统计黑白棋引擎在随机中局局面上的叶节点评估速度、落子速度以及搜索速度，用于对比引擎改动前后的性能
+import random
+import sys
+import time
+from typing import List
+
+from reversi_engine import (Engine, Position, SearchSettings, evaluate,
+                            iter_bits, random_holes, stable_mask, weight_sum)
+
+
+def random_midgame_positions(count: int, seed: int = 2021) -> List[Position]:
+    rand = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial(random_holes(5, rand))
+        for _ in range(rand.randint(15, 35)):
+            moves = position.moves()
+            if moves == 0:
+                break
+            position.make(rand.choice(list(iter_bits(moves))))
+
+        if position.moves() != 0:
+            positions.append(position)
+
+    return positions
+
+
+def random_endgame_positions(count: int, empties: int, seed: int = 2021) -> List[Position]:
+    rand = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = Position.initial(random_holes(5, rand))
+        while position.empty_count() > empties and not position.is_game_over():
+            moves = position.moves()
+            if moves == 0:
+                position.make_pass()
+                continue
+            position.make(rand.choice(list(iter_bits(moves))))
+
+        if position.empty_count() == empties and position.moves() != 0:
+            positions.append(position)
+
+    return positions
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / max(seconds, 1e-9):,.0f}/s"
+
+
+def benchmark_evaluate(positions: List[Position], rounds: int):
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for position in positions:
+            evaluate(position)
+    used_seconds = time.perf_counter() - start_time
+    print(f"{'叶节点评估':>12}: {rate(rounds * len(positions), used_seconds):>14}")
+
+    # 对照：每次评估都重新计算位置权重，而不使用增量维护的结果
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for position in positions:
+            weight_sum(position.player, position.opponent)
+    used_seconds = time.perf_counter() - start_time
+    print(f"{'(重算位置权重)':>12}: {rate(rounds * len(positions), used_seconds):>14}")
+
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for position in positions:
+            stable_mask(position.empty())
+    used_seconds = time.perf_counter() - start_time
+    print(f"{'(稳定子)':>12}: {rate(rounds * len(positions), used_seconds):>14}")
+
+
+def benchmark_make_unmake(positions: List[Position], rounds: int):
+    count = 0
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for position in positions:
+            for move in iter_bits(position.moves()):
+                flips = position.make(move)
+                position.unmake(move, flips)
+                count += 1
+    used_seconds = time.perf_counter() - start_time
+    print(f"{'落子+撤销':>12}: {rate(count, used_seconds):>14}")
+
+
+def benchmark_search(positions: List[Position], max_depth: int):
+    settings = SearchSettings()
+    settings.max_depth = max_depth
+    settings.max_seconds = 3600
+
+    nodes = 0
+    start_time = time.perf_counter()
+    for position in positions:
+        nodes += Engine(settings).search(position).nodes
+    used_seconds = time.perf_counter() - start_time
+    print(f"{f'{max_depth}层搜索':>12}: {rate(nodes, used_seconds):>14} 节点，平均每步 {used_seconds / len(positions):.2f} 秒")
+
+
+def benchmark_endgame(count: int, empties_list: List[int]):
+    settings = SearchSettings()
+    settings.endgame_empties = 64
+    settings.endgame_time_ratio = 1
+    settings.max_seconds = 3600
+
+    for empties in empties_list:
+        positions = random_endgame_positions(count, empties)
+
+        nodes = 0
+        max_seconds = 0.0
+        start_time = time.perf_counter()
+        for position in positions:
+            result = Engine(settings).search(position)
+            assert result.exact
+
+            nodes += result.nodes
+            max_seconds = max(max_seconds, result.seconds)
+        used_seconds = time.perf_counter() - start_time
+        print(f"{f'{empties}空位残局求解':>12}: {rate(len(positions), used_seconds):>14} 局面，{rate(nodes, used_seconds)} 节点，最长 {max_seconds:.2f} 秒")
+
+
+if __name__ == '__main__':
+    search_depth = int(sys.argv[1]) if len(sys.argv) >= 2 else 5
+
+    positions = random_midgame_positions(200)
+    benchmark_evaluate(positions, 50)
+    benchmark_make_unmake(positions, 20)
+    benchmark_search(positions[:10], search_depth)
+    benchmark_endgame(10, [8, 10, 12])
@@ -0,0 +1,120 @@
+# 通过引擎自我对弈为指定的棋盘布局生成开局库，生成的结果会与已有的开局库合并
+# 前 full_width_plies 步会展开双方所有的落子，之后双方都只沿着引擎选出的最佳落子继续，直到第 book_plies 步
+# 示例：python _build_reversi_opening_book.py --layouts "a1 b3 c6 f2 h8" --max_depth 9
+import argparse
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from log import color, logger
+from reversi_engine import (ParallelEngine, Position, SearchSettings,
+                            iter_bits, random_holes, row_col_to_bit)
+from reversi_opening_book import (OpeningBook, canonical_key,
+                                  default_opening_book_path, format_holes,
+                                  from_canonical_move, parse_holes,
+                                  to_canonical_move, write_opening_book)
+
+
+def build_for_layout(engine: ParallelEngine, holes: int, entries: Dict[int, int], full_width_plies: int, book_plies: int) -> int:
+    """
+    返回本次新搜索的局面数目
+    """
+    searched = 0
+    visited = set()
+
+    queue = deque()  # type: Deque[Tuple[Position, int]]
+    queue.append((Position.initial(holes), 0))
+    while queue:
+        position, ply = queue.popleft()
+        if ply >= book_plies or position.is_game_over():
+            continue
+
+        if position.moves() == 0:
+            # 轮空不需要做选择，直接跳过
+            position.make_pass()
+            queue.append((position, ply))
+            continue
+
+        key, symmetry = canonical_key(position)
+        if key in visited:
+            continue
+        visited.add(key)
+
+        if key not in entries:
+            result = engine.search(position)
+            row, col = result.move
+            entries[key] = to_canonical_move(row_col_to_bit(row, col), symmetry)
+            searched += 1
+
+            logger.info(f"第{ply + 1}步 已搜索{searched}个局面，待处理{len(queue)}个 落子={result.move} 层数={result.depth} 耗时={result.seconds:.1f}秒")
+
+        if ply < full_width_plies:
+            next_moves = list(iter_bits(position.moves()))
+        else:
+            next_moves = [from_canonical_move(entries[key], symmetry)]
+
+        for move in next_moves:
+            child = position.copy()
+            child.make(move)
+            queue.append((child, ply + 1))
+
+    return searched
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--layouts", nargs="*", default=[], help="棋盘布局，格式与游戏中输入无效格子时相同，如 \"a1 b1 c1 d1 e1\"，为空字符串时表示没有无效格子")
+    parser.add_argument("--random_layouts", type=int, default=0, help="额外随机生成的布局数目")
+    parser.add_argument("--hole_count", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--full_width_plies", type=int, default=4, help="前多少步展开双方所有落子")
+    parser.add_argument("--book_plies", type=int, default=10, help="开局库最多覆盖到第几步")
+    parser.add_argument("--max_depth", type=int, default=9)
+    parser.add_argument("--max_seconds", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=0, help="并行搜索额外使用的进程数")
+    parser.add_argument("--output", default=default_opening_book_path)
+    args = parser.parse_args()
+
+    return args
+
+
+def main():
+    args = parse_args()
+
+    layouts = [parse_holes(layout) for layout in args.layouts]  # type: List[int]
+    rand = random.Random(args.seed)
+    for _ in range(args.random_layouts):
+        layouts.append(random_holes(args.hole_count, rand))
+    if len(layouts) == 0:
+        layouts.append(0)
+
+    entries = {}  # type: Dict[int, int]
+    existing_book = OpeningBook.load_if_exists(args.output)
+    if existing_book is not None:
+        entries = existing_book.entries()
+        existing_book.close()
+
+    settings = SearchSettings()
+    settings.max_depth = args.max_depth
+    settings.max_seconds = args.max_seconds
+    settings.parallel_workers = args.workers
+    engine = ParallelEngine(settings)
+
+    start_time = time.time()
+    try:
+        for idx, holes in enumerate(layouts):
+            logger.info(color("bold_yellow") + f"[{idx + 1}/{len(layouts)}] 开始为布局 [{format_holes(holes)}] 生成开局库")
+            searched = build_for_layout(engine, holes, entries, args.full_width_plies, args.book_plies)
+
+            # 每完成一个布局就保存一次，避免中途中断时丢失结果
+            write_opening_book(args.output, entries)
+            logger.info(color("bold_green") + f"布局 [{format_holes(holes)}] 新增{searched}个局面，开局库共{len(entries)}个局面")
+    finally:
+        engine.close()
+
+    logger.info(f"开局库已保存到 {args.output}，共耗时{time.time() - start_time:.1f}秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# 构建基于文件清单的更新所需的内容：文件清单，以及由各文件单独压缩后的数据块拼接而成的若干个数据包
+# 自动更新工具会对比文件清单与本地文件，然后仅通过Range请求从数据包中下载有变化的文件的数据块
+import glob
+import hashlib
+import json
+import lzma
+import os
+from typing import List, Set, Tuple
+
+from _create_patches import extracted_release_cache_dir
+from compress import compress_file_with_lzma
+from log import color, logger
+from util import MiB, human_readable_size
+from version import now_version
+
+# 蓝奏云单个文件上限为100MB，超过时会被拆分为多个分卷上传，而分卷无法直接通过Range请求读取，因此数据包需要控制在该大小以内
+max_blob_pack_size = 95 * MiB
+
+
+def get_manifest_filename(version: str) -> str:
+    return f"DNF蚊子腿小助手_文件清单_v{version}.json"
+
+
+def get_blob_pack_filename(version: str, index: int) -> str:
+    # 各数据块都是独立的xz流，拼接后仍是合法的xz文件，因此沿用 .7z 后缀，与其他lzma压缩文件保持一致
+    return f"DNF蚊子腿小助手_文件数据包_v{version}_{index + 1}.7z"
+
+
+def create_manifest(dir_all_release: str, release_dir_name: str, version: str = now_version) -> Tuple[str, List[str]]:
+    """
+    为发布目录中的每个文件单独压缩，并按顺序写入数据包（超出大小上限时另起一个数据包），同时生成记录各文件路径、大小、md5及其所在数据包和位置的文件清单
+    返回压缩后的文件清单路径与各个数据包的路径
+    """
+    dir_release = os.path.realpath(os.path.join(dir_all_release, release_dir_name))
+    manifest_path = os.path.realpath(os.path.join(dir_all_release, get_manifest_filename(version)))
+
+    logger.info(color("bold_yellow") + f"开始为 {dir_release} 构建文件清单和数据包")
+
+    files = []
+    blob_pack_paths = []  # type: List[str]
+    blob_pack = None
+    offset = 0
+    total_size = 0
+    try:
+        for relpath in list_release_files(dir_release):
+            with open(os.path.join(dir_release, relpath), "rb") as f:
+                data = f.read()
+            blob = lzma.compress(data)
+            if len(blob) > max_blob_pack_size:
+                raise Exception(f"{relpath} 压缩后大小为 {human_readable_size(len(blob))}，超出了单个数据包的上限 {human_readable_size(max_blob_pack_size)}")
+
+            if blob_pack is None or offset + len(blob) > max_blob_pack_size:
+                if blob_pack is not None:
+                    blob_pack.close()
+                blob_pack_paths.append(os.path.realpath(os.path.join(dir_all_release, get_blob_pack_filename(version, len(blob_pack_paths)))))
+                blob_pack = open(blob_pack_paths[-1], "wb")
+                offset = 0
+
+            blob_pack.write(blob)
+
+            files.append({
+                "path": relpath,
+                "size": len(data),
+                "md5": hashlib.md5(data).hexdigest(),
+                "pack": len(blob_pack_paths) - 1,
+                "offset": offset,
+                "compressed_size": len(blob),
+            })
+            offset += len(blob)
+            total_size += len(blob)
+    finally:
+        if blob_pack is not None:
+            blob_pack.close()
+
+    deleted_files = get_deleted_files(dir_all_release, release_dir_name, {file["path"] for file in files})
+
+    manifest = {
+        "version": version,
+        "blob_packs": [os.path.basename(path) for path in blob_pack_paths],
+        "files": files,
+        "deleted_files": deleted_files,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    compressed_manifest_path = manifest_path + ".7z"
+    compress_file_with_lzma(manifest_path, compressed_manifest_path)
+    os.remove(manifest_path)
+
+    logger.info(f"文件清单共记录 {len(files)} 个文件，{len(deleted_files)} 个需要删除的文件，数据包共 {len(blob_pack_paths)} 个，总大小为 {human_readable_size(total_size)}")
+
+    return compressed_manifest_path, blob_pack_paths
+
+
+def list_release_files(dir_release: str) -> List[str]:
+    relpaths = []
+    for dirpath, dirnames, filenames in os.walk(dir_release):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            relpaths.append(os.path.relpath(os.path.join(dirpath, filename), dir_release).replace(os.sep, "/"))
+
+    return relpaths
+
+
+def get_deleted_files(dir_all_release: str, release_dir_name: str, current_files: Set[str]) -> List[str]:
+    """
+    对比本地已有的旧版本发布目录（制作增量补丁时会准备好最近的几个版本），找出在旧版本中存在、但在当前版本中已被移除的文件，自动更新时将删除这些文件
+    """
+    release_dir_pattern = "DNF蚊子腿小助手_v*_by风之凌殇"
+    old_release_dirs = [
+        *glob.glob(os.path.join(dir_all_release, release_dir_pattern)),
+        # 本地没有对应发布目录时，旧版本会被解压到缓存目录中
+        *glob.glob(os.path.join(dir_all_release, extracted_release_cache_dir, "*", release_dir_pattern)),
+    ]
+
+    deleted_files = set()  # type: Set[str]
+    for old_release_dir in old_release_dirs:
+        if not os.path.isdir(old_release_dir) or os.path.basename(old_release_dir) == release_dir_name:
+            continue
+
+        deleted_files.update(relpath for relpath in list_release_files(old_release_dir) if relpath not in current_files)
+
+    return sorted(deleted_files)
+
+
+if __name__ == '__main__':
+    create_manifest(os.path.realpath("releases"), f"DNF蚊子腿小助手_v{now_version}_by风之凌殇")
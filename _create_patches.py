@@ -10,15 +10,20 @@ import multiprocessing
 import os
 import shutil
 import subprocess
-from typing import List
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Tuple
 
 from compress import compress_dir_with_bandizip, decompress_dir_with_bandizip
 from log import color, logger
 from update import version_less
 from upload_lanzouyun import FileInFolder, Uploader
-from util import human_readable_size, range_from_one
+from util import human_readable_size, md5_file
 from version import now_version
 
+# 历史版本解压后的缓存目录，按压缩包的md5区分
+extracted_release_cache_dir = ".extracted_release_cache"
+
 
 class HistoryVersionFileInfo:
     def __init__(self, fileinfo: FileInFolder, version: str):
@@ -54,9 +59,8 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
         old_version_infos.append(HistoryVersionFileInfo(netdisk_latest_version_fileinfo, netdisk_latest_version))
 
     # 从历史版本网盘中查找旧版本
-    for page in range_from_one(100):
-        folder_info = uploader.get_folder_info_by_url(uploader.folder_history_files.url, get_this_page=page)
-        for file in folder_info.files:
+    for files in uploader.iter_folder_pages(uploader.folder_history_files, 100):
+        for file in files:
             filename = file.name  # type: str
 
             if not filename.startswith(uploader.history_version_prefix):
@@ -98,21 +102,8 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
 
     # 确保版本都在本地
     logger.info(f"确保以上版本均已下载并解压到本地~")
-    for info in old_version_infos:
-        local_folder_path = os.path.join(dir_all_release, f"DNF蚊子腿小助手_v{info.version}_by风之凌殇")
-        local_7z_path = local_folder_path + ".7z"
-
-        if os.path.isdir(local_folder_path):
-            # 本地已存在对应版本，跳过
-            continue
-
-        logger.info(f"本地发布目录不存在 {local_folder_path}")
-        if not os.path.isfile(local_7z_path):
-            logger.info(f"本地不存在{info.fileinfo.name}的7z文件，将从网盘下载")
-            uploader.download_file(info.fileinfo, dir_all_release)
-
-        logger.info(f"尝试解压 {info.fileinfo.name} 到 {local_folder_path}")
-        decompress_dir_with_bandizip(local_7z_path, dir_src)
+    with ThreadPoolExecutor(len(old_version_infos)) as pool:
+        version_dirs = list(pool.map(lambda info: prepare_version_dir(uploader, info, dir_src, dir_all_release), old_version_infos))
 
     # --------------------------- 实际只做补丁包 ---------------------------
     logger.info(color("bold_yellow") + f"将为【{old_version_infos}】版本制作补丁包")
@@ -122,43 +113,29 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
     shutil.rmtree(temp_dir, ignore_errors=True)
     os.mkdir(temp_dir)
 
-    def temp_path(dir_name):
-        return os.path.realpath(os.path.join(temp_dir, dir_name))
-
-    def preprocess_before_patch(temp_version_path):
-        for filename in ["config.toml", "utils/auto_updater.exe"]:
-            filepath = os.path.join(temp_version_path, filename)
-            if os.path.isfile(filepath):
-                os.remove(filepath)
-
     # 为旧版本创建patch文件
     target_version_dir = f"DNF蚊子腿小助手_v{latest_version}_by风之凌殇"
     logger.info(f"目标版本目录为{target_version_dir}")
-    shutil.copytree(target_version_dir, temp_path(target_version_dir))
-    preprocess_before_patch(temp_path(target_version_dir))
+    temp_target_version_dir = temp_path(temp_dir, target_version_dir)
+    shutil.copytree(target_version_dir, temp_target_version_dir)
+    preprocess_before_patch(temp_target_version_dir)
 
-    for idx, version_info in enumerate(old_version_infos):
-        version = version_info.version
-        patch_file = f"{patches_dir}/{version}.patch"
+    # 各个补丁并行制作，并平分cpu给各个hdiffz进程
+    hdiffz_path = os.path.realpath(os.path.join(dir_src, "utils/hdiffz.exe"))
+    hdiffz_threads = max(1, multiprocessing.cpu_count() // len(old_version_infos))
+    with ProcessPoolExecutor(len(old_version_infos)) as pool:
+        futures = []
+        for idx, (version_info, version_dir) in enumerate(zip(old_version_infos, version_dirs)):
+            patch_file = os.path.realpath(f"{patches_dir}/{version_info.version}.patch")
 
-        logger.info("-" * 80)
-        logger.info(color("bold_yellow") + f"[{idx + 1}/{len(old_version_infos)}] 创建从v{version}升级到v{latest_version}的补丁{patch_file}")
+            logger.info(color("bold_yellow") + f"[{idx + 1}/{len(old_version_infos)}] 创建从v{version_info.version}升级到v{latest_version}的补丁{patch_file}")
+            futures.append(pool.submit(make_version_patch, hdiffz_path, hdiffz_threads, version_dir, temp_path(temp_dir, os.path.basename(version_dir)), temp_target_version_dir, patch_file))
 
-        version_dir = f"DNF蚊子腿小助手_v{version}_by风之凌殇"
+        patch_timings = [future.result() for future in futures]
 
-        shutil.copytree(version_dir, temp_path(version_dir))
-        preprocess_before_patch(temp_path(version_dir))
-
-        subprocess.call([
-            os.path.realpath(os.path.join(dir_src, "utils/hdiffz.exe")),
-            f"-p-{multiprocessing.cpu_count()}",  # 设置系统最大cpu数
-            os.path.realpath(os.path.join(temp_dir, version_dir)),
-            os.path.realpath(os.path.join(temp_dir, target_version_dir)),
-            patch_file,
-        ])
-
-        filesize = os.path.getsize(patch_file)
-        logger.info(f"创建补丁{patch_file}结束，最终大小为{human_readable_size(filesize)}")
+    logger.info("-" * 80)
+    for version_info, (patch_file, used_seconds) in zip(old_version_infos, patch_timings):
+        logger.info(f"v{version_info.version} 的补丁 {patch_file} 大小为{human_readable_size(os.path.getsize(patch_file))}，耗时{used_seconds:.1f}秒")
 
     # 移除临时目录
     shutil.rmtree(temp_dir, ignore_errors=True)
@@ -174,6 +151,73 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
     return patch_7z_file
 
 
+def temp_path(temp_dir, dir_name):
+    return os.path.realpath(os.path.join(temp_dir, dir_name))
+
+
+def preprocess_before_patch(temp_version_path):
+    for filename in ["config.toml", "utils/auto_updater.exe"]:
+        filepath = os.path.join(temp_version_path, filename)
+        if os.path.isfile(filepath):
+            os.remove(filepath)
+
+
+def prepare_version_dir(uploader: Uploader, info: HistoryVersionFileInfo, dir_src, dir_all_release) -> str:
+    """
+    确保对应版本已下载并解压，返回解压后的目录
+    解压结果会按压缩包的md5缓存起来，同一个压缩包在之后的发布中无需再次解压
+    """
+    release_dir_name = f"DNF蚊子腿小助手_v{info.version}_by风之凌殇"
+    local_folder_path = os.path.join(dir_all_release, release_dir_name)
+    local_7z_path = local_folder_path + ".7z"
+
+    if os.path.isdir(local_folder_path):
+        # 本地已存在对应版本，直接使用
+        return local_folder_path
+
+    logger.info(f"本地发布目录不存在 {local_folder_path}")
+    if not os.path.isfile(local_7z_path):
+        logger.info(f"本地不存在{info.fileinfo.name}的7z文件，将从网盘下载")
+        uploader.download_file(info.fileinfo, dir_all_release, show_log=False)
+
+    cache_dir = os.path.join(dir_all_release, extracted_release_cache_dir, md5_file(local_7z_path))
+    cached_folder_path = os.path.join(cache_dir, release_dir_name)
+    if os.path.isdir(cached_folder_path):
+        logger.info(f"{info.fileinfo.name} 已解压过，直接使用缓存 {cached_folder_path}")
+        return cached_folder_path
+
+    start_time = time.time()
+    logger.info(f"尝试解压 {info.fileinfo.name} 到 {cache_dir}")
+    # 先解压到临时目录，完成后再改名，避免解压中断时留下不完整的缓存
+    temp_cache_dir = cache_dir + ".extracting"
+    shutil.rmtree(temp_cache_dir, ignore_errors=True)
+    decompress_dir_with_bandizip(local_7z_path, dir_src, temp_cache_dir)
+    os.replace(temp_cache_dir, cache_dir)
+    logger.info(f"解压 {info.fileinfo.name} 耗时{time.time() - start_time:.1f}秒")
+
+    return cached_folder_path
+
+
+def make_version_patch(hdiffz_path, hdiffz_threads, version_dir, temp_version_dir, temp_target_version_dir, patch_file) -> Tuple[str, float]:
+    """
+    在子进程中制作从 version_dir 到 temp_target_version_dir 的补丁，返回补丁路径和耗时
+    """
+    start_time = time.time()
+
+    shutil.copytree(version_dir, temp_version_dir)
+    preprocess_before_patch(temp_version_dir)
+
+    subprocess.call([
+        hdiffz_path,
+        f"-p-{hdiffz_threads}",
+        temp_version_dir,
+        temp_target_version_dir,
+        patch_file,
+    ])
+
+    return patch_file, time.time() - start_time
+
+
 if __name__ == '__main__':
     dir_src = os.path.realpath('.')
     dir_all_release = os.path.realpath(os.path.join("releases"))
@@ -0,0 +1,81 @@
+# 统计导入指定模块时各个模块的导入耗时，按照累计耗时与自身耗时分别排序后输出报告，用于找出拖慢启动速度（包括进程池中各个进程的启动速度）的模块
+# 示例：python _profile_import_time.py --module main_def --top 30
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List
+
+from log import color, logger
+
+
+class ImportTimeRecord:
+    def __init__(self, name: str, self_us: int, cumulative_us: int, depth: int):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.depth = depth
+
+
+def profile_import_time(module: str) -> List[ImportTimeRecord]:
+    """
+    在新的进程中通过 python -X importtime 导入指定模块，并解析其输出
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=os.path.dirname(os.path.realpath(__file__)),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, encoding="utf-8", errors="replace")
+    if res.returncode != 0:
+        raise Exception(f"导入 {module} 失败，输出如下：\n{res.stderr}")
+
+    records = []
+    for line in res.stderr.splitlines():
+        # 格式为 import time:      self [us] | cumulative | imported package
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        if match is None:
+            continue
+
+        self_us, cumulative_us, indent, name = match.groups()
+        records.append(ImportTimeRecord(name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    return records
+
+
+def make_report(module: str, records: List[ImportTimeRecord], top: int) -> str:
+    total_us = sum(record.self_us for record in records)
+
+    lines = [f"导入 {module} 共涉及 {len(records)} 个模块，总耗时 {total_us / 1000:.1f} 毫秒", ""]
+
+    def _append_table(title: str, sorted_records: List[ImportTimeRecord]):
+        lines.append(title)
+        lines.append(f"{'累计(ms)':>10} {'自身(ms)':>10} {'占比':>7}  模块")
+        for record in sorted_records[:top]:
+            lines.append(f"{record.cumulative_us / 1000:>10.1f} {record.self_us / 1000:>10.1f} {record.cumulative_us / max(total_us, 1):>7.1%}  {'  ' * record.depth}{record.name}")
+        lines.append("")
+
+    _append_table("按累计耗时排序（包含其导入的子模块）", sorted(records, key=lambda record: record.cumulative_us, reverse=True))
+    _append_table("按自身耗时排序", sorted(records, key=lambda record: record.self_us, reverse=True))
+
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main_def", help="要统计的模块，进程池中的进程启动时需要导入的即为 main 所依赖的各个模块")
+    parser.add_argument("--top", type=int, default=30, help="每个排序中展示的模块数目")
+    parser.add_argument("--output", default="import_time_report.txt")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    records = profile_import_time(args.module)
+    report = make_report(args.module, records, args.top)
+
+    logger.info(color("bold_green") + "\n" + report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(report)
+    logger.info(f"报告已保存到 {os.path.realpath(args.output)}")
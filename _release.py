@@ -7,6 +7,7 @@ from sys import exit
 from _build import build
 from _clear_github_artifact import clear_github_artifact
 from _commit_new_version import commit_new_version
+from _create_manifest import create_manifest
 from _create_patches import create_patch
 from _package import package
 from _push_github import push_github
@@ -72,6 +73,11 @@ def release():
     os.chdir(dir_all_release)
     patch_file_name = create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, dir_github_action_artifact, get_final_patch_path_only=True)
 
+    # ---------------构建文件清单和数据包，供无法使用补丁的旧版本按文件更新
+    os.chdir(dir_all_release)
+    show_head_line(f"开始构建文件清单和数据包", color("bold_yellow"))
+    manifest_file_name, blob_pack_file_names = create_manifest(dir_all_release, release_dir_name, version[1:])
+
     # ---------------标记新版本
     show_head_line(f"提交版本和版本变更说明，并同步到docs目录，用于生成github pages", color("bold_yellow"))
     os.chdir(dir_src)
@@ -102,6 +108,11 @@ def release():
                 (path_in_src("付费指引/付费指引.docx"), ""),
                 (path_in_src("utils/不要下载增量更新文件_这个是给自动更新工具使用的.txt"), ""),
                 (realpath(patch_file_name), uploader.history_patches_prefix),
+                # 逆序上传，确保数据包先于文件清单上传，避免自动更新工具拿到新清单时数据包尚未上传
+                (manifest_file_name, uploader.history_manifest_prefix),
+                # 第一个数据包最先上传，由它将旧版本的各个数据包移到历史目录，之后的数据包仅移走同名文件，避免把本次已上传的数据包也移走
+                *[(blob_pack_file_name, uploader.history_blob_pack_prefix if idx == 0 else "")
+                  for idx, blob_pack_file_name in reversed(list(enumerate(blob_pack_file_names)))],
             ]),
             (uploader.folder_dnf_calc, [
                 (realpath(release_7z_name), uploader.history_version_prefix),
@@ -0,0 +1,227 @@
+# 无界面地让两组黑白棋AI配置多次对局，统计胜率、平均决策时间、每秒搜索节点数和搜索层数，并输出json报告，用于调整参数以及对比引擎改动前后的速度与棋力
+# 示例：python _reversi_tournament.py --games 20 --config_a max_depth=7 --config_b max_depth=5,enable_presearch=false
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool, cpu_count
+from typing import Any, Dict, List, Tuple
+
+from log import color, logger
+from reversi_engine import (Engine, Position, SearchSettings, cell_blue,
+                            cell_red, random_holes, row_col_to_bit)
+
+config_names = ["a", "b"]
+
+
+def parse_settings(text: str) -> SearchSettings:
+    """
+    解析形如 max_depth=5,enable_presearch=false 的配置，未指定的字段使用 SearchSettings 的默认值
+    """
+    settings = SearchSettings()
+    # 对局本身已经在进程池中并行进行，单局内不再使用多进程
+    settings.parallel_workers = 0
+    # 对局进程较多时，缩小置换表以控制内存占用
+    settings.tt_size_bits = 18
+
+    for item in text.split(","):
+        item = item.strip()
+        if item == "":
+            continue
+
+        key, value = item.split("=", 1)
+        key, value = key.strip(), value.strip()
+        if not hasattr(settings, key):
+            raise ValueError(f"未知的配置项 {key}，可选项为 {', '.join(vars(settings).keys())}")
+
+        default_value = getattr(settings, key)
+        if isinstance(default_value, bool):
+            setattr(settings, key, value.lower() in ["1", "true", "yes", "on"])
+        else:
+            setattr(settings, key, type(default_value)(value))
+
+    return settings
+
+
+def new_side_stat() -> Dict[str, Any]:
+    return {
+        "moves": 0,
+        "searched_moves": 0,
+        "seconds": 0.0,
+        "max_seconds": 0.0,
+        "nodes": 0,
+        "depth": 0,
+        "exact": 0,
+    }
+
+
+def play_game(game_index: int, settings_a: SearchSettings, settings_b: SearchSettings, holes: int, a_is_blue: bool) -> Dict[str, Any]:
+    color_to_config = {
+        cell_blue: "a" if a_is_blue else "b",
+        cell_red: "b" if a_is_blue else "a",
+    }
+    engines = {
+        "a": Engine(settings_a),
+        "b": Engine(settings_b),
+    }
+    stats = {name: new_side_stat() for name in config_names}
+
+    position = Position.initial(holes)
+    while not position.is_game_over():
+        if position.moves() == 0:
+            position.make_pass()
+            continue
+
+        name = color_to_config[position.color]
+        result = engines[name].search(position)
+
+        stat = stats[name]
+        stat["moves"] += 1
+        stat["seconds"] += result.seconds
+        stat["max_seconds"] = max(stat["max_seconds"], result.seconds)
+        stat["nodes"] += result.nodes
+        if result.exact:
+            stat["exact"] += 1
+        elif result.nodes > 0:
+            # 只有一个可选落子时不会搜索，残局求解的层数则为剩余空位数，均不计入平均搜索层数
+            stat["searched_moves"] += 1
+            stat["depth"] += result.depth
+
+        row, col = result.move
+        position.make(row_col_to_bit(row, col))
+
+    blue = position.disc_count(cell_blue)
+    red = position.disc_count(cell_red)
+    # 与 reversi.py 一致，平局时视为红方胜
+    winner_color = cell_blue if blue > red else cell_red
+
+    return {
+        "game_index": game_index,
+        "holes": f"{holes:016x}",
+        "blue": color_to_config[cell_blue],
+        "red": color_to_config[cell_red],
+        "blue_discs": blue,
+        "red_discs": red,
+        "winner": color_to_config[winner_color],
+        "stats": stats,
+    }
+
+
+def play_game_task(args: Tuple[int, SearchSettings, SearchSettings, int, bool]) -> Dict[str, Any]:
+    return play_game(*args)
+
+
+def make_tasks(games: int, settings_a: SearchSettings, settings_b: SearchSettings, hole_count: int, seed: int) -> List[Tuple[int, SearchSettings, SearchSettings, int, bool]]:
+    rand = random.Random(seed)
+
+    tasks = []
+    holes = 0
+    for game_index in range(games):
+        # 每两局使用相同的洞，并交换双方的颜色，以消除先后手和棋盘布局带来的偏差
+        if game_index % 2 == 0:
+            holes = random_holes(hole_count, rand)
+        tasks.append((game_index, settings_a, settings_b, holes, game_index % 2 == 0))
+
+    return tasks
+
+
+def summarize(config_name: str, settings: SearchSettings, games: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total = new_side_stat()
+    wins = 0
+    wins_as_blue = 0
+    games_as_blue = 0
+    for game in games:
+        for key, value in game["stats"][config_name].items():
+            if key == "max_seconds":
+                total[key] = max(total[key], value)
+            else:
+                total[key] += value
+
+        if game["blue"] == config_name:
+            games_as_blue += 1
+        if game["winner"] == config_name:
+            wins += 1
+            if game["blue"] == config_name:
+                wins_as_blue += 1
+
+    return {
+        "settings": vars(settings),
+        "wins": wins,
+        "win_rate": wins / max(len(games), 1),
+        "win_rate_as_blue": wins_as_blue / max(games_as_blue, 1),
+        "win_rate_as_red": (wins - wins_as_blue) / max(len(games) - games_as_blue, 1),
+        "avg_decision_seconds": total["seconds"] / max(total["moves"], 1),
+        "max_decision_seconds": total["max_seconds"],
+        "nodes_per_second": total["nodes"] / max(total["seconds"], 1e-9),
+        "avg_depth": total["depth"] / max(total["searched_moves"], 1),
+        "exact_moves": total["exact"],
+        "moves": total["moves"],
+    }
+
+
+def run_tournament(games: int, settings_a: SearchSettings, settings_b: SearchSettings, hole_count: int = 5, seed: int = 0, workers: int = 0) -> Dict[str, Any]:
+    if workers <= 0:
+        workers = cpu_count()
+
+    tasks = make_tasks(games, settings_a, settings_b, hole_count, seed)
+    logger.info(color("bold_yellow") + f"开始进行{games}局对局，使用{workers}个进程")
+
+    start_time = time.time()
+    results = []
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(play_game_task, tasks):
+            results.append(result)
+            logger.info(
+                f"[{len(results)}/{games}] 第{result['game_index'] + 1}局 蓝方={result['blue']} 红方={result['red']} "
+                f"比分 {result['blue_discs']}:{result['red_discs']} 胜方为 {result['winner']}"
+            )
+    results.sort(key=lambda v: v["game_index"])
+
+    return {
+        "games": games,
+        "hole_count": hole_count,
+        "seed": seed,
+        "workers": workers,
+        "seconds": time.time() - start_time,
+        "configs": {
+            "a": summarize("a", settings_a, results),
+            "b": summarize("b", settings_b, results),
+        },
+        "results": results,
+    }
+
+
+def show_report(report: Dict[str, Any]):
+    logger.info(color("bold_yellow") + f"共{report['games']}局，耗时{report['seconds']:.1f}秒")
+    for name, summary in report["configs"].items():
+        logger.info(
+            color("bold_green") + f"配置{name}: 胜率 {summary['win_rate']:.1%}（蓝方 {summary['win_rate_as_blue']:.1%} 红方 {summary['win_rate_as_red']:.1%}）"
+            f" 平均决策 {summary['avg_decision_seconds']:.2f}秒（最长 {summary['max_decision_seconds']:.2f}秒）"
+            f" 每秒节点 {summary['nodes_per_second']:.0f} 平均层数 {summary['avg_depth']:.2f} 残局求解 {summary['exact_moves']}步"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20, help="对局数，建议为偶数，每两局交换双方颜色")
+    parser.add_argument("--config_a", default="", help="形如 max_depth=5,enable_presearch=false，未指定的字段使用默认值")
+    parser.add_argument("--config_b", default="")
+    parser.add_argument("--holes", type=int, default=5, help="每局随机生成的洞的数目")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="进程数，默认为cpu数目")
+    parser.add_argument("--output", default="reversi_tournament_report.json")
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    report = run_tournament(args.games, parse_settings(args.config_a), parse_settings(args.config_b), args.holes, args.seed, args.workers)
+    show_report(report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"报告已保存到 {os.path.realpath(args.output)}")
@@ -9,19 +9,31 @@ logger.removeHandler(fileHandler)
 logger.addHandler(new_file_handler())
 
 import argparse
+import hashlib
+import json
+import lzma
 import os
 import subprocess
 from distutils import dir_util
+from typing import Dict, List
 
-from compress import decompress_dir_with_bandizip
+from compress import decompress_dir_with_bandizip, decompress_file_with_lzma
 from update import need_update
 from upload_lanzouyun import Uploader
-from util import (bypass_proxy, change_title, exists_flag_file, kill_process,
-                  show_unexpected_exception_message, start_djc_helper)
+from util import (bypass_proxy, change_title, exists_flag_file,
+                  human_readable_size, kill_process, make_sure_dir_exists,
+                  md5_file, show_unexpected_exception_message,
+                  start_djc_helper)
 
 bandizip_executable_path = "./utils/bandizip_portable/bz.exe"
 tmp_dir = "_update_temp_dir"
 
+# 更新时不覆盖的文件
+files_not_to_update = ["config.toml", "utils/auto_updater.exe"]
+
+# 基于文件清单更新时，若两个需要下载的数据块之间的间隔小于该值，则合并为一个请求
+max_blob_gap_to_merge = 256 * 1024
+
 # note: 作为cwd的默认值，用于检测是否直接双击自动更新工具
 invalid_cwd = "./invalid_cwd"
 
@@ -93,6 +105,18 @@ def update(args, uploader):
     except Exception as e:
         logger.exception("增量更新失败，尝试默认的全量更新方案", exc_info=e)
 
+    try:
+        # 补丁不适用于当前版本时，尝试根据文件清单仅下载有变化的文件
+        logger.info(color("bold_yellow") + "尝试根据文件清单进行更新")
+        update_ok = manifest_update(args, uploader)
+        if update_ok:
+            logger.info("根据文件清单更新完毕")
+            return
+        else:
+            logger.warning("根据文件清单更新失败，尝试默认的全量更新方案")
+    except Exception as e:
+        logger.exception("根据文件清单更新失败，尝试默认的全量更新方案", exc_info=e)
+
     # 保底使用全量更新
     logger.info(color("bold_yellow") + "尝试全量更新")
     full_update(args, uploader)
@@ -111,7 +135,7 @@ def full_update(args, uploader):
 
     target_dir = filepath.replace('.7z', '')
     logger.info("预处理解压缩文件：移除部分文件")
-    for file in ["config.toml", "utils/auto_updater.exe"]:
+    for file in files_not_to_update:
         file_to_remove = os.path.realpath(os.path.join(target_dir, file))
         try:
             logger.info(f"移除 {file_to_remove}")
@@ -162,6 +186,146 @@ def incremental_update(args, uploader):
     return True
 
 
+def manifest_update(args, uploader) -> bool:
+    remove_temp_dir("更新前，先移除临时目录，避免更新失败时这个目录会越来越大")
+
+    logger.info("开始下载最新版本的文件清单")
+    compressed_manifest_path = uploader.download_latest_manifest(tmp_dir)
+    manifest_path = compressed_manifest_path.replace(".7z", "")
+    decompress_file_with_lzma(compressed_manifest_path, manifest_path)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    files_to_update = get_files_to_update(manifest["files"])
+    total_size = sum(file["compressed_size"] for file in manifest["files"])
+    download_size = sum(file["compressed_size"] for file in files_to_update)
+    logger.info(color("bold_yellow") + f"v{manifest['version']} 共有 {len(manifest['files'])} 个文件，其中 {len(files_to_update)} 个需要更新，"
+                                       f"需下载 {human_readable_size(download_size)}（全量为 {human_readable_size(total_size)}）")
+
+    # 先将有变化的文件下载并校验到临时目录，全部完成后再替换，避免更新到一半时失败导致文件不一致
+    staging_dir = os.path.join(tmp_dir, "files")
+    blob_pack_urls = {}  # type: Dict[int, str]
+    for blob_group in group_blobs(files_to_update):
+        pack_index = blob_group[0]["pack"]
+        if pack_index not in blob_pack_urls:
+            blob_pack_urls[pack_index] = uploader.get_durl(uploader.find_file(uploader.folder_djc_helper, manifest["blob_packs"][pack_index]))
+
+        if not download_blob_group(uploader, blob_pack_urls[pack_index], blob_group, staging_dir):
+            return False
+
+    kill_original_process(args.pid)
+
+    logger.info("进行更新操作...")
+    for file in files_to_update:
+        target_path = os.path.realpath(file["path"])
+        make_sure_dir_exists(os.path.dirname(target_path))
+        os.replace(os.path.join(staging_dir, file["path"]), target_path)
+
+    for path in get_files_to_delete(manifest.get("deleted_files", [])):
+        logger.info(f"新版本中已移除 {path}，将删除该文件")
+        try:
+            os.remove(os.path.realpath(path))
+        except Exception as e:
+            logger.warning(f"删除 {path} 失败", exc_info=e)
+
+    remove_temp_dir("更新完毕，移除临时目录")
+
+    return True
+
+
+def get_files_to_update(manifest_files: List[dict]) -> List[dict]:
+    files_to_update = []
+    for file in manifest_files:
+        if file["path"] in files_not_to_update:
+            continue
+
+        local_path = os.path.realpath(file["path"])
+        if os.path.isfile(local_path) and os.path.getsize(local_path) == file["size"] and md5_file(local_path) == file["md5"]:
+            continue
+
+        files_to_update.append(file)
+
+    return files_to_update
+
+
+def get_files_to_delete(deleted_files: List[str]) -> List[str]:
+    return [path for path in deleted_files if path not in files_not_to_update and os.path.isfile(os.path.realpath(path))]
+
+
+def group_blobs(files: List[dict]) -> List[List[dict]]:
+    """
+    将在同一个数据包中相邻的数据块合并到同一组，每组使用一个Range请求下载
+    """
+    groups = []  # type: List[List[dict]]
+    for file in sorted(files, key=lambda f: (f["pack"], f["offset"])):
+        if len(groups) != 0:
+            last_file = groups[-1][-1]
+            if file["pack"] == last_file["pack"] and file["offset"] - (last_file["offset"] + last_file["compressed_size"]) <= max_blob_gap_to_merge:
+                groups[-1].append(file)
+                continue
+
+        groups.append([file])
+
+    return groups
+
+
+def download_blob_group(uploader, blob_pack_url: str, files: List[dict], staging_dir: str) -> bool:
+    """
+    流式下载一组数据块，边下载边解压到临时目录，并在每个文件完成时校验大小和md5
+    """
+    group_start = files[0]["offset"]
+    group_end = files[-1]["offset"] + files[-1]["compressed_size"]
+    resp = uploader.lzy.get_durl_range(blob_pack_url, group_start, group_end - 1)
+    if resp is None:
+        logger.error(f"下载数据块 {group_start}-{group_end} 失败")
+        return False
+
+    pos = group_start
+    file_iter = iter(files)
+    file = next(file_iter)
+    decompressor, hash_md5, out_file, out_size = None, None, None, 0
+    try:
+        for chunk in resp.iter_content(1024 * 1024):
+            while chunk and file is not None:
+                if pos < file["offset"]:
+                    # 跳过合并请求时夹在中间的无需更新的数据块
+                    skip = min(len(chunk), file["offset"] - pos)
+                    chunk, pos = chunk[skip:], pos + skip
+                    continue
+
+                if out_file is None:
+                    staging_path = os.path.join(staging_dir, file["path"])
+                    make_sure_dir_exists(os.path.dirname(staging_path))
+                    decompressor, hash_md5, out_file, out_size = lzma.LZMADecompressor(), hashlib.md5(), open(staging_path, "wb"), 0
+
+                take = min(len(chunk), file["offset"] + file["compressed_size"] - pos)
+                data = decompressor.decompress(chunk[:take])
+                out_file.write(data)
+                hash_md5.update(data)
+                out_size += len(data)
+                chunk, pos = chunk[take:], pos + take
+
+                if pos == file["offset"] + file["compressed_size"]:
+                    out_file.close()
+                    out_file = None
+                    if out_size != file["size"] or hash_md5.hexdigest() != file["md5"]:
+                        logger.error(f"{file['path']} 校验失败，预期大小为{file['size']} md5为{file['md5']}，实际为{out_size} {hash_md5.hexdigest()}")
+                        return False
+
+                    logger.info(f"{file['path']} 下载并校验完毕")
+                    file = next(file_iter, None)
+    finally:
+        if out_file is not None:
+            out_file.close()
+        resp.close()
+
+    if file is not None:
+        logger.error(f"数据块 {group_start}-{group_end} 未完整下载")
+        return False
+
+    return True
+
+
 def remove_temp_dir(msg):
     logger.info(msg)
     if os.path.isdir(tmp_dir):
@@ -1,8 +1,16 @@
+import collections
+import io
 import lzma
 import os
 import shutil
+import struct
 import subprocess
+import tarfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from os.path import realpath
+from typing import (BinaryIO, Callable, Iterable, Iterator, List, Optional,
+                    Tuple)
 
 from log import logger
 
@@ -11,6 +19,16 @@ if os.path.exists(".use_by_myself"):
     logger_func = logger.info
 
 
+# 分块并行压缩时每个数据块（压缩前）的大小，每块单独压缩为一个完整的xz流，拼接后仍是标准lzma模块可以直接读取的xz文件
+default_lzma_block_size = 4 * 1024 * 1024
+
+# 用于分块并行解压缩时，从末尾往前解析各个xz流的边界
+_xz_header_magic = b"\xfd7zXZ\x00"
+_xz_footer_magic = b"YZ"
+_xz_header_size = 12
+_xz_footer_size = 12
+
+
 def compress_dir_with_bandizip(dirpath: str, compressed_7z_filepath: str = "", dir_src_path: str = ""):
     """
     压缩 目录dirpath 到 compressed_7z_filepath，并设定源代码根目录为dir_src_path，用于定位bz.exe
@@ -37,6 +55,40 @@ def decompress_dir_with_bandizip(compressed_7z_filepath: str, dir_src_path: str
     subprocess.call([get_bz_path(dir_src_path), "x", f"-o:{dst_parent_folder}", "-aoa", "-target:auto", realpath(compressed_7z_filepath)])
 
 
+def compress_dir_with_lzma(dirpath: str, compressed_filepath: str = "", block_size: int = default_lzma_block_size, max_workers: int = 0):
+    """
+    不依赖bandizip，将 目录dirpath 打包为tar后再分块并行压缩为 compressed_filepath（.tar.xz），可在linux服务器和CI中使用
+    """
+    if compressed_filepath == "":
+        compressed_filepath = dirpath + ".tar.xz"
+
+    compressed_filepath = realpath(compressed_filepath)
+    dirpath = realpath(dirpath)
+
+    logger_func(f"开始压缩 目录 {dirpath} 为 {compressed_filepath}")
+    temp_tar_path = f"{compressed_filepath}.tar"
+    with tarfile.open(temp_tar_path, "w") as tar:
+        tar.add(dirpath, os.path.basename(dirpath))
+
+    compress_file_with_lzma(temp_tar_path, compressed_filepath, block_size, max_workers)
+    os.remove(temp_tar_path)
+
+
+def decompress_dir_with_lzma(compressed_filepath: str, dst_parent_folder: str = ".", max_workers: int = 0):
+    """
+    解压缩 compress_dir_with_lzma 生成的 compressed_filepath 到 dst_parent_folder 下面
+    """
+    compressed_filepath = realpath(compressed_filepath)
+    dst_parent_folder = realpath(dst_parent_folder)
+
+    logger_func(f"开始解压缩 目录 {compressed_filepath} 到 目录 {dst_parent_folder} 下面")
+    temp_tar_path = f"{compressed_filepath}.tar"
+    decompress_file_with_lzma(compressed_filepath, temp_tar_path, max_workers)
+    with tarfile.open(temp_tar_path, "r") as tar:
+        tar.extractall(dst_parent_folder)
+    os.remove(temp_tar_path)
+
+
 def get_bz_path(dir_src_path: str = "") -> str:
     if dir_src_path == "":
         # 未传入参数，则默认当前目录为源代码根目录
@@ -45,7 +97,7 @@ def get_bz_path(dir_src_path: str = "") -> str:
     return realpath(os.path.join(dir_src_path, "utils/bandizip_portable", "bz.exe"))
 
 
-def compress_file_with_lzma(filepath: str, compressed_7z_filepath: str = ""):
+def compress_file_with_lzma(filepath: str, compressed_7z_filepath: str = "", block_size: int = default_lzma_block_size, max_workers: int = 0):
     if compressed_7z_filepath == "":
         compressed_7z_filepath = filepath + ".7z"
 
@@ -55,11 +107,13 @@ def compress_file_with_lzma(filepath: str, compressed_7z_filepath: str = ""):
     # 创建压缩版本
     logger_func(f"开始压缩 文件 {filepath} 为 {compressed_7z_filepath}")
     with open(f"{filepath}", "rb") as file_in:
-        with lzma.open(f"{compressed_7z_filepath}", "wb") as file_out:
-            file_out.writelines(file_in)
+        with open(f"{compressed_7z_filepath}", "wb") as file_out:
+            blocks = iter(lambda: file_in.read(block_size), b"")
+            for compressed_block in _map_blocks_in_order(_compress_block, blocks, max_workers):
+                file_out.write(compressed_block)
 
 
-def decompress_file_with_lzma(compressed_7z_filepath: str, filepath: str = ""):
+def decompress_file_with_lzma(compressed_7z_filepath: str, filepath: str = "", max_workers: int = 0):
     if filepath == "":
         from util import remove_suffix
         filepath = remove_suffix(compressed_7z_filepath, ".7z")
@@ -72,20 +126,149 @@ def decompress_file_with_lzma(compressed_7z_filepath: str, filepath: str = ""):
 
     # 先解压缩到临时文件
     temp_target_path = f"{filepath}.decompressed"
-    with lzma.open(f"{compressed_7z_filepath}", "rb") as file_in:
+    with open(f"{compressed_7z_filepath}", "rb") as file_in:
+        stream_ranges = _find_xz_stream_ranges(file_in)
         with open(f"{temp_target_path}", "wb") as file_out:
-            file_out.writelines(file_in)
+            if stream_ranges is None or len(stream_ranges) <= 1:
+                # 只有单个xz流时无法并行，或者无法解析出各个xz流的边界（比如不是xz格式），则交给lzma模块按流式方式解压，避免将整个流读入内存
+                file_in.seek(0)
+                with lzma.open(file_in, "rb") as lzma_in:
+                    shutil.copyfileobj(lzma_in, file_out)
+            else:
+                def read_stream(stream_range: Tuple[int, int]) -> bytes:
+                    start, end = stream_range
+                    file_in.seek(start)
+                    return file_in.read(end - start)
+
+                streams = (read_stream(stream_range) for stream_range in stream_ranges)
+                for decompressed_block in _map_blocks_in_order(lzma.decompress, streams, max_workers):
+                    file_out.write(decompressed_block)
 
     # 解压缩完成后再替换到目标文件，减少目标文件不可用的时长
     os.replace(temp_target_path, filepath)
 
 
-def compress_in_memory_with_lzma(src_bytes: bytes) -> bytes:
-    return lzma.compress(src_bytes)
+def compress_in_memory_with_lzma(src_bytes: bytes, block_size: int = default_lzma_block_size, max_workers: int = 0) -> bytes:
+    blocks = (src_bytes[start:start + block_size] for start in range(0, len(src_bytes), block_size))
+    return b"".join(_map_blocks_in_order(_compress_block, blocks, max_workers)) or _compress_block(b"")
+
 
+def decompress_in_memory_with_lzma(compressed_bytes: bytes, max_workers: int = 0) -> bytes:
+    stream_ranges = _find_xz_stream_ranges(io.BytesIO(compressed_bytes))
+    if stream_ranges is None:
+        return lzma.decompress(compressed_bytes)
 
-def decompress_in_memory_with_lzma(compressed_bytes: bytes) -> bytes:
-    return lzma.decompress(compressed_bytes)
+    streams = (compressed_bytes[start:end] for start, end in stream_ranges)
+    return b"".join(_map_blocks_in_order(lzma.decompress, streams, max_workers))
+
+
+def _compress_block(block: bytes) -> bytes:
+    return lzma.compress(block, format=lzma.FORMAT_XZ)
+
+
+def _map_blocks_in_order(func: Callable[[bytes], bytes], blocks: Iterable[bytes], max_workers: int = 0) -> Iterator[bytes]:
+    """
+    在线程池中并行处理各个数据块，并按原有顺序依次返回结果
+    lzma在压缩和解压时会释放GIL，因此使用线程即可利用多核，同时最多只会有 2*max_workers 个数据块驻留在内存中
+    """
+    if max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        pending = collections.deque()
+        for block in blocks:
+            pending.append(pool.submit(func, block))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+
+        while len(pending) != 0:
+            yield pending.popleft().result()
+
+
+def _find_xz_stream_ranges(fileobj: BinaryIO) -> Optional[List[Tuple[int, int]]]:
+    """
+    从末尾往前依次解析各个xz流的Stream Footer与Index，得到每个xz流在文件中的范围[start, end)
+    若不是合法的xz文件，则返回None
+    """
+    fileobj.seek(0, io.SEEK_END)
+    end = fileobj.tell()
+
+    stream_ranges = []
+    while end > 0:
+        if end < 4:
+            # 文件被截断或过小时，交给调用方按单个流的方式处理
+            return None
+
+        # 跳过流之间的填充（4字节对齐的0）
+        fileobj.seek(end - 4)
+        if fileobj.read(4) == b"\x00" * 4:
+            end -= 4
+            continue
+
+        if end < _xz_header_size + _xz_footer_size:
+            return None
+
+        fileobj.seek(end - _xz_footer_size)
+        footer = fileobj.read(_xz_footer_size)
+        if footer[10:12] != _xz_footer_magic or zlib.crc32(footer[4:10]) != struct.unpack("<I", footer[0:4])[0]:
+            return None
+
+        index_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+        index_start = end - _xz_footer_size - index_size
+        if index_start < _xz_header_size:
+            return None
+
+        fileobj.seek(index_start)
+        blocks_size = _parse_xz_index_blocks_size(fileobj.read(index_size))
+        if blocks_size is None:
+            return None
+
+        start = index_start - blocks_size - _xz_header_size
+        if start < 0:
+            return None
+
+        fileobj.seek(start)
+        if fileobj.read(len(_xz_header_magic)) != _xz_header_magic:
+            return None
+
+        stream_ranges.append((start, end))
+        end = start
+
+    if len(stream_ranges) == 0:
+        return None
+
+    stream_ranges.reverse()
+    return stream_ranges
+
+
+def _parse_xz_index_blocks_size(index: bytes) -> Optional[int]:
+    """
+    解析xz的Index，返回其中记录的所有Block（含4字节对齐的填充）的总大小
+    """
+    if len(index) == 0 or index[0] != 0:
+        return None
+
+    def read_varint(pos: int) -> Tuple[int, int]:
+        value = 0
+        for i in range(9):
+            byte = index[pos + i]
+            value |= (byte & 0x7F) << (7 * i)
+            if byte & 0x80 == 0:
+                return value, pos + i + 1
+
+        raise ValueError("varint too long")
+
+    try:
+        record_count, pos = read_varint(1)
+        blocks_size = 0
+        for _ in range(record_count):
+            unpadded_size, pos = read_varint(pos)
+            _, pos = read_varint(pos)
+            blocks_size += (unpadded_size + 3) // 4 * 4
+    except (IndexError, ValueError):
+        return None
+
+    return blocks_size
 
 
 def test():
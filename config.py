@@ -537,6 +537,12 @@ class RetryConfig(ConfigInterface):
         self.max_retry_count = 3
         # 上述情况下的重试间隔时间（秒）
         self.retry_wait_time = 5
+        # 重试间隔时间的上限（秒），每次重试的间隔将在retry_wait_time的基础上指数增长，并加上随机抖动
+        self.max_retry_wait_time = 30
+        # 同一接口连续失败多少次后触发熔断，熔断期间所有账号（包括其他进程）请求该接口时将直接失败，不再重试。为0时表示不启用熔断
+        self.circuit_breaker_failure_threshold = 6
+        # 熔断持续时间（秒）
+        self.circuit_breaker_cooldown_seconds = 300
 
 
 class XinYueConfig(ConfigInterface):
@@ -628,6 +634,10 @@ class CommonConfig(ConfigInterface):
         self.enable_multiprocessing = True
         # 是否启用超快速模式，若开启，则将并行运行所有账号的所有活动。仅在多进程功能启用或仅单个账号时生效。
         self.enable_super_fast_mode = True
+        # 是否启用流水线模式，若开启，则各账号在登录完毕并检查绑定后将立即开始运行活动，无需等待其他账号登录完毕
+        self.enable_pipeline_mode = True
+        # 是否强制完整运行，若开启，则忽略本地记录的今日（本周）已完成的操作，重新发送全部请求
+        self.force_full_run = False
         # 进程池大小，若为0，则默认为当前cpu核心数，若为-1，则在未开启超快速模式时为当前账号数，开启时为4*当前cpu核心数
         self.multiprocessing_pool_size = -1
         # 是否强制使用打包附带的便携版chrome
@@ -714,13 +724,8 @@ class CommonConfig(ConfigInterface):
         log_level = self.log_level_map[self.log_level]
         consoleHandler.setLevel(log_level)
 
-        try:
-            from lanzou.api.utils import logger as lanzou_logger
-
-            # 将lanzou的日志也显示
-            lanzou_logger.setLevel(log_level)
-        except Exception:
-            pass
+        # 将lanzou的日志也显示
+        lanzou_logger.setLevel(log_level)
         if type(self.log_colors) is dict:
             for level, log_color in self.log_colors.items():
                 consoleLogFormatter.log_colors[level] = log_color
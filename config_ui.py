@@ -296,7 +296,7 @@ class ConfigUi(QFrame):
         cfg = self.to_config().common
 
         try:
-            ui = get_update_info(cfg)
+            ui = get_update_info(cfg, force_update=True)
             if not try_manaual_update(ui):
                 show_message("无需更新", "当前已经是最新版本~")
         except Exception:
@@ -838,6 +838,12 @@ class CommonConfigUi(QFrame):
         self.checkbox_enable_super_fast_mode = create_checkbox(cfg.enable_super_fast_mode)
         add_row(form_layout, "是否启用超快速模式（并行活动）", self.checkbox_enable_super_fast_mode)
 
+        self.checkbox_enable_pipeline_mode = create_checkbox(cfg.enable_pipeline_mode)
+        add_row(form_layout, "是否启用流水线模式（登录完毕的账号立即开始运行）", self.checkbox_enable_pipeline_mode)
+
+        self.checkbox_force_full_run = create_checkbox(cfg.force_full_run)
+        add_row(form_layout, "是否强制完整运行（忽略本地记录的今日已完成的操作）", self.checkbox_force_full_run)
+
         self.spinbox_multiprocessing_pool_size = create_spin_box(cfg.multiprocessing_pool_size, minimum=-1)
         add_row(form_layout, "进程池大小(0=cpu核心数,-1=当前账号数(普通)/4*cpu(超快速),其他=进程数)", self.spinbox_multiprocessing_pool_size)
 
@@ -918,6 +924,8 @@ class CommonConfigUi(QFrame):
         cfg.enable_min_console = self.checkbox_enable_min_console.isChecked()
         cfg.enable_multiprocessing = self.checkbox_enable_multiprocessing.isChecked()
         cfg.enable_super_fast_mode = self.checkbox_enable_super_fast_mode.isChecked()
+        cfg.enable_pipeline_mode = self.checkbox_enable_pipeline_mode.isChecked()
+        cfg.force_full_run = self.checkbox_force_full_run.isChecked()
         cfg.multiprocessing_pool_size = self.spinbox_multiprocessing_pool_size.value()
         cfg.check_update_on_start = self.checkbox_check_update_on_start.isChecked()
         cfg.check_update_on_end = self.checkbox_check_update_on_end.isChecked()
@@ -1207,10 +1215,22 @@ class RetryConfigUi(QWidget):
         self.spinbox_retry_wait_time = create_spin_box(cfg.retry_wait_time)
         add_row(form_layout, "重试间隔时间", self.spinbox_retry_wait_time)
 
+        self.spinbox_max_retry_wait_time = create_spin_box(cfg.max_retry_wait_time)
+        add_row(form_layout, "重试间隔时间上限", self.spinbox_max_retry_wait_time)
+
+        self.spinbox_circuit_breaker_failure_threshold = create_spin_box(cfg.circuit_breaker_failure_threshold)
+        add_row(form_layout, "连续失败多少次后熔断(0=不熔断)", self.spinbox_circuit_breaker_failure_threshold)
+
+        self.spinbox_circuit_breaker_cooldown_seconds = create_spin_box(cfg.circuit_breaker_cooldown_seconds)
+        add_row(form_layout, "熔断持续时间(秒)", self.spinbox_circuit_breaker_cooldown_seconds)
+
     def update_config(self, cfg: RetryConfig):
         cfg.request_wait_time = self.spinbox_request_wait_time.value()
         cfg.max_retry_count = self.spinbox_max_retry_count.value()
         cfg.retry_wait_time = self.spinbox_retry_wait_time.value()
+        cfg.max_retry_wait_time = self.spinbox_max_retry_wait_time.value()
+        cfg.circuit_breaker_failure_threshold = self.spinbox_circuit_breaker_failure_threshold.value()
+        cfg.circuit_breaker_cooldown_seconds = self.spinbox_circuit_breaker_cooldown_seconds.value()
 
 
 class FixedTeamConfigUi(QWidget):
@@ -79,6 +79,79 @@ class CacheInfo(DBInterface):
         self.value = None  # type: Any
 
 
+class CircuitBreakerDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        self.endpoint_to_info = {}  # type: Dict[str, CircuitBreakerInfo]
+
+    def dict_fields_to_fill(self) -> List[Tuple[str, Type[ConfigInterface]]]:
+        return [
+            ('endpoint_to_info', CircuitBreakerInfo)
+        ]
+
+
+class CircuitBreakerInfo(ConfigInterface):
+    def __init__(self):
+        # 连续失败次数，成功一次后清零
+        self.consecutive_failures = 0
+        # 熔断截止时间，在此之前的请求将直接失败
+        self.open_until = "2000-01-01 00:00:00"
+
+        # 以下为统计信息
+        self.trip_count = 0
+        self.fail_fast_count = 0
+        self.saved_seconds = 0.0
+        self.failed_attempt_count = 0
+        self.failed_attempt_seconds = 0.0
+        self.last_trip_at = ""
+
+
+class ActivityDeadDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        # 当日已失效的活动id -> 失效原因
+        self.act_id_to_dead_reason = {}  # type: Dict[str, str]
+
+        # 当日因活动过期或失效而跳过的活动调用次数
+        self.expired_skipped_count = 0
+        self.dead_skipped_count = 0
+
+
+class CompletionLedgerDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        # 已完成的ams流程 -> 服务器当时的回复，在重置前将直接返回该回复，而不再发出请求
+        self.flow_key_to_res = {}  # type: Dict[str, Any]
+
+
+class UpdateInfoDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        # 最近一次成功获取到的更新信息，字段与 dao.UpdateInfo 一致
+        self.update_info = {}  # type: Dict[str, str]
+        self.fetched_at = "2000-01-01 00:00:00"
+
+        # 页面url -> 该页面上次返回的 ETag 与 Last-Modified，用于缓存过期后发起条件请求
+        self.url_to_validators = {}  # type: Dict[str, Dict[str, str]]
+
+
+class UsageReportSpoolDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        # 上报失败（如离线）时暂存的使用统计，下次启动时将尝试补报
+        self.ga_hits = []  # type: List[Dict[str, Any]]
+        self.ga4_events = []  # type: List[Dict[str, Any]]
+        self.lean_cloud_names = []  # type: List[str]
+
+    def is_empty(self) -> bool:
+        return len(self.ga_hits) == 0 and len(self.ga4_events) == 0 and len(self.lean_cloud_names) == 0
+
+
 class FireCrackersDB(DBInterface):
     def __init__(self):
         super().__init__()
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import contextlib
 import os
-from typing import Any, Callable
+import threading
+import time
+from typing import Any, Callable, Set
 
 from const import db_top_dir
 from data_struct import ConfigInterface
@@ -58,19 +61,24 @@ class DBInterface(ConfigInterface):
             self.update_at = format_now()
             self.file_created = True
 
-            self.save_to_json_file(db_file)
+            # 先写入临时文件再替换，避免其他进程读取到写了一半的文件
+            tmp_file = f"{db_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            self.save_to_json_file(tmp_file)
+            replace_file(tmp_file, db_file)
         except Exception:
             logger.error(f"保存数据库失败，db_to_save={self}")
 
         logger.debug(f"保存数据库完毕 context={self.context} db_type_name={self.db_type_name} db_file={db_file}")
 
     def update(self, op: Callable[[Any], Any]) -> Any:
-        # 加载配置
-        self.load()
-        # 回调
-        res = op(self)
-        # 保存修改后的配置
-        self.save()
+        # 多个进程可能同时更新同一个数据库，需要在 读取-修改-保存 期间持有对应的文件锁，否则后保存的会覆盖掉先保存的修改
+        with db_file_lock(self.prepare_env_and_get_db_filepath()):
+            # 加载配置
+            self.load()
+            # 回调
+            res = op(self)
+            # 保存修改后的配置
+            self.save()
 
         # 返回回调结果
         return res
@@ -110,6 +118,75 @@ class DBInterface(ConfigInterface):
         return md5(key)
 
 
+# 当前线程已持有的文件锁，使得在 update 的回调中再次 update 同一个数据库时不会死锁
+_held_locks = threading.local()
+
+
+@contextlib.contextmanager
+def db_file_lock(db_file: str):
+    """
+    通过对应的 .lock 文件加上跨进程的排他锁
+    """
+    held = getattr(_held_locks, "files", None)  # type: Set[str]
+    if held is None:
+        held = _held_locks.files = set()
+
+    if db_file in held:
+        yield
+        return
+
+    with open(db_file + ".lock", "a+b") as lock_file:
+        _lock_file(lock_file)
+        held.add(db_file)
+        try:
+            yield
+        finally:
+            held.discard(db_file)
+            _unlock_file(lock_file)
+
+
+def _lock_file(lock_file):
+    if os.name == "nt":
+        import msvcrt
+
+        lock_file.seek(0)
+        while True:
+            try:
+                # LK_LOCK 在重试约10秒后仍获取不到时会抛出异常，此时继续等待即可
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass
+    else:
+        import fcntl
+
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(lock_file):
+    if os.name == "nt":
+        import msvcrt
+
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def replace_file(src: str, dst: str, max_retry_count=5):
+    # windows下目标文件正被其他进程读取时替换会失败，稍等片刻后重试
+    for i in range(max_retry_count):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i + 1 == max_retry_count:
+                raise
+            time.sleep(0.1)
+
+
 def test():
     from db import DemoDB
 
@@ -274,6 +274,9 @@ class DjcHelper:
         activity_funcs_to_run = self.get_activity_funcs_to_run(user_buy_info)
 
         for act_name, activity_func in activity_funcs_to_run:
+            if self.is_activity_dead_today(act_name, activity_func):
+                continue
+
             activity_func()
 
         # # 以下为并行执行各个活动的调用方式
@@ -284,14 +287,71 @@ class DjcHelper:
         # #    因此在不同账号已经在不同的进程下运行的前提下，子进程下不能再创建新的子进程了
         # async_run_all_act(self.cfg, self.common_cfg, activity_funcs_to_run)
 
-    def get_activity_funcs_to_run(self, user_buy_info: BuyInfo) -> List[Tuple[str, Callable]]:
-        activity_funcs_to_run = []
-        activity_funcs_to_run.extend(self.free_activities())
+    def get_activity_funcs_to_run(self, user_buy_info: BuyInfo, record_skipped=True) -> List[Tuple[str, Callable]]:
+        return self.filter_expired_activities(self.get_all_activity_funcs(user_buy_info), record_skipped)
+
+    def get_all_activity_funcs(self, user_buy_info: BuyInfo) -> List[Tuple[str, Callable]]:
+        activity_funcs = []
+        activity_funcs.extend(self.free_activities())
         if user_buy_info.is_active():
             # 付费期间将付费活动也加入到执行列表中
-            activity_funcs_to_run.extend(self.payed_activities())
+            activity_funcs.extend(self.payed_activities())
+
+        return activity_funcs
 
-        return activity_funcs_to_run
+    def filter_expired_activities(self, activity_funcs: List[Tuple[str, Callable]], record_skipped=True) -> List[Tuple[str, Callable]]:
+        """
+        根据已知的活动结束时间，在发出任何请求前过滤掉已经过期的活动
+        :param record_skipped: 是否计入跳过的活动统计，仅在为某个账号实际运行活动时计入，避免仅用于规划的调用重复统计
+        """
+        not_expired_activity_funcs = []
+        expired_act_names = []
+        for act_name, act_func in activity_funcs:
+            act_info = self.get_activity_info(act_name, act_func)
+            if act_info is not None and act_info.dtEndTime != "" and is_act_expired(act_info.dtEndTime, now=get_now()):
+                expired_act_names.append(act_name)
+                continue
+
+            not_expired_activity_funcs.append((act_name, act_func))
+
+        if len(expired_act_names) != 0:
+            logger.info(color("bold_black") + f"以下活动已过期，将直接跳过：{expired_act_names}")
+            if record_skipped:
+                increase_skipped_activity_count(expired_count=len(expired_act_names))
+
+        return not_expired_activity_funcs
+
+    def get_activity_info(self, act_name: str, act_func: Callable) -> Optional[AmsActInfo]:
+        op_func_name = act_func.__name__ + '_op'
+
+        # 可能是非ams活动
+        act_info = None
+        try:
+            act_info = get_not_ams_act(act_name)
+            if act_info is None and hasattr(self, op_func_name):
+                # 可能是ams活动
+                act_info = getattr(self, op_func_name)("获取活动信息", "", get_ams_act_info_only=True)
+        except Exception as e:
+            logger.debug(f"请求{act_name} 出错了", exc_info=e)
+
+        return act_info
+
+    def is_activity_dead_today(self, act_name: str, act_func: Callable) -> bool:
+        """
+        若今日已有其他账号（或其他进程）在该活动收到了活动已结束之类的回复，则直接跳过，不再发出请求
+        """
+        act_info = self.get_activity_info(act_name, act_func)
+        if act_info is None:
+            return False
+
+        dead_reason = get_dead_activity_reason(act_info.iActivityId)
+        if dead_reason == "":
+            return False
+
+        logger.warning(color("bold_yellow") + f"今日已有账号在活动【{act_name}】中收到 {dead_reason} 的回复，将跳过该活动")
+        increase_skipped_activity_count(dead_count=1)
+
+        return True
 
     @try_except(show_exception_info=False)
     def show_activities_summary(self, user_buy_info: BuyInfo):
@@ -312,19 +372,8 @@ class DjcHelper:
                 for idx, name_and_func in enumerate(activities):
                     act_name, act_func = name_and_func
 
-                    op_func_name = act_func.__name__ + '_op'
-
                     end_time = parse_time(not_know_end_time)
-                    # 可能是非ams活动
-                    act_info = None
-                    try:
-                        act_info = get_not_ams_act(act_name)
-                        if act_info is None and hasattr(self, op_func_name):
-                            # 可能是ams活动
-                            act_info = getattr(self, op_func_name)("获取活动信息", "", get_ams_act_info_only=True)
-                    except Exception as e:
-                        logger.debug(f"请求{act_name} 出错了", exc_info=e)
-
+                    act_info = self.get_activity_info(act_name, act_func)
                     if act_info is not None:
                         end_time = parse_time(act_info.dtEndTime)
 
@@ -489,9 +538,9 @@ class DjcHelper:
         self.get("2.1.1 发送imsdk登录事件", self.urls.imsdk_login)
         self.get("2.1.2 发送app登录事件", self.urls.user_login_event)
         # 签到
-        self.post("2.2 签到", self.urls.sign, self.sign_flow_data("96939"))
+        self.djc_sign_daily_flow("2.2 签到", "96939")
         # 领取本日签到赠送的聚豆
-        self.post("2.3 领取签到赠送的聚豆", self.urls.sign, self.sign_flow_data("324410"))
+        self.djc_sign_daily_flow("2.3 领取签到赠送的聚豆", "324410")
 
         # 尝试领取自动签到的奖励
         # 查询本月签到的日期列表
@@ -506,6 +555,11 @@ class DjcHelper:
     def sign_flow_data(self, iFlowId):
         return self.format(self.urls.sign_raw_data, iFlowId=iFlowId)
 
+    def djc_sign_daily_flow(self, ctx, iFlowId):
+        # 每日仅能进行一次的签到操作，完成后当日不再重复请求
+        flow_key = make_completion_flow_key(djc_sign_iActivityId, iFlowId, {})
+        return self.request_with_completion_ledger(ctx, flow_key, lambda: self.post(ctx, self.urls.sign, self.sign_flow_data(iFlowId)), success_period="daily")
+
     def complete_tasks(self):
         # 完成《绝不错亿》
         self.get("3.1 模拟点开活动中心", self.urls.task_report, task_type="activity_center")
@@ -756,7 +810,7 @@ class DjcHelper:
         subprocess.Popen(f"utils/npp_portable/notepad++.exe {server_list_file}")
 
     def query_dnf_gifts(self):
-        self.get("查询可兑换道具列表", self.urls.show_exchange_item_list)
+        self.get("查询可兑换道具列表", self.urls.show_exchange_item_list, shared=True)
 
     def get_mobile_game_gifts(self):
         game_info = self.get_mobile_game_info()
@@ -912,7 +966,7 @@ class DjcHelper:
                 break
 
     @try_except(show_exception_info=False)
-    def try_join_fixed_xinyue_team(self):
+    def try_join_fixed_xinyue_team(self, allow_create=True):
         # 检查是否有固定队伍
         fixed_team = self.get_fixed_team()
 
@@ -946,6 +1000,11 @@ class DjcHelper:
 
             logger.info(f"远程队伍={remote_teamid}已失效，应该是新的一周自动解散了，将重新创建队伍")
 
+        if not allow_create:
+            # 流水线模式下各账号并行运行，为避免两个成员同时各自创建队伍，仅允许固定队的第一个成员创建队伍
+            logger.info("当前账号不负责创建固定队伍，将在后续领取组队奖励前再次尝试加入")
+            return
+
         # 尝试创建小队并保存到本地
         teaminfo = self.create_xinyue_team()
         self.save_teamid(fixed_team.id, teaminfo.id)
@@ -5975,12 +6034,12 @@ class DjcHelper:
 
     # --------------------------------------------辅助函数--------------------------------------------
     def get(self, ctx, url, pretty=False, print_res=True, is_jsonp=False, is_normal_jsonp=False, need_unquote=True,
-            extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None, extra_headers: Optional[Dict[str, str]] = None, **params):
-        return self.network.get(ctx, self.format(url, **params), pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers)
+            extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None, extra_headers: Optional[Dict[str, str]] = None, shared=False, **params):
+        return self.network.get(ctx, self.format(url, **params), pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers, shared)
 
     def post(self, ctx, url, data=None, json=None, pretty=False, print_res=True, is_jsonp=False, is_normal_jsonp=False, need_unquote=True,
-             extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None, extra_headers: Optional[Dict[str, str]] = None, **params):
-        return self.network.post(ctx, self.format(url, **params), data, json, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers)
+             extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None, extra_headers: Optional[Dict[str, str]] = None, shared=False, **params):
+        return self.network.post(ctx, self.format(url, **params), data, json, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers, shared)
 
     def format(self, url, **params):
         endTime = datetime.datetime.now()
@@ -6082,6 +6141,12 @@ class DjcHelper:
         eas_url = remove_suffix(eas_url, 'index.htm')
         eas_url = remove_suffix(eas_url, 'zzx.html')
 
+        flow_key = make_completion_flow_key(iActivityId, iFlowId, data_extra_params)
+        return self.request_with_completion_ledger(ctx, flow_key,
+                                                   lambda: self._amesvr_request(ctx, amesvr_host, sServiceDepartment, sServiceType, iActivityId, iFlowId, print_res, eas_url, extra_cookies, **data_extra_params),
+                                                   success_period_fn=lambda: get_ams_flow_success_period(iActivityId, iFlowId))
+
+    def _amesvr_request(self, ctx, amesvr_host, sServiceDepartment, sServiceType, iActivityId, iFlowId, print_res, eas_url: str, extra_cookies="", **data_extra_params):
         data = self.format(self.urls.amesvr_raw_data,
                            sServiceDepartment=sServiceDepartment, sServiceType=sServiceType, eas_url=quote_plus(eas_url),
                            iActivityId=iActivityId, iFlowId=iFlowId, **data_extra_params)
@@ -6107,10 +6172,68 @@ class DjcHelper:
 
             return None
 
-        return self.post(ctx, self.urls.amesvr, data,
-                         amesvr_host=amesvr_host, sServiceDepartment=sServiceDepartment, sServiceType=sServiceType,
-                         iActivityId=iActivityId, sMiloTag=self.make_s_milo_tag(iActivityId, iFlowId),
-                         print_res=print_res, extra_cookies=extra_cookies, check_fn=_check)
+        res = self.post(ctx, self.urls.amesvr, data,
+                        amesvr_host=amesvr_host, sServiceDepartment=sServiceDepartment, sServiceType=sServiceType,
+                        iActivityId=iActivityId, sMiloTag=self.make_s_milo_tag(iActivityId, iFlowId),
+                        print_res=print_res, extra_cookies=extra_cookies, check_fn=_check)
+
+        dead_reason = get_ams_act_dead_reason(res)
+        if dead_reason != "":
+            # 记录下来，其他账号将直接跳过该活动
+            mark_activity_dead_today(iActivityId, dead_reason)
+
+        return res
+
+    def request_with_completion_ledger(self, ctx, flow_key: str, request_fn: Callable[[], Any], success_period="", success_period_fn: Optional[Callable[[], str]] = None) -> Any:
+        """
+        若本地记录显示该操作在本周期内已完成，则直接返回上次的回复，否则发出请求，并在回复表明已完成时记录下来
+        :param success_period: 该操作成功后在多久内不可重复进行（daily/weekly），为空时仅在回复表明已经做过时记录
+        :param success_period_fn: 仅在请求成功后才调用的用于获取 success_period 的函数，适用于需要额外开销才能确定的情况
+        """
+        if not self.common_cfg.force_full_run:
+            completed_res = self.get_completed_flow_res(flow_key)
+            if completed_res is not None:
+                logger.info(color("bold_black") + f"{ctx} 本地记录显示该操作在本周期内已完成，将跳过请求，直接使用上次的回复（如需重新请求，可开启强制完整运行）")
+                return completed_res
+
+        res = request_fn()
+
+        completion_period = get_ams_flow_completion_period(res)
+        if completion_period == "" and type(res) is dict and is_request_ok(res):
+            if success_period == "" and success_period_fn is not None:
+                success_period = success_period_fn()
+            completion_period = success_period
+        self.try_record_completed_flow(flow_key, res, completion_period)
+
+        return res
+
+    def get_completion_ledger_dbs(self) -> List[CompletionLedgerDB]:
+        now = get_now()
+        return [
+            CompletionLedgerDB().with_context(f"{self.qq()}/daily/{get_today(now)}"),
+            CompletionLedgerDB().with_context(f"{self.qq()}/weekly/{get_week(now)}"),
+        ]
+
+    def get_completed_flow_res(self, flow_key: str) -> Optional[Any]:
+        for db in self.get_completion_ledger_dbs():
+            res = db.load().flow_key_to_res.get(flow_key)
+            if res is not None:
+                return res
+
+        return None
+
+    def try_record_completed_flow(self, flow_key: str, res, completion_period: str):
+        if completion_period == "":
+            return
+
+        def _record(db: CompletionLedgerDB):
+            db.flow_key_to_res[flow_key] = res
+
+        daily_db, weekly_db = self.get_completion_ledger_dbs()
+        if completion_period == "weekly":
+            weekly_db.update(_record)
+        else:
+            daily_db.update(_record)
 
     def show_ams_act_info(self, iActivityId):
         logger.info(color("bold_green") + get_ams_act_desc(iActivityId))
@@ -6300,6 +6423,150 @@ class DjcHelper:
         action_callback()
 
 
+# 这些回复表明整个活动已经不可用了，而非仅仅是当前账号的某个操作失败
+ams_act_dead_messages = [
+    "活动已结束",
+    "活动已经结束",
+    "活动不存在",
+]
+
+# 这些ret表明请求已经进入了具体的流程，此时的回复仅针对该流程（如某个礼包已结束），而非整个活动
+# 0=成功 600=资格已用尽 700=不满足流程的条件
+ams_flow_level_rets = ["0", "600", "700"]
+
+
+def get_ams_act_dead_reason(res) -> str:
+    """
+    仅根据活动层面的回复来判断，流程层面的回复（如 flowRet 中的 sMsg）不会导致将整个活动标记为失效
+    """
+    if type(res) is not dict:
+        return ""
+
+    if str(res.get("ret", "0")) in ams_flow_level_rets:
+        return ""
+
+    msg = str(res.get("msg", ""))
+    for dead_message in ams_act_dead_messages:
+        if dead_message in msg:
+            return msg
+
+    return ""
+
+
+# 这些回复表明该操作在当前周期内已经做过了，再次请求也只会得到同样的回复
+ams_flow_completed_messages = [
+    "已领取",
+    "已经领取",
+    "已签到",
+    "已经签到",
+    "已参与",
+    "已经参与",
+    "已达上限",
+    "资格已用尽",
+]
+
+
+def get_ams_flow_completion_period(res) -> str:
+    """
+    判断ams请求的回复是否表明该操作在当前周期内已完成，若是，则返回 daily 或 weekly，否则返回空字符串
+    """
+    if type(res) is not dict:
+        return ""
+
+    messages = [str(res.get("msg", ""))]
+    if type(res.get("flowRet")) is dict:
+        messages.append(str(res["flowRet"].get("sMsg", "")))
+
+    for msg in messages:
+        for completed_message in ams_flow_completed_messages:
+            if completed_message in msg:
+                if "本周" in msg or "每周" in msg:
+                    return "weekly"
+                return "daily"
+
+    return ""
+
+
+# 根据流程名称判断其成功后在多久内不可重复进行，依次匹配，排除项优先
+ams_flow_period_name_keywords = [
+    ("", ["查询", "抽奖", "初始化", "输出", "绑定"]),
+    ("weekly", ["每周", "本周"]),
+    ("daily", ["每日", "每天", "今日", "签到"]),
+]
+
+
+def get_ams_flow_success_period(iActivityId, iFlowId) -> str:
+    """
+    根据活动描述中该流程的名称，判断成功进行该操作后是否在当前周期内不可再次进行，若是，则返回 daily 或 weekly，否则返回空字符串
+    """
+    act_info = get_ams_act(iActivityId)
+    if act_info is None or type(act_info.flows) is not dict:
+        return ""
+
+    flow = act_info.flows.get(f"f_{iFlowId}", act_info.flows.get(str(iFlowId)))
+    if type(flow) is not dict:
+        return ""
+
+    return get_flow_period_by_name(str(flow.get("sFlowName", "")))
+
+
+def get_flow_period_by_name(flow_name: str) -> str:
+    for period, keywords in ams_flow_period_name_keywords:
+        if any(keyword in flow_name for keyword in keywords):
+            return period
+
+    return ""
+
+
+# 道聚城签到相关流程所在的ams活动
+djc_sign_iActivityId = "11117"
+
+
+def make_completion_flow_key(iActivityId, iFlowId, data_extra_params: dict) -> str:
+    # 同一个流程可能会通过不同参数来进行不同的操作（如兑换不同的道具），因此需要将参数也纳入key中
+    params = json.dumps(data_extra_params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{iActivityId}/{iFlowId}/{md5(params)}"
+
+
+def get_dead_activity_db() -> ActivityDeadDB:
+    return ActivityDeadDB().with_context(get_today(get_now()))
+
+
+def get_dead_activity_reason(iActivityId: str) -> str:
+    return get_dead_activity_db().load().act_id_to_dead_reason.get(str(iActivityId), "")
+
+
+def mark_activity_dead_today(iActivityId: str, reason: str):
+    def _mark(db: ActivityDeadDB):
+        db.act_id_to_dead_reason[str(iActivityId)] = reason
+
+    logger.warning(color("bold_yellow") + f"活动 {iActivityId} 回复 {reason}，今日其他账号将跳过该活动")
+    get_dead_activity_db().update(_mark)
+
+
+def increase_skipped_activity_count(expired_count=0, dead_count=0):
+    def _increase(db: ActivityDeadDB):
+        db.expired_skipped_count += expired_count
+        db.dead_skipped_count += dead_count
+
+    get_dead_activity_db().update(_increase)
+
+
+def show_skipped_activities_stats():
+    db = get_dead_activity_db().load()
+
+    total_skipped_count = db.expired_skipped_count + db.dead_skipped_count
+    if total_skipped_count == 0:
+        return
+
+    logger.info(color("bold_cyan") + (
+        f"今日因活动已过期跳过 {db.expired_skipped_count} 次活动调用，因其他账号已发现活动失效跳过 {db.dead_skipped_count} 次活动调用，"
+        f"共计至少节省 {total_skipped_count} 次请求"
+    ))
+    if len(db.act_id_to_dead_reason) != 0:
+        logger.info(color("bold_cyan") + f"今日已失效的活动：{db.act_id_to_dead_reason}")
+
+
 def async_run_all_act(account_config: AccountConfig, common_config: CommonConfig, activity_funcs_to_run: List[Tuple[str, Callable]]):
     pool_size = len(activity_funcs_to_run)
     logger.warning(color("bold_yellow") + f"将使用{pool_size}个进程并行运行{len(activity_funcs_to_run)}个活动")
@@ -6309,6 +6576,9 @@ def async_run_all_act(account_config: AccountConfig, common_config: CommonConfig
 
 def run_act(account_config: AccountConfig, common_config: CommonConfig, act_name: str, act_func_name: str):
     djcHelper = DjcHelper(account_config, common_config)
+    if djcHelper.is_activity_dead_today(act_name, getattr(djcHelper, act_func_name)):
+        return
+
     djcHelper.fetch_pskey()
     djcHelper.check_skey_expired()
     djcHelper.get_bind_role_list()
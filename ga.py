@@ -1,5 +1,6 @@
 # Google Analytics 上报脚本
-from urllib.parse import quote_plus
+from typing import List
+from urllib.parse import quote_plus, urlencode
 
 import requests
 
@@ -11,6 +12,9 @@ from version import now_version
 # note: 当发现上报失败时，可以将打印的post body复制到 https://ga-dev-tools.web.app/hit-builder/ 进行校验，看是否缺了参数，或者有参数不符合格式
 # note: 参数文档 https://developers.google.com/analytics/devguides/collection/protocol/v1/parameters
 GA_API_URL = "https://www.google-analytics.com/collect"
+# 批量上报接口，单次最多20条，每条不超过8K，总共不超过16K
+GA_BATCH_API_URL = "https://www.google-analytics.com/batch"
+GA_BATCH_MAX_HITS = 20
 GA_TRACKING_ID = "UA-179595405-1"
 
 headers = {
@@ -36,10 +40,21 @@ GA_REPORT_TYPE_PAGE_VIEW = "page_view"
 
 @try_except(show_exception_info=False)
 def track_event(category: str, action: str, label=None, value=0, ga_misc_params: dict = None):
+    res = requests.post(GA_API_URL, data=make_event_hit(category, action, label, value, ga_misc_params), headers=headers, timeout=10)
+    logger.debug(f"request body = {res.request.body}")
+
+
+@try_except(show_exception_info=False)
+def track_page(page: str, ga_misc_params: dict = None):
+    res = requests.post(GA_API_URL, data=make_page_hit(page, ga_misc_params), timeout=10)
+    logger.debug(f"request body = {res.request.body}")
+
+
+def make_event_hit(category: str, action: str, label=None, value=0, ga_misc_params: dict = None) -> dict:
     if ga_misc_params is None:
         ga_misc_params = {}
 
-    data = {
+    return {
         **common_data,
 
         't': 'event',  # Event hit type.
@@ -51,17 +66,13 @@ def track_event(category: str, action: str, label=None, value=0, ga_misc_params:
         **ga_misc_params,  # 透传的一些额外参数
     }
 
-    res = requests.post(GA_API_URL, data=data, headers=headers, timeout=10)
-    logger.debug(f"request body = {res.request.body}")
-
 
-@try_except(show_exception_info=False)
-def track_page(page: str, ga_misc_params: dict = None):
+def make_page_hit(page: str, ga_misc_params: dict = None) -> dict:
     if ga_misc_params is None:
         ga_misc_params = {}
 
     page = quote_plus(page)
-    data = {
+    return {
         **common_data,
 
         't': 'pageview',  # Event hit type.
@@ -72,8 +83,16 @@ def track_page(page: str, ga_misc_params: dict = None):
         **ga_misc_params,  # 透传的一些额外参数
     }
 
-    res = requests.post(GA_API_URL, data=data, timeout=10)
-    logger.debug(f"request body = {res.request.body}")
+
+def send_hits(hits: List[dict]):
+    """
+    通过批量接口上报多条hit，网络出错时将抛出异常，便于调用方稍后重试
+    """
+    for start in range(0, len(hits), GA_BATCH_MAX_HITS):
+        body = "\n".join(urlencode({k: v for k, v in hit.items() if v is not None}) for hit in hits[start:start + GA_BATCH_MAX_HITS])
+        res = requests.post(GA_BATCH_API_URL, data=body.encode(), headers=headers, timeout=10)
+        res.raise_for_status()
+        logger.debug(f"batch request body = {body}")
 
 
 if __name__ == '__main__':
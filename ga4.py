@@ -1,4 +1,5 @@
 # Google Analytics 4 上报脚本
+from typing import List
 
 import requests
 
@@ -14,6 +15,8 @@ GA_API_SECRET = "Hyn3f-XnQIygfii6xju6Hg"
 GA_MEASUREMENT_ID = "G-6C4M20MVJ4"
 
 GA_API_URL = f"{GA_API_BASE_URL}?measurement_id={GA_MEASUREMENT_ID}&api_secret={GA_API_SECRET}"
+# 单次请求最多包含25个事件
+GA_MAX_EVENTS_PER_REQUEST = 25
 
 headers = {
     "user-agent": "djc_helper",
@@ -22,23 +25,7 @@ headers = {
 
 @try_except(show_exception_info=False)
 def track_event(category: str, event_name: str):
-    event_name = event_name.replace('/', '_')
-
-    json_data = {
-        "client_id": get_cid(),
-        "user_id": get_cid(),
-
-        "events": [
-            {
-                "name": category,
-                "params": {
-                    "event_name": event_name,
-                },
-            }
-        ],
-    }
-
-    res = requests.post(GA_API_URL, json=json_data, headers=headers, timeout=10)
+    res = requests.post(GA_API_URL, json=make_request_json([make_event(category, event_name)]), headers=headers, timeout=10)
 
     # 打印日志，方便调试
     debug_msg = f"request info: body = {res.request.body}"
@@ -49,6 +36,36 @@ def track_event(category: str, event_name: str):
     logFunc(debug_msg)
 
 
+def make_event(category: str, event_name: str) -> dict:
+    event_name = event_name.replace('/', '_')
+
+    return {
+        "name": category,
+        "params": {
+            "event_name": event_name,
+        },
+    }
+
+
+def make_request_json(events: List[dict]) -> dict:
+    return {
+        "client_id": get_cid(),
+        "user_id": get_cid(),
+
+        "events": events,
+    }
+
+
+def send_events(events: List[dict]):
+    """
+    将多个事件合并到尽量少的请求中上报，网络出错时将抛出异常，便于调用方稍后重试
+    """
+    for start in range(0, len(events), GA_MAX_EVENTS_PER_REQUEST):
+        res = requests.post(GA_API_URL, json=make_request_json(events[start:start + GA_MAX_EVENTS_PER_REQUEST]), headers=headers, timeout=10)
+        res.raise_for_status()
+        logger.debug(f"batch request info: body = {res.request.body}")
+
+
 if __name__ == '__main__':
     track_event("test_category", "test_event/name_1")
     track_event("test_category", "test_event_name_2")
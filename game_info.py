@@ -7,6 +7,8 @@ from dao import GameInfo
 from log import logger
 from util import message_box, pause
 
+djc_biz_list_path = "utils/reference_data/djc_biz_list.json"
+
 _loaded = False
 name_2_game_info_map = {}
 code_2_game_info_map = {}
@@ -20,7 +22,7 @@ def lazy_load():
 
     global name_2_game_info_map, code_2_game_info_map, name_2_mobile_game_info_map
     try:
-        with open("utils/reference_data/djc_biz_list.json", "r", encoding="utf-8") as f:
+        with open(djc_biz_list_path, "r", encoding="utf-8") as f:
             raw_data = json.load(f)
             for game_data in raw_data["data"]:
                 gameInfo = GameInfo(game_data)
@@ -49,7 +51,7 @@ def get_game_info(name):
     lazy_load()
     if name not in name_2_game_info_map:
         message_box(f"未找到游戏【{name}】相关的配置，可能是空格等不完全匹配，请在稍后打开的文件中查找对应游戏的实际名字", "游戏名不正确")
-        subprocess.call(["utils/npp_portable/notepad++.exe", "utils/reference_data/djc_biz_list.json"])
+        subprocess.call(["utils/npp_portable/notepad++.exe", djc_biz_list_path])
         exit(-1)
 
     return name_2_game_info_map[name]
@@ -2,10 +2,13 @@
 蓝奏网盘 API，封装了对蓝奏云的各种操作，解除了上传格式、大小限制
 """
 
+import io
 import os
 import pickle
 import re
 import shutil
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from random import shuffle, uniform
@@ -45,6 +48,12 @@ class LanZouCloud(object):
         self._timeout = 15  # 每个请求的超时(不包含下载响应体的用时)
         self._max_size = 100  # 单个文件大小上限 MB
         self._upload_delay = (0, 0)  # 文件上传延时
+        self._upload_threads = 3  # 上传大文件时同时上传的数据块数目
+        self._down_threads = 4  # 下载时的并发连接数
+        self._down_min_segment_size = 4 * 1048576  # 下载时单个连接负责的最小数据段大小，过小的文件不必拆分
+        self._down_chunk_size = 1048576  # 下载时每次读取并写入的数据大小
+        self._callback_interval = 0.2  # 下载进度回调的最小间隔(秒)
+        self._record_interval = 2  # 下载记录文件的最小保存间隔(秒)
         self._host_url = 'https://pan.lanzoui.com'
         self._doupload_url = 'https://pc.woozooo.com/doupload.php'
         self._account_url = 'https://pc.woozooo.com/account.php'
@@ -109,6 +118,20 @@ class LanZouCloud(object):
             return LanZouCloud.SUCCESS
         return LanZouCloud.FAILED
 
+    def set_upload_threads(self, threads=3) -> int:
+        """设置上传大文件时同时上传的数据块数目"""
+        if threads < 1:
+            return LanZouCloud.FAILED
+        self._upload_threads = threads
+        return LanZouCloud.SUCCESS
+
+    def set_down_threads(self, threads=4) -> int:
+        """设置下载时的并发连接数"""
+        if threads < 1:
+            return LanZouCloud.FAILED
+        self._down_threads = threads
+        return LanZouCloud.SUCCESS
+
     def login(self, username, passwd) -> int:
         """
         登录蓝奏云控制台[已弃用]
@@ -758,27 +781,31 @@ class LanZouCloud(object):
         if not os.path.isfile(file_path):
             return LanZouCloud.PATH_ERROR
 
-        need_delete = False  # 上传完成是否删除
-        if not is_name_valid(os.path.basename(file_path)):  # 不允许上传的格式
+        filename = os.path.basename(file_path)
+        trailer = b''
+        if not is_name_valid(filename):  # 不允许上传的格式
             if self._limit_mode:  # 不允许绕过官方限制
                 return LanZouCloud.OFFICIAL_LIMITED
-            file_path = let_me_upload(file_path)  # 添加了报尾的新文件
-            need_delete = True
+            filename, trailer = let_me_upload_info(file_path)  # 伪装的文件名和报尾，上传时直接附加在原文件数据后面
 
+        with FileRangeView(file_path, 0, os.path.getsize(file_path), trailer) as data:
+            return self._upload_stream(filename, data, folder_id, callback=callback, uploaded_handler=uploaded_handler)
+
+    def _upload_stream(self, filename, data, folder_id=-1, *, callback=None, uploaded_handler=None) -> int:
+        """上传一个类文件对象中的数据，保存为指定的文件名"""
         # 文件已经存在同名文件就删除
-        filename = name_format(os.path.basename(file_path))
+        filename = name_format(filename)
         file_list = self.get_file_list(folder_id)
         if file_list.find_by_name(filename):
             self.delete(file_list.find_by_name(filename).id)
-        logger.debug(f'Upload file_path:{file_path} to folder_id:{folder_id}')
+        logger.debug(f'Upload {filename} to folder_id:{folder_id}')
 
-        file = open(file_path, 'rb')
         post_data = {
             "task": "1",
             "folder_id": str(folder_id),
             "id": "WU_FILE_0",
             "name": filename,
-            "upload_file": (filename, file, 'application/octet-stream')
+            "upload_file": (filename, data, 'application/octet-stream')
         }
 
         post_data = MultipartEncoder(post_data)
@@ -788,14 +815,16 @@ class LanZouCloud(object):
         # MultipartEncoderMonitor 每上传 8129 bytes数据调用一次回调函数，问题根源是 httplib 库
         # issue : https://github.com/requests/toolbelt/issues/75
         # 上传完成后，回调函数会被错误的多调用一次(强迫症受不了)。因此，下面重新封装了回调函数，修改了接受的参数，并阻断了多余的一次调用
-        self._upload_finished_flag = False  # 上传完成的标志
+        # 多个数据块可能会同时上传，因此上传完成的标志需要每次上传单独记录
+        upload_finished = False
 
         def _call_back(read_monitor):
+            nonlocal upload_finished
             if callback is not None:
-                if not self._upload_finished_flag:
+                if not upload_finished:
                     callback(filename, read_monitor.len, read_monitor.bytes_read)
                 if read_monitor.len == read_monitor.bytes_read:
-                    self._upload_finished_flag = True
+                    upload_finished = True
 
         monitor = MultipartEncoderMonitor(post_data, _call_back)
         result = self._post('https://pc.woozooo.com/fileup.php', data=monitor, headers=tmp_header, timeout=3600)
@@ -811,73 +840,107 @@ class LanZouCloud(object):
             file_id = int(result["text"][0]["id"])
             uploaded_handler(file_id, is_file=True)  # 对已经上传的文件再进一步处理
 
-        if need_delete:
-            file.close()
-            os.remove(file_path)
         return LanZouCloud.SUCCESS
 
     def _upload_big_file(self, file_path, dir_id, *, callback=None, uploaded_handler=None):
-        """上传大文件, 且使得回调函数只显示一个文件"""
+        """上传大文件, 且使得回调函数只显示一个文件
+        各数据块直接从原文件中读取对应范围的数据进行上传，无需复制出临时文件，且最多同时上传 _upload_threads 个数据块
+        """
         if self._limit_mode:  # 不允许绕过官方限制
             return LanZouCloud.OFFICIAL_LIMITED
 
         file_size = os.path.getsize(file_path)  # 原始文件的字节大小
         file_name = os.path.basename(file_path)
-        tmp_dir = os.path.dirname(file_path) + os.sep + '__' + '.'.join(file_name.split('.')[:-1])  # 临时文件保存路径
+        tmp_dir = os.path.dirname(file_path) + os.sep + '__' + '.'.join(file_name.split('.')[:-1])  # 记录文件保存路径
         record_file = tmp_dir + os.sep + file_name + '.record'  # 记录文件，大文件没有完全上传前保留，用于支持续传
-        uploaded_size = 0  # 记录已上传字节数，用于回调函数
 
         if not os.path.exists(tmp_dir):
             os.makedirs(tmp_dir)
         if not os.path.exists(record_file):  # 初始化记录文件
             info = {'name': file_name, 'size': file_size, 'uploaded': 0, 'parts': []}
-            with open(record_file, 'wb') as f:
-                pickle.dump(info, f)
         else:
             with open(record_file, 'rb') as f:
                 info = pickle.load(f)
-                uploaded_size = info['uploaded']  # 读取已经上传的大小
-                logger.debug(f"Find upload record: {uploaded_size}/{file_size}")
+                logger.debug(f"Find upload record: {info['uploaded']}/{file_size}")
+
+        # 预先规划好各数据块的文件名和在原文件中的范围: [文件名, 起始位置, 大小]
+        # 旧版本的记录文件中没有规划，已上传的数据块都在文件开头，从已上传的位置继续规划即可
+        if 'plan' not in info:
+            plan = [[name, None, None] for name in info['parts']]
+            start = info['uploaded']
+            while start < file_size:
+                part_size = min(random_part_size(self._max_size), file_size - start)
+                plan.append([random_part_name(file_name), start, part_size])
+                start += part_size
+            info['plan'] = plan
+        finished = set(info['parts'])
+
+        lock = threading.Lock()
+        uploading_size = {}  # 正在上传的数据块 -> 已上传大小
+
+        def _save_record():
+            with open(record_file, 'wb') as f:
+                logger.debug(f"Update record file: {info['uploaded']}/{file_size}")
+                pickle.dump(info, f)
 
         def _callback(name, t_size, now_size):  # 重新封装回调函数，隐藏数据块上传细节
-            nonlocal uploaded_size
-            if callback is not None:
-                # MultipartEncoder 以后,文件数据流比原文件略大几百字节, now_size 略大于 file_size
-                now_size = uploaded_size + now_size
-                now_size = now_size if now_size < file_size else file_size  # 99.99% -> 100.00%
-                callback(file_name, file_size, now_size)
+            with lock:
+                uploading_size[name] = now_size
+                if callback is not None:
+                    # MultipartEncoder 以后,文件数据流比原文件略大几百字节, now_size 略大于 file_size
+                    total_now_size = info['uploaded'] + sum(uploading_size.values())
+                    total_now_size = total_now_size if total_now_size < file_size else file_size  # 99.99% -> 100.00%
+                    callback(file_name, file_size, total_now_size)
 
         def _close_pwd(fid, is_file):  # 数据块上传后默认关闭提取码
             self.set_passwd(fid)
 
-        while uploaded_size < file_size:
-            data_size, data_path = big_file_split(file_path, self._max_size, start_byte=uploaded_size)
-            code = self._upload_small_file(data_path, dir_id, callback=_callback, uploaded_handler=_close_pwd)
-            if code == LanZouCloud.SUCCESS:
-                uploaded_size += data_size  # 更新已上传的总字节大小
-                info['uploaded'] = uploaded_size
-                info['parts'].append(os.path.basename(data_path))  # 记录已上传的文件名
-                with open(record_file, 'wb') as f:
-                    logger.debug(f"Update record file: {uploaded_size}/{file_size}")
-                    pickle.dump(info, f)
-            else:
-                logger.debug(f"Upload data file failed: data_path={data_path}")
-                return LanZouCloud.FAILED
-            os.remove(data_path)  # 删除临时数据块
-            min_s, max_s = self._upload_delay  # 设置两次上传间的延时，减小封号可能性
+        start_lock = threading.Lock()
+        next_start_time = [0.0]
+
+        def _wait_for_start():  # 各数据块开始上传的时间也需要错开 upload_delay，避免多个线程同时提交
+            with start_lock:
+                wait_time = next_start_time[0] - time.time()
+                if wait_time > 0:
+                    logger.debug(f"Sleeping, Upload part will start after {wait_time:.2f}s...")
+                    sleep(wait_time)
+                min_s, max_s = self._upload_delay
+                next_start_time[0] = time.time() + uniform(min_s, max_s)
+
+        def _upload_part(part) -> int:
+            name, start, part_size = part
+            _wait_for_start()
+            with FileRangeView(file_path, start, part_size) as data:
+                code = self._upload_stream(name, data, dir_id, callback=_callback, uploaded_handler=_close_pwd)
+            with lock:
+                uploading_size.pop(name, None)
+                if code == LanZouCloud.SUCCESS:
+                    info['uploaded'] += part_size  # 更新已上传的总字节大小
+                    info['parts'].append(name)  # 记录已上传的文件名
+                    _save_record()
+            if code != LanZouCloud.SUCCESS:
+                logger.debug(f"Upload data part failed: {name}, range={start}+{part_size}")
+                return code
+            min_s, max_s = self._upload_delay  # 设置同一个上传线程两次上传间的延时，减小封号可能性
             sleep_time = uniform(min_s, max_s)
             logger.debug(f"Sleeping, Upload task will resume after {sleep_time:.2f}s...")
             sleep(sleep_time)
+            return LanZouCloud.SUCCESS
+
+        _save_record()
+        with ThreadPoolExecutor(self._upload_threads) as pool:
+            codes = list(pool.map(_upload_part, [part for part in info['plan'] if part[0] not in finished]))
+        if any(code != LanZouCloud.SUCCESS for code in codes):
+            return LanZouCloud.FAILED
 
-        # 全部数据块上传完成
+        # 全部数据块上传完成，上传的记录文件中的数据块需按在原文件中的顺序排列，且 parts 需要是最后一个字段
+        record = {'name': file_name, 'size': file_size, 'uploaded': info['uploaded'], 'parts': [part[0] for part in info['plan']]}
         record_name = list(file_name.replace('.', ''))  # 记录文件名也打乱
         shuffle(record_name)
         record_name = name_format(''.join(record_name)) + '.txt'
-        record_file_new = tmp_dir + os.sep + record_name
-        os.rename(record_file, record_file_new)
-        code = self._upload_small_file(record_file_new, dir_id, uploaded_handler=_close_pwd)  # 上传记录文件
+        code = self._upload_stream(record_name, io.BytesIO(pickle.dumps(record)), dir_id, uploaded_handler=_close_pwd)  # 上传记录文件
         if code != LanZouCloud.SUCCESS:
-            logger.debug(f"Upload record file failed: {record_file_new}")
+            logger.debug(f"Upload record file failed: {record_name}")
             return LanZouCloud.FAILED
         # 记录文件上传成功，删除临时文件
         shutil.rmtree(tmp_dir)
@@ -1012,27 +1075,39 @@ class LanZouCloud(object):
         if not content_length:
             return LanZouCloud.FAILED  # 应该不会出现这种情况
 
-        # 支持断点续传下载
-        now_size = 0
-        if os.path.exists(tmp_file_path):
-            now_size = os.path.getsize(tmp_file_path)  # 本地已经下载的文件大小
-        headers = {**self._headers, 'Range': 'bytes=%d-' % now_size}
-        resp = self._get(info.durl, stream=True, headers=headers)
-
-        if resp is None:  # 网络异常
-            return LanZouCloud.FAILED
-        if resp.status_code == 416:  # 已经下载完成
-            return LanZouCloud.SUCCESS
+        # 支持断点续传下载，记录文件中保存了各个数据段的下载进度
+        total_size = int(content_length)
+        record_file = tmp_file_path + '.record'
+        record = None
+        if os.path.exists(record_file) and os.path.exists(tmp_file_path):
+            with open(record_file, 'rb') as rf:
+                record = pickle.load(rf)
+            logger.debug(f"Find download record file: {record}")
+            if record.get('size') != total_size:  # 服务器上的文件已经变化，重新下载
+                logger.debug(f"File size changed, download again")
+                os.remove(tmp_file_path)
+                record = None
+        if record is None:
+            now_size = 0
+            if os.path.exists(tmp_file_path):
+                # 旧版本顺序下载时中断留下的文件，文件大小即为已下载的大小
+                now_size = min(os.path.getsize(tmp_file_path), total_size)
+            record = {'size': total_size, 'ranges': self._split_range(now_size, total_size)}
+            if now_size > 0:
+                record['ranges'].insert(0, [0, now_size, now_size])
+
+        def _save_record():
+            with open(record_file, 'wb') as rf:
+                pickle.dump(record, rf)
 
-        with open(tmp_file_path, "ab") as f:
-            file_name = os.path.basename(file_path)
-            for chunk in resp.iter_content(4096):
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
-                    now_size += len(chunk)
-                    if callback is not None:
-                        callback(file_name, int(content_length), now_size)
+        resp.close()
+        _save_record()  # 需要在预分配空间前保存，否则中断后会把预分配的文件大小误认为已下载的大小
+        self._preallocate(tmp_file_path, total_size)
+        tasks = [(info.durl, r[0], r) for r in record['ranges']]
+        code = self._down_ranges(tmp_file_path, os.path.basename(file_path), total_size, tasks, _save_record, callback=callback)
+        if code != LanZouCloud.SUCCESS:
+            return code
+        os.remove(record_file)
 
         # 下载完成
         if os.path.exists(file_path):
@@ -1075,6 +1150,15 @@ class LanZouCloud(object):
             downloaded_handler(os.path.abspath(file_path))
         return LanZouCloud.SUCCESS
 
+    def get_durl_range(self, durl, start, end):
+        """获取直链中 [start, end] 范围数据的流式响应，失败时返回 None"""
+        headers = {**self._headers, 'Range': f'bytes={start}-{end}'}
+        resp = self._get(durl, stream=True, headers=headers)
+        if resp is None or resp.status_code != 206:
+            logger.debug(f"Get range failed: {headers['Range']}")
+            return None
+        return resp
+
     def down_file_by_id(self, fid, save_path='./Download', *, callback=None, overwrite=False,
                         downloaded_handler=None) -> int:
         """登录用户通过id下载文件(无需提取码)"""
@@ -1219,6 +1303,7 @@ class LanZouCloud(object):
     def _down_big_file(self, name, total_size, file_list, save_path, *, callback=None, overwrite=False,
                        downloaded_handler=None):
         """下载分段数据到一个文件，回调函数只显示一个文件
+        各数据块的直链会预先全部获取，然后并发下载各数据块(及数据块内的各个数据段)，并直接写入到预先分配好空间的文件的对应位置
         支持大文件下载续传，下载完成后重复下载不会执行覆盖操作，直接返回状态码 SUCCESS
         """
         if not os.path.exists(save_path):
@@ -1235,62 +1320,162 @@ class LanZouCloud(object):
                 record_file = big_file + '.record'
 
         if not os.path.exists(record_file):  # 初始化记录文件
-            info = {'last_ending': 0, 'finished': []}  # 记录上一个数据块结尾地址和已经下载的数据块
-            with open(record_file, 'wb') as rf:
-                pickle.dump(info, rf)
+            # 记录上一个数据块结尾地址、已经下载的数据块，以及未完成的数据块中各数据段的下载进度
+            info = {'last_ending': 0, 'finished': [], 'ranges': {}}
         else:  # 读取记录文件，下载续传
             with open(record_file, 'rb') as rf:
                 info = pickle.load(rf)
-                file_list = [f for f in file_list if f.name not in info['finished']]  # 排除已下载的数据块
                 logger.debug(f"Find download record file: {info}")
+            # 旧版本的记录文件是按顺序下载的，已完成的数据块都在文件开头，未完成数据块的已下载部分直接重新下载即可
+            info.setdefault('ranges', {})
 
-        file_name = os.path.basename(big_file)
-        with open(big_file, 'ab') as bf:
-            for file in file_list:
-                try:
-                    durl_info = self.get_durl_by_url(file.url)  # 分段文件无密码
-                except AttributeError:
-                    durl_info = self.get_durl_by_id(file.id)
-                if durl_info.code != LanZouCloud.SUCCESS:
-                    logger.debug(f"Can't get direct url: {file}")
-                    return durl_info.code
-                # 准备向大文件写入数据
-                file_size_now = os.path.getsize(big_file)
-                down_start_byte = file_size_now - info['last_ending']  # 当前数据块上次下载中断的位置
-                headers = {**self._headers, 'Range': 'bytes=%d-' % down_start_byte}
-                logger.debug(f"Download {file.name}, Range: {down_start_byte}-")
-                resp = self._get(durl_info.durl, stream=True, headers=headers)
-
-                if resp is None:  # 网络错误, 没有响应数据
-                    return LanZouCloud.FAILED
-                if resp.status_code == 416:  # 下载完成后重复下载导致 Range 越界, 服务器返回 416
-                    logger.debug(f"File {file_name} has already downloaded.")
-                    os.remove(record_file)  # 删除记录文件
-                    return LanZouCloud.SUCCESS
+        def _resolve(file):
+            try:
+                durl_info = self.get_durl_by_url(file.url)  # 分段文件无密码
+            except AttributeError:
+                durl_info = self.get_durl_by_id(file.id)
+            if durl_info.code != LanZouCloud.SUCCESS:
+                logger.debug(f"Can't get direct url: {file}")
+                return durl_info.code, '', 0
+            return LanZouCloud.SUCCESS, durl_info.durl, self._get_content_length(durl_info.durl)
+
+        # 预先并发获取所有数据块的直链和大小，从而确定每个数据块在文件中的位置
+        with ThreadPoolExecutor(self._down_threads) as pool:
+            resolved = list(pool.map(_resolve, file_list))
+
+        tasks = []
+        file_offset = 0
+        for file, (code, durl, size) in zip(file_list, resolved):
+            if code != LanZouCloud.SUCCESS:
+                return code
+            if size <= 0:
+                logger.debug(f"Can't get size of {file.name}")
+                return LanZouCloud.FAILED
+            if file.name not in info['finished']:
+                if file.name not in info['ranges']:
+                    info['ranges'][file.name] = self._split_range(0, size)
+                for r in info['ranges'][file.name]:
+                    tasks.append((durl, file_offset + r[0], r))
+            file_offset += size
+
+        if file_offset != total_size:
+            logger.debug(f"Size of parts is {file_offset}, but expected {total_size}")
+            return LanZouCloud.FAILED
 
-                try:
-                    for chunk in resp.iter_content(4096):
-                        if chunk:
-                            file_size_now += len(chunk)
-                            bf.write(chunk)
-                            bf.flush()  # 确保缓冲区立即写入文件，否则下一次写入时获取的文件大小会有偏差
-                            if callback:
-                                callback(file_name, total_size, file_size_now)
-                    # 一块数据写入完成，更新记录文件
-                    info['finished'].append(file.name)
-                finally:
-                    info['last_ending'] = file_size_now
-                    with open(record_file, 'wb') as rf:
-                        pickle.dump(info, rf)
-                    logger.debug(f"Update download record info: {info}")
-            # 全部数据块下载完成, 记录文件可以删除
-            logger.debug(f"Delete download record file: {record_file}")
-            os.remove(record_file)
+        def _save_record():
+            # 数据块的各数据段都下载完毕后，将其标记为已完成
+            for part_name, ranges in list(info['ranges'].items()):
+                if all(r[1] == r[2] for r in ranges):
+                    info['finished'].append(part_name)
+                    del info['ranges'][part_name]
+            with open(record_file, 'wb') as rf:
+                pickle.dump(info, rf)
+            logger.debug(f"Update download record info: {info}")
+
+        _save_record()
+        self._preallocate(big_file, total_size)
+        code = self._down_ranges(big_file, os.path.basename(big_file), total_size, tasks, _save_record, callback=callback)
+        if code != LanZouCloud.SUCCESS:
+            return code
+
+        # 全部数据块下载完成, 记录文件可以删除
+        logger.debug(f"Delete download record file: {record_file}")
+        os.remove(record_file)
 
         if downloaded_handler is not None:
             downloaded_handler(os.path.abspath(big_file))
         return LanZouCloud.SUCCESS
 
+    def _split_range(self, start, end) -> List[list]:
+        """将 [start, end) 拆分为若干个数据段，每个数据段为 [起始位置, 长度, 已下载长度]"""
+        size = end - start
+        if size <= 0:
+            return []
+        count = max(1, min(self._down_threads, size // self._down_min_segment_size))
+        segment_size = -(-size // count)  # 向上取整
+        return [[s, min(segment_size, end - s), 0] for s in range(start, end, segment_size)]
+
+    @staticmethod
+    def _preallocate(file_path, total_size):
+        """预先分配文件空间，以便各个连接直接写入各自的位置"""
+        mode = 'r+b' if os.path.exists(file_path) else 'wb'
+        with open(file_path, mode) as f:
+            f.truncate(total_size)
+
+    def _get_content_length(self, durl) -> int:
+        """获取直链对应文件的字节大小，获取失败时返回 0"""
+        resp = self._get(durl, stream=True)
+        if not resp:
+            return 0
+        resp.close()
+        return int(resp.headers.get('Content-Length', 0))
+
+    def _down_ranges(self, file_path, file_name, total_size, tasks, save_record, *, callback=None) -> int:
+        """并发下载各个数据段，并写入到文件的对应位置
+        :param tasks [(直链, 数据段在文件中的起始位置, 数据段[起始位置, 长度, 已下载长度])]，下载过程中会更新已下载长度
+        :param save_record 保存下载进度的函数，会按一定间隔调用，以支持续传
+        """
+        lock = threading.Lock()
+        now_size = total_size - sum(r[1] - r[2] for _, _, r in tasks)
+        last_callback_time = 0
+        last_record_time = time.time()
+
+        def _on_progress(size, force=False):
+            nonlocal now_size, last_callback_time, last_record_time
+            with lock:
+                now_size += size
+                now = time.time()
+                if callback is not None and (force or now - last_callback_time >= self._callback_interval):
+                    last_callback_time = now
+                    callback(file_name, total_size, now_size)
+                if force or now - last_record_time >= self._record_interval:
+                    last_record_time = now
+                    save_record()
+
+        def _down(durl, file_offset, r) -> int:
+            url_start, length, done = r
+            if done >= length:
+                return LanZouCloud.SUCCESS
+            headers = {**self._headers, 'Range': f'bytes={url_start + done}-{url_start + length - 1}'}
+            logger.debug(f"Download {file_name}, Range: {headers['Range']}")
+            resp = self._get(durl, stream=True, headers=headers)
+            if resp is None:  # 网络错误, 没有响应数据
+                return LanZouCloud.FAILED
+            if resp.status_code != 206 and not (resp.status_code == 200 and url_start + done == 0):
+                logger.debug(f"Unexpected status code {resp.status_code} for range {headers['Range']}")
+                return LanZouCloud.FAILED
+
+            try:
+                with open(file_path, 'r+b', buffering=0) as f:  # 数据块本身已经足够大，无需额外缓冲
+                    f.seek(file_offset + done)
+                    for chunk in resp.iter_content(self._down_chunk_size):
+                        chunk = chunk[:length - r[2]]
+                        if chunk:
+                            f.write(chunk)
+                            r[2] += len(chunk)
+                            _on_progress(len(chunk))
+                        if r[2] >= length:
+                            break
+            except requests.RequestException as e:
+                logger.debug(f"Download {file_name} failed, Range: {headers['Range']}, {e}")
+                return LanZouCloud.NETWORK_ERROR
+            finally:
+                resp.close()
+
+            return LanZouCloud.SUCCESS if r[2] >= length else LanZouCloud.FAILED
+
+        try:
+            with ThreadPoolExecutor(self._down_threads) as pool:
+                futures = [pool.submit(_down, *task) for task in tasks]
+                codes = [future.result() for future in as_completed(futures)]
+        finally:
+            _on_progress(0, force=True)
+
+        for code in codes:
+            if code != LanZouCloud.SUCCESS:
+                return code
+        return LanZouCloud.SUCCESS
+
     def down_dir_by_url(self, share_url, dir_pwd='', save_path='./Download', *, callback=None, mkdir=True,
                         overwrite=False, recursive=False,
                         failed_callback=None, downloaded_handler=None) -> int:
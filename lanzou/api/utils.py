@@ -12,7 +12,8 @@ from random import uniform, choices, sample, shuffle, choice
 import requests
 
 __all__ = ['logger', 'remove_notes', 'name_format', 'time_format', 'is_name_valid', 'is_file_url',
-           'is_folder_url', 'big_file_split', 'un_serialize', 'let_me_upload', 'auto_rename', 'calc_acw_sc__v2']
+           'is_folder_url', 'big_file_split', 'random_part_size', 'random_part_name', 'un_serialize', 'let_me_upload',
+           'let_me_upload_info', 'FileRangeView', 'auto_rename', 'calc_acw_sc__v2']
 
 # 调试日志设置
 logger = logging.getLogger('lanzou')
@@ -135,6 +136,23 @@ def un_serialize(data: bytes, _limit_mode: bool):
         return None
 
 
+def random_part_size(max_size: int = 100) -> int:
+    """按权重生成一个不超过 max_size(MB) 的数据块大小"""
+    reduce_size = choices([uniform(0, 20), uniform(20, 30), uniform(30, 60), uniform(60, 80)], weights=[2, 5, 2, 1])
+    return round((max_size - reduce_size[0]) * 1048576)
+
+
+def random_part_name(file_name: str) -> str:
+    """根据原文件名生成一个随机的数据块文件名"""
+    # 这些格式的文件一般都比较大且不容易触发下载检测
+    suffix_list = ('zip', 'rar', 'apk', 'ipa', 'exe', 'pdf', '7z', 'tar', 'deb', 'dmg', 'rpm', 'flac')
+    name = list(file_name.replace('.', '').replace(' ', ''))
+    name = name + sample('abcdefghijklmnopqrstuvwxyz', 3) + sample('1234567890', 2)
+    shuffle(name)  # 打乱顺序
+    name = ''.join(name) + '.' + choice(suffix_list)
+    return name_format(name)  # 确保随机名合法
+
+
 def big_file_split(file_path: str, max_size: int = 100, start_byte: int = 0) -> (int, str):
     """将大文件拆分为大小、格式随机的数据块, 可指定文件起始字节位置(用于续传)
     :return 数据块文件的大小和绝对路径
@@ -146,27 +164,12 @@ def big_file_split(file_path: str, max_size: int = 100, start_byte: int = 0) ->
     if not os.path.exists(tmp_dir):
         os.makedirs(tmp_dir)
 
-    def get_random_size() -> int:
-        """按权重生成一个不超过 max_size 的文件大小"""
-        reduce_size = choices([uniform(0, 20), uniform(20, 30), uniform(30, 60), uniform(60, 80)], weights=[2, 5, 2, 1])
-        return round((max_size - reduce_size[0]) * 1048576)
-
-    def get_random_name() -> str:
-        """生成一个随机文件名"""
-        # 这些格式的文件一般都比较大且不容易触发下载检测
-        suffix_list = ('zip', 'rar', 'apk', 'ipa', 'exe', 'pdf', '7z', 'tar', 'deb', 'dmg', 'rpm', 'flac')
-        name = list(file_name.replace('.', '').replace(' ', ''))
-        name = name + sample('abcdefghijklmnopqrstuvwxyz', 3) + sample('1234567890', 2)
-        shuffle(name)  # 打乱顺序
-        name = ''.join(name) + '.' + choice(suffix_list)
-        return name_format(name)  # 确保随机名合法
-
     with open(file_path, 'rb') as big_file:
         big_file.seek(start_byte)
         left_size = file_size - start_byte  # 大文件剩余大小
-        random_size = get_random_size()
+        random_size = random_part_size(max_size)
         tmp_file_size = random_size if left_size > random_size else left_size
-        tmp_file_path = tmp_dir + os.sep + get_random_name()
+        tmp_file_path = tmp_dir + os.sep + random_part_name(file_name)
 
         chunk_size = 524288  # 512KB
         left_read_size = tmp_file_size
@@ -182,8 +185,10 @@ def big_file_split(file_path: str, max_size: int = 100, start_byte: int = 0) ->
     return tmp_file_size, tmp_file_path
 
 
-def let_me_upload(file_path):
-    """允许文件上传"""
+def let_me_upload_info(file_path) -> (str, bytes):
+    """生成允许文件上传的伪装文件名，以及需要追加到文件尾部的 "报尾" 数据
+    :return 伪装后的文件名和报尾数据
+    """
     file_size = os.path.getsize(file_path) / 1024 / 1024  # MB
     file_name = os.path.basename(file_path)
 
@@ -192,7 +197,19 @@ def let_me_upload(file_path):
     big_file_suffix = choice(big_file_suffix)
     small_file_suffix = choice(small_file_suffix)
     suffix = small_file_suffix if file_size < 30 else big_file_suffix
-    new_file_path = '.'.join(file_path.split('.')[:-1]) + '.' + suffix
+    new_file_name = '.'.join(file_name.split('.')[:-1]) + '.' + suffix
+
+    # 构建文件 "报尾" 保存真实文件名,大小 512 字节
+    # 追加数据到文件尾部，并不会影响文件的使用，无需修改即可分享给其他人使用，自己下载时则会去除，确保数据无误
+    padding = 512 - len(file_name.encode('utf-8')) - 42  # 序列化后空字典占 42 字节
+    data = {'name': file_name, 'padding': b'\x00' * padding}
+    return new_file_name, pickle.dumps(data)
+
+
+def let_me_upload(file_path):
+    """允许文件上传"""
+    new_file_name, trailer = let_me_upload_info(file_path)
+    new_file_path = os.path.dirname(file_path) + os.sep + new_file_name
 
     with open(new_file_path, 'wb') as out_f:
         # 写入原始文件数据
@@ -201,15 +218,52 @@ def let_me_upload(file_path):
             while chunk:
                 out_f.write(chunk)
                 chunk = in_f.read(4096)
-        # 构建文件 "报尾" 保存真实文件名,大小 512 字节
-        # 追加数据到文件尾部，并不会影响文件的使用，无需修改即可分享给其他人使用，自己下载时则会去除，确保数据无误
-        padding = 512 - len(file_name.encode('utf-8')) - 42  # 序列化后空字典占 42 字节
-        data = {'name': file_name, 'padding': b'\x00' * padding}
-        data = pickle.dumps(data)
-        out_f.write(data)
+        out_f.write(trailer)
     return new_file_path
 
 
+class FileRangeView(object):
+    """文件中一段数据的只读视图，可在末尾附加额外数据，用于直接从原文件上传数据，而无需先复制出临时文件"""
+
+    def __init__(self, file_path, start, size, trailer=b''):
+        self._file = open(file_path, 'rb')
+        self._file.seek(start)
+        self._left = size  # 原文件中剩余未读取的大小
+        self._trailer = trailer
+        self._size = size + len(trailer)
+        self._pos = 0
+
+    def __len__(self):
+        return self._size
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1) -> bytes:
+        if size is None or size < 0:
+            size = self._size - self._pos
+
+        data = b''
+        if self._left > 0:
+            data = self._file.read(min(size, self._left))
+            self._left -= len(data)
+        if len(data) < size and self._left == 0:
+            trailer_start = self._pos + len(data) - (self._size - len(self._trailer))
+            data += self._trailer[trailer_start:trailer_start + size - len(data)]
+
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 def auto_rename(file_path) -> str:
     """如果文件存在，则给文件名添加序号"""
     if not os.path.exists(file_path):
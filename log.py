@@ -122,13 +122,9 @@ consoleHandler.setFormatter(consoleLogFormatter)
 consoleHandler.setLevel(logging.INFO)
 logger.addHandler(consoleHandler)
 
-try:
-    from lanzou.api.utils import logger as lanzou_logger
-
-    # 将lanzou的日志也显示
-    lanzou_logger.setLevel(logging.INFO)
-except Exception:
-    pass
+# 将lanzou的日志也显示。这里直接通过名称获取，避免为此提前导入整个lanzou模块，lanzou实际被导入时会再在 upload_lanzouyun 中同步一次
+lanzou_logger = logging.getLogger("lanzou")
+lanzou_logger.setLevel(logging.INFO)
 
 
 def color(color_name):
@@ -11,8 +11,11 @@ os.chdir(dirpath)
 import argparse
 
 from check_first_run import check_first_run_async
+from djc_helper import show_skipped_activities_stats
 from log import log_directory
 from main_def import *
+from network import show_circuit_breaker_stats
+from phase_runner import PhaseRunner
 from pool import close_pool, init_pool
 from show_usage import *
 from usage_count import *
@@ -57,6 +60,12 @@ def prepare_env():
 
 
 def main():
+    # 启动与收尾的各个步骤按依赖关系执行，互不依赖的步骤将在后台线程中并行进行，运行结束后会打印各步骤的时间线
+    runner = PhaseRunner("小助手")
+
+    # 活动开启关闭时调这个开关即可
+    enable_card_lottery = True
+
     increase_counter(name="run/begin", ga_type=ga.GA_REPORT_TYPE_PAGE_VIEW)
 
     prepare_env()
@@ -64,106 +73,138 @@ def main():
     # 启动时检查是否需要同步本机数据目录备份的旧版本配置
     try_load_old_version_configs_from_user_data_dir()
 
-    change_title()
-    show_ask_message_box_only_once()
-
     print_update_message_on_first_run_new_version()
 
     logger.warning(f"开始运行DNF蚊子腿小助手，ver={now_version} {ver_time}，powered by {author}")
     logger.warning(color("fg_bold_cyan") + "如果觉得我的小工具对你有所帮助，想要支持一下我的话，可以帮忙宣传一下或打开付费指引/支持一下.png，扫码打赏哦~")
 
-    # 读取配置信息
-    load_config("config.toml", "config.toml.local")
-    cfg = config()
-
-    if len(cfg.account_configs) == 0:
-        raise Exception("未找到有效的账号配置，请检查是否正确配置。ps：多账号版本配置与旧版本不匹配，请重新配置")
-
-    check_proxy(cfg)
-
-    try_report_usage_info(cfg)
-
-    if cfg.common.disable_cmd_quick_edit:
-        disable_quick_edit_mode()
-
-    show_notices()
-
-    if cfg.common.allow_only_one_instance:
-        logger.info("当前仅允许单个实例运行，将尝试干掉其他实例~")
-        async_call(kill_other_instance_on_start)
-    else:
-        logger.info("当前允许多个实例同时运行~")
-
-    init_pool(cfg.get_pool_size())
-
-    change_title(multiprocessing_pool_size=cfg.get_pool_size(), enable_super_fast_mode=cfg.common.enable_super_fast_mode)
-
-    show_multiprocessing_info(cfg)
+    # ---------------- 启动阶段 ----------------
+    def _load_config():
+        # 读取配置信息
+        load_config("config.toml", "config.toml.local")
+        if len(config().account_configs) == 0:
+            raise Exception("未找到有效的账号配置，请检查是否正确配置。ps：多账号版本配置与旧版本不匹配，请重新配置")
+
+    def _disable_quick_edit():
+        if config().common.disable_cmd_quick_edit:
+            disable_quick_edit_mode()
+
+    def _kill_other_instance():
+        if config().common.allow_only_one_instance:
+            logger.info("当前仅允许单个实例运行，将尝试干掉其他实例~")
+            async_call(kill_other_instance_on_start)
+        else:
+            logger.info("当前允许多个实例同时运行~")
+
+    def _show_pool_info():
+        cfg = config()
+        change_title(multiprocessing_pool_size=cfg.get_pool_size(), enable_super_fast_mode=cfg.common.enable_super_fast_mode)
 
-    account_names = []
-    for account_cfg in cfg.account_configs:
-        account_names.append(account_cfg.name)
+        show_multiprocessing_info(cfg)
 
-    logger.info(f"当前共配置{len(account_names)}个账号，具体如下：{account_names}")
+        account_names = [account_cfg.name for account_cfg in cfg.account_configs]
+        logger.info(f"当前共配置{len(account_names)}个账号，具体如下：{account_names}")
 
-    clean_dir_to_size(log_directory, cfg.common.max_logs_size * MiB, cfg.common.keep_logs_size * MiB)
-    clean_dir_to_size(f"utils/{log_directory}", cfg.common.max_logs_size * MiB, cfg.common.keep_logs_size * MiB)
+    def _clean_logs(dir_name: str):
+        cfg = config()
+        clean_dir_to_size(dir_name, cfg.common.max_logs_size * MiB, cfg.common.keep_logs_size * MiB)
+
+    runner.add("change_title", change_title)
+    runner.add("show_ask_message_box", show_ask_message_box_only_once)
+    runner.add("load_config", _load_config)
+    # 无视代理是通过环境变量全局生效的，因此需要在发起网络请求和创建进程池之前设置好
+    runner.add("check_proxy", lambda: check_proxy(config()), ["load_config"])
+    # 在后台并行发起启动阶段需要的各个网络请求，后续步骤将直接等待其结果
+    runner.add("startup_prefetch", lambda: start_startup_prefetch(config()), ["check_proxy"])
+    runner.add("show_notices", show_notices, ["startup_prefetch"])
+    runner.add("disable_quick_edit", _disable_quick_edit, ["load_config"])
+    runner.add("kill_other_instance", _kill_other_instance, ["load_config"])
+    runner.add("init_pool", lambda: init_pool(config().get_pool_size()), ["check_proxy"])
+    runner.add("show_pool_info", _show_pool_info, ["init_pool", "change_title"])
+    # 日志清理与账号的运行流程互不影响，可以一直在后台进行
+    runner.add("clean_logs", lambda: _clean_logs(log_directory), ["load_config"])
+    runner.add("clean_utils_logs", lambda: _clean_logs(f"utils/{log_directory}"), ["load_config"])
+
+    # ---------------- 正式运行 ----------------
+    def _run():
+        cfg = config()
+        if cfg.common.enable_pipeline_mode and can_use_pipeline_mode(cfg):
+            # 流水线模式下各账号登录完毕后立即开始运行，仅在后续需要所有账号都完成的步骤处等待
+            run_pipeline(cfg)
+        else:
+            check_all_skey_and_pskey(cfg)
 
-    check_all_skey_and_pskey(cfg)
+            check_djc_role_binding()
 
-    check_djc_role_binding()
+            # 确保道聚城绑定OK后在活动运行同时进行异步的弹窗提示
+            check_first_run_async(cfg)
 
-    # 确保道聚城绑定OK后在活动运行同时进行异步的弹窗提示
-    check_first_run_async(cfg)
+            # 挪到所有账号都登陆后再尝试自动更新，从而能够判定是否已购买DLC
+            try_auto_update(cfg)
 
-    # 挪到所有账号都登陆后再尝试自动更新，从而能够判定是否已购买DLC
-    try_auto_update(cfg)
+            # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
+            if cfg.common.check_update_on_start:
+                check_update(cfg)
 
-    # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
-    if cfg.common.check_update_on_start:
-        check_update(cfg)
+            show_accounts_status(cfg, "启动时展示账号概览")
 
-    show_accounts_status(cfg, "启动时展示账号概览")
+            # 预先尝试创建和加入固定队伍，从而每周第一次操作的心悦任务也能加到队伍积分中
+            try_join_xinyue_team(cfg)
 
-    # 预先尝试创建和加入固定队伍，从而每周第一次操作的心悦任务也能加到队伍积分中
-    try_join_xinyue_team(cfg)
+            # 正式进行流程
+            run(cfg)
 
-    # 正式进行流程
-    run(cfg)
+    runner.add("run", _run, ["change_title", "show_ask_message_box", "startup_prefetch", "show_notices", "disable_quick_edit", "kill_other_instance", "show_pool_info"], in_main_thread=True)
 
-    # 尝试领取心悦组队奖励
-    try_take_xinyue_team_award(cfg)
+    # ---------------- 收尾阶段 ----------------
+    def _send_cards():
+        # 尝试领取心悦组队奖励
+        try_take_xinyue_team_award(config())
 
-    # # 尝试派赛利亚出去打工
-    # try_xinyue_sailiyam_start_work(cfg)
+        # # 尝试派赛利亚出去打工
+        # try_xinyue_sailiyam_start_work(cfg)
 
-    # 活动开启关闭时调这个开关即可
-    enable_card_lottery = True
+        # 与领取组队奖励会用到相同账号的登录状态，因此依次进行
+        if enable_card_lottery:
+            auto_send_cards(config())
 
-    if enable_card_lottery:
-        auto_send_cards(cfg)
+    def _show_accounts_status():
+        cfg = config()
+        show_accounts_status(cfg, "运行完毕展示账号概览")
 
-    show_extra_infos(cfg)
-    show_accounts_status(cfg, "运行完毕展示账号概览")
+        if enable_card_lottery:
+            show_lottery_status("卡片赠送完毕后展示各账号抽卡卡片以及各礼包剩余可领取信息", cfg, need_show_tips=True)
 
-    if enable_card_lottery:
-        show_lottery_status("卡片赠送完毕后展示各账号抽卡卡片以及各礼包剩余可领取信息", cfg, need_show_tips=True)
+    def _check_update_on_end():
+        # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
+        if config().common.check_update_on_end:
+            check_update(config())
 
-    show_pay_info(cfg)
+    def _show_stats():
+        # 显示小助手的使用概览
+        if config().common._show_usage:
+            show_usage()
 
-    # 显示小助手的使用概览
-    if cfg.common._show_usage:
-        show_usage()
+        # 运行结束展示下多进程信息
+        show_multiprocessing_info(config())
 
-    # 运行结束展示下多进程信息
-    show_multiprocessing_info(cfg)
+        # 展示今日触发熔断的接口，以及因此节省的时间
+        show_circuit_breaker_stats()
 
-    # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
-    if cfg.common.check_update_on_end:
-        check_update(cfg)
+        # 展示今日因活动过期或失效而跳过的请求
+        show_skipped_activities_stats()
 
+    runner.add("send_cards", _send_cards, ["run"])
+    runner.add("show_extra_infos", lambda: show_extra_infos(config()), ["run"])
+    runner.add("show_pay_info", lambda: show_pay_info(config()), ["run"])
+    runner.add("check_update_on_end", _check_update_on_end, ["run"])
+    # 以下几个步骤主要是展示表格，排在前面的步骤之后，避免输出内容相互穿插
+    runner.add("show_accounts_status", _show_accounts_status, ["send_cards", "show_extra_infos", "show_pay_info"])
+    runner.add("show_stats", _show_stats, ["show_accounts_status", "check_update_on_end"])
     # 运行完毕备份配置到本机数据目录
-    try_save_configs_to_user_data_dir()
+    runner.add("save_configs", try_save_configs_to_user_data_dir, ["run"])
+
+    runner.run()
 
     increase_counter(name="run/end", ga_type=ga.GA_REPORT_TYPE_PAGE_VIEW)
 
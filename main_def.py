@@ -1,11 +1,15 @@
+import functools
 from multiprocessing import cpu_count, freeze_support
+from multiprocessing.pool import ApplyResult
 from sys import exit
 
+from check_first_run import check_first_run_async
 from config import AccountConfig, CommonConfig, Config, config, load_config
 from const import downloads_dir
 from dao import BuyInfo, BuyRecord
-from djc_helper import (DjcHelper, get_prize_names, is_new_version_ark_lottery,
-                        run_act)
+from djc_helper import (DjcHelper, get_prize_names,
+                        increase_skipped_activity_count,
+                        is_new_version_ark_lottery, run_act)
 from first_run import *
 from notice import NoticeManager
 from pool import get_pool, init_pool
@@ -14,7 +18,6 @@ from qzone_activity import QzoneActivity
 from setting import *
 from show_usage import *
 from update import check_update_on_start, get_update_info
-from upload_lanzouyun import Uploader
 from urls import Urls, get_not_ams_act_desc
 from usage_count import *
 from version import author
@@ -624,7 +627,10 @@ def show_accounts_status(cfg, ctx):
 
             rows.append(get_account_status(idx, account_config, cfg.common))
 
-    # 打印结果
+    show_accounts_status_table(rows)
+
+
+def show_accounts_status_table(rows: List[List]):
     heads = ["序号", "账号名", "启用状态", "聚豆余额", "聚豆历史总数", "心悦类型", "成就点", "勇士币", "心悦组队", "赛利亚", "心悦G分", "编年史", "年史碎片", "引导石", "赠送礼盒", "论坛代币券"]
     colSizes = [4, 12, 8, 8, 12, 10, 6, 6, 16, 12, 8, 14, 8, 6, 8, 10]
 
@@ -724,9 +730,12 @@ def run(cfg: Config):
                                         for _idx, account_config in enumerate(cfg.account_configs) if account_config.is_enabled()])
         else:
             logger.info(color("bold_cyan") + f"已启用超快速模式，将使用{cfg.get_pool_size()}个进程并发运行各个账号的各个活动，日志将完全不可阅读~")
-            activity_funcs_to_run = get_activity_funcs_to_run(cfg, user_buy_info)
+            activity_funcs_to_run, expired_activity_count = get_activity_funcs_to_run(cfg, user_buy_info)
+            enabled_account_configs = [account_config for account_config in cfg.account_configs if account_config.is_enabled()]
+            if expired_activity_count != 0:
+                increase_skipped_activity_count(expired_count=expired_activity_count * len(enabled_account_configs))
             get_pool().starmap(run_act, [(account_config, cfg.common, act_name, act_func.__name__)
-                                         for account_config in cfg.account_configs if account_config.is_enabled()
+                                         for account_config in enabled_account_configs
                                          for act_name, act_func in activity_funcs_to_run
                                          ])
     else:
@@ -742,6 +751,228 @@ def run(cfg: Config):
     _show_head_line(f"处理总计{len(cfg.account_configs)}个账户 共耗时 {used_time}")
 
 
+def run_pipeline(cfg: Config):
+    """
+    流水线模式：每个账号独立地依次完成 登录 -> 检查绑定 -> 加入固定队 -> 运行活动，无需等待其他账号
+    仅在确实需要所有账号都完成的地方（如领取组队奖励、赠送卡片）才在外部进行同步
+    """
+    if not has_any_account_in_normal_run(cfg):
+        logger.warning("未发现任何有效的账户配置，请检查配置文件")
+        pause()
+        exit(-1)
+
+    _show_head_line("已开启流水线模式，各账号登录完毕后将立即开始运行")
+
+    QQLogin(cfg.common).check_and_download_chrome_ahead()
+
+    # 先使用本地缓存的登录信息确定各账号的QQ，这样无需等所有账号都登录完毕，就可以判断是否购买了dlc和按月付费
+    # ps: 调用方需先通过 can_use_pipeline_mode 确认各账号均有缓存的登录信息，否则付费信息可能不完整
+    load_cached_login_info(cfg)
+
+    # 首次运行的提示均为异步弹窗，无需等待登录，提前进行
+    check_first_run_async(cfg)
+
+    try_auto_update(cfg)
+
+    # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
+    if cfg.common.check_update_on_start:
+        check_update(cfg)
+
+    _show_head_line("查询付费信息")
+    logger.warning("开始查询付费信息，请稍候~")
+    user_buy_info = get_user_buy_info(cfg.get_qq_accounts())
+    show_buy_info(user_buy_info, cfg, need_show_message_box=False)
+
+    # 上报付费使用情况
+    try_report_pay_info(cfg, user_buy_info)
+
+    start_time = datetime.datetime.now()
+
+    pool = get_pool()
+    enable_super_fast_mode = cfg.common.enable_multiprocessing and cfg.common.enable_super_fast_mode
+    activity_funcs_to_run, expired_activity_count = [], 0  # type: List[Tuple[str, Callable]], int
+    if enable_super_fast_mode:
+        # 仅超快速模式需要由主进程分发各个活动，其他情况下由各账号在运行时自行过滤
+        activity_funcs_to_run, expired_activity_count = get_activity_funcs_to_run(cfg, user_buy_info)
+
+    # 账号序号 -> 是否已完成道聚城绑定
+    idx_to_binded = {}  # type: Dict[int, bool]
+    pending_results = []  # type: List[ApplyResult]
+
+    def on_account_prepared(idx: int, binded: bool):
+        idx_to_binded[idx] = binded
+        if binded and enable_super_fast_mode:
+            # 该账号已准备完毕，立即将其各个活动提交到进程池中，无需等待其他账号
+            account_config = cfg.account_configs[idx - 1]
+            if expired_activity_count != 0:
+                increase_skipped_activity_count(expired_count=expired_activity_count)
+            for act_name, act_func in activity_funcs_to_run:
+                pending_results.append(pool.apply_async(run_act, (account_config, cfg.common, act_name, act_func.__name__)))
+
+    # 超快速模式下，准备阶段完成后由主进程将各个活动分发到进程池，否则在准备完毕后直接在当前进程中运行该账号的活动
+    run_activities_after_prepared = not enable_super_fast_mode
+
+    if cfg.common.enable_multiprocessing:
+        logger.info(f"已开启多进程模式({cfg.get_pool_size()})，各账号准备完毕后将并行运行~")
+
+        prepare_results = []  # type: List[Tuple[int, ApplyResult]]
+        if cfg.is_all_account_auto_login():
+            # 自动登录可以并行进行，登录也放到子进程中
+            for _idx, account_config in enumerate(cfg.account_configs):
+                idx = _idx + 1
+                if not account_config.is_enabled():
+                    continue
+
+                prepare_results.append((idx, pool.apply_async(pipeline_run_account, (idx, idx, account_config, cfg.common, user_buy_info, True, run_activities_after_prepared),
+                                                              callback=functools.partial(on_account_prepared, idx))))
+        else:
+            # 扫码登录需要依次进行，每当一个账号登录完毕，就立即将其后续流程提交到进程池，在扫下一个码的同时运行
+            qq2index = {}
+            for _idx, account_config in enumerate(cfg.account_configs):
+                idx = _idx + 1
+
+                djcHelper = do_check_all_skey_and_pskey(idx, 1, account_config, cfg.common, False)
+                if djcHelper is None:
+                    continue
+
+                check_duplicate_login_qq(qq2index, idx, djcHelper)
+
+                prepare_results.append((idx, pool.apply_async(pipeline_run_account, (idx, 1, account_config, cfg.common, user_buy_info, False, run_activities_after_prepared),
+                                                              callback=functools.partial(on_account_prepared, idx))))
+
+        for idx, result in prepare_results:
+            try:
+                result.get()
+            except Exception as e:
+                logger.error(f"第{idx}个账号在流水线中运行出错了", exc_info=e)
+
+        # 准备阶段的回调均已执行完毕，此时等待超快速模式下分发的各个活动
+        for result in pending_results:
+            try:
+                result.get()
+            except Exception as e:
+                logger.error("流水线中的活动运行出错了", exc_info=e)
+
+        logger.info("流水线运行完毕，串行加载缓存的登录信息到cfg变量中")
+        check_all_skey_and_pskey_silently_sync(cfg)
+    else:
+        qq2index = {}
+        for _idx, account_config in enumerate(cfg.account_configs):
+            idx = _idx + 1
+            if not account_config.is_enabled():
+                logger.info(f"第{idx}个账号({account_config.name})未启用，将跳过")
+                continue
+
+            djcHelper = do_check_all_skey_and_pskey(idx, 1, account_config, cfg.common, False)
+            check_duplicate_login_qq(qq2index, idx, djcHelper)
+
+            idx_to_binded[idx] = pipeline_run_account(idx, 1, account_config, cfg.common, user_buy_info, False, True)
+
+    # 未完成绑定的账号，在这里统一引导绑定后再运行
+    not_binded_indexes = [idx for idx, binded in sorted(idx_to_binded.items()) if not binded]
+    if len(not_binded_indexes) != 0:
+        logger.warning(color("bold_yellow") + f"第{not_binded_indexes}个账号尚未完成道聚城绑定，将在引导绑定后再运行这些账号")
+        check_djc_role_binding()
+        for idx in not_binded_indexes:
+            do_run(idx, cfg.account_configs[idx - 1], cfg.common, user_buy_info)
+
+    used_time = datetime.datetime.now() - start_time
+    _show_head_line(f"流水线处理总计{len(cfg.account_configs)}个账户 共耗时 {used_time}")
+
+
+def pipeline_run_account(idx: int, window_index: int, account_config: AccountConfig, common_config: CommonConfig, user_buy_info: BuyInfo, need_login: bool, run_activities: bool) -> bool:
+    """
+    流水线模式下单个账号的完整流程，返回是否已完成道聚城绑定（未绑定时将跳过后续流程，由主流程统一引导绑定）
+    """
+    if need_login:
+        djcHelper = do_check_all_skey_and_pskey(idx, window_index, account_config, common_config, False)
+        if djcHelper is None:
+            return True
+    else:
+        wait_a_while(idx)
+        djcHelper = DjcHelper(account_config, common_config)
+
+    logger.warning(color("fg_bold_yellow") + f"------------检查第{idx}个账户({account_config.name})的绑定情况------------")
+    if not djcHelper.check_djc_role_binding():
+        return False
+
+    # 预先尝试加入固定队伍，从而每周第一次操作的心悦任务也能加到队伍积分中
+    fixed_team = djcHelper.get_fixed_team()
+    if fixed_team is not None:
+        # 各账号并行运行时，仅由固定队的第一个成员负责创建队伍，避免两个成员同时各自创建
+        djcHelper.try_join_fixed_xinyue_team(allow_create=fixed_team.members[0] == djcHelper.qq())
+
+    if run_activities:
+        # 各账号不会同时完成登录，因此改为在各账号开始运行前分别展示其启动时的概览
+        _show_head_line(f"启动时展示第{idx}个账户({account_config.name})的概览")
+        show_accounts_status_table([get_account_status(idx, account_config, common_config)])
+
+        _show_head_line(f"开始处理第{idx}个账户({account_config.name})")
+
+        start_time = datetime.datetime.now()
+        djcHelper.run(user_buy_info)
+
+        used_time = datetime.datetime.now() - start_time
+        _show_head_line(f"处理第{idx}个账户({account_config.name}) 共耗时 {used_time}")
+
+    return True
+
+
+def can_use_pipeline_mode(cfg: Config) -> bool:
+    """
+    流水线模式需要在登录前根据缓存的登录信息确定各账号的QQ，从而查询付费信息
+    若有账号尚未缓存登录信息（如首次运行或新增了账号），则付费信息可能会因缺少这些QQ而被误判为未付费，此时改为使用分阶段的流程
+    """
+    load_cached_login_info(cfg)
+
+    missing_login_info_names = [account_config.name for account_config in cfg.account_configs
+                                if account_config.is_enabled() and not is_valid_qq(uin2qq(account_config.account_info.uin))]
+    if len(missing_login_info_names) != 0:
+        logger.warning(color("bold_yellow") + f"账号 {missing_login_info_names} 尚无本地缓存的登录信息，无法在登录前确定付费信息，本次将不使用流水线模式，待各账号均登录完毕后再统一运行")
+        return False
+
+    return True
+
+
+def load_cached_login_info(cfg: Config):
+    for account_config in cfg.account_configs:
+        if not account_config.is_enabled():
+            continue
+
+        # 创建时将读取本地缓存的uin/skey到账号配置中
+        DjcHelper(account_config, cfg.common)
+
+
+def start_startup_prefetch(cfg: Config):
+    """
+    读取配置后立即在后台并行发起启动阶段各个步骤需要用到的网络请求，使其与登录等步骤同时进行，后续步骤只需等待这些已在进行中的请求即可
+    """
+    prefetch_in_background("report_usage_info", try_report_usage_info, cfg)
+    prefetch_in_background("notices", NoticeManager)
+
+    if cfg.common.check_update_on_start and not cfg.common.bypass_proxy and not is_run_in_github_action() and not exists_auto_updater_dlc():
+        # 无视代理时，检查更新需要临时启用代理，而代理设置是全局生效的，无法仅对后台线程生效，因此这种情况下不预取
+        prefetch_in_background("update_info", get_update_info, cfg.common)
+
+    # 使用本地缓存的登录信息来确定各账号的QQ，从而无需等待登录完毕即可查询付费信息
+    load_cached_login_info(cfg)
+    qq_accounts = cfg.get_qq_accounts()
+    if len(qq_accounts) != 0 and all(is_valid_qq(qq) for qq in qq_accounts):
+        # 查询结果会写入缓存，之后使用同样的QQ列表查询付费信息和DLC信息时将直接使用
+        prefetch_in_background("user_buy_info", get_user_buy_info_from_server, qq_accounts)
+
+
+def check_duplicate_login_qq(qq2index: Dict[str, int], idx: int, djcHelper: DjcHelper):
+    qq = uin2qq(djcHelper.cfg.account_info.uin)
+    if qq in qq2index:
+        msg = f"第{idx}个账号的实际登录QQ {qq} 与第{qq2index[qq]}个账号的qq重复，是否重复扫描了？\n\n点击确认后，程序将清除本地登录记录，并退出运行。请重新运行并按顺序登录正确的账号~"
+        message_box(msg, "重复登录", color_name="fg_bold_red")
+        clear_login_status()
+        sys.exit(-1)
+
+    qq2index[qq] = idx
+
+
 @try_except(show_exception_info=False)
 def try_report_usage_info(cfg: Config):
     # 整体使用次数
@@ -790,8 +1021,16 @@ def try_report_pay_info(cfg: Config, user_buy_info: BuyInfo):
             increase_counter(ga_category="game_qq_count", name=len(user_buy_info.game_qqs))
 
 
-def get_activity_funcs_to_run(cfg: Config, user_buy_info: BuyInfo) -> List[Tuple[str, Callable]]:
-    return DjcHelper(cfg.account_configs[0], cfg.common).get_activity_funcs_to_run(user_buy_info)
+def get_activity_funcs_to_run(cfg: Config, user_buy_info: BuyInfo) -> Tuple[List[Tuple[str, Callable]], int]:
+    """
+    超快速模式下由主进程统一过滤出需要运行的活动，返回这些活动以及被过滤掉的过期活动数目
+    跳过的活动数目由调用方在实际为各个账号分发活动时按账号计入统计
+    """
+    djcHelper = DjcHelper(cfg.account_configs[0], cfg.common)
+    all_activity_funcs = djcHelper.get_all_activity_funcs(user_buy_info)
+    activity_funcs_to_run = djcHelper.filter_expired_activities(all_activity_funcs, record_skipped=False)
+
+    return activity_funcs_to_run, len(all_activity_funcs) - len(activity_funcs_to_run)
 
 
 def show_activities_summary(cfg: Config, user_buy_info: BuyInfo):
@@ -840,6 +1079,9 @@ def try_take_xinyue_team_award(cfg: Config):
         djcHelper = DjcHelper(account_config, cfg.common)
         djcHelper.check_skey_expired()
         djcHelper.get_bind_role_list()
+        if cfg.common.enable_pipeline_mode:
+            # 流水线模式下，非首个成员可能在队伍创建前就已运行过加入流程，这里再尝试加入一次
+            djcHelper.try_join_fixed_xinyue_team()
         djcHelper.xinyue_battle_ground_op("领取默契奖励点", "749229")
 
 
@@ -982,6 +1224,8 @@ def check_update(cfg):
         "若有新版本会自动弹窗提示~\n"
         "++++++++++++++++++++++++++++++++++++++++\n"
     ))
+    # 等待启动时预取的更新信息，之后检查更新时将直接使用其缓存
+    wait_prefetch("update_info")
     check_update_on_start(cfg.common)
 
 
@@ -1073,11 +1317,16 @@ def show_tips(cfg):
 
 
 def try_auto_update(cfg):
+    from upload_lanzouyun import Uploader
+
     try:
         if not cfg.common.auto_update_on_start:
             logger.info(color("bold_cyan") + "已关闭自动更新功能，将跳过。可在配置工具的公共配置区域进行配置")
             return
 
+        # 等待启动时预取的付费信息，后续判断是否购买DLC时可直接使用其缓存
+        wait_prefetch("user_buy_info")
+
         pid = os.getpid()
         exe_path = sys.argv[0]
         dirpath, filename = os.path.dirname(exe_path), os.path.basename(exe_path)
@@ -1217,6 +1466,7 @@ def has_buy_auto_updater_dlc_and_query_ok(qq_accounts: List[str], max_retry_coun
     logger.debug("服务器查询DLC信息失败，尝试直接从网盘查询~")
     for idx in range(max_retry_count):
         try:
+            from upload_lanzouyun import Uploader
             uploader = Uploader()
             has_no_users = True
             for remote_filename in [uploader.buy_auto_updater_users_filename, uploader.cs_buy_auto_updater_users_filename]:
@@ -1269,6 +1519,9 @@ def infer_has_buy_auto_updater_dlc_from_server_buy_info(user_buy_info: BuyInfo)
 def get_user_buy_info(qq_accounts: List[str], max_retry_count=3, retry_wait_time=5, show_log=False, show_dlc_info=True) -> BuyInfo:
     logger.info(f"如果卡在这里不能动，请先看看网盘里是否有新版本~ 如果新版本仍无法解决，可加群反馈~ 链接：{config().common.netdisk_link}")
 
+    # 等待启动时预取的付费信息，若QQ列表一致，则下面将直接使用其缓存
+    wait_prefetch("user_buy_info")
+
     logger.debug("尝试由服务器代理查询付费信息，请稍候片刻~")
     user_buy_info, query_ok = get_user_buy_info_from_server(qq_accounts)
     if query_ok:
@@ -1337,6 +1590,7 @@ def get_user_buy_info_from_netdisk(qq_accounts: List[str], max_retry_count=3, re
             # 默认设置首个qq为购买信息
             default_user_buy_info.qq = qq_accounts[0]
 
+            from upload_lanzouyun import Uploader
             uploader = Uploader()
             has_no_users = True
 
@@ -1468,8 +1722,8 @@ def show_multiprocessing_info(cfg: Config):
 
 def show_notices():
     def _cb():
-        # 初始化
-        nm = NoticeManager()
+        # 初始化，优先使用启动时预取的公告
+        nm = wait_prefetch("notices") or NoticeManager()
         # 展示公告
         nm.show_notices()
 
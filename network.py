@@ -4,6 +4,7 @@ import requests
 
 from config import *
 from dao import ResponseInfo
+from db import CircuitBreakerDB, CircuitBreakerInfo
 from log import logger
 
 jsonp_callback_flag = "jsonp_callback"
@@ -32,7 +33,13 @@ class Network:
         }
 
     def get(self, ctx, url, pretty=False, print_res=True, is_jsonp=False, is_normal_jsonp=False, need_unquote=True, extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None,
-            extra_headers: Optional[Dict[str, str]] = None):
+            extra_headers: Optional[Dict[str, str]] = None, shared=False):
+        """
+        :param shared: 返回内容与账号无关时可设为True，此时将在各账号（进程）间共享一段时间内的结果
+        """
+        if shared:
+            return with_shared_response_cache(ctx, url, None, lambda: self.get(ctx, url, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers))
+
         def request_fn():
             cookies = self.base_cookies + extra_cookies
             get_headers = {**self.base_headers, **{
@@ -42,11 +49,17 @@ class Network:
                 get_headers = {**get_headers, **extra_headers}
             return requests.get(url, headers=get_headers, timeout=self.common_cfg.http_timeout)
 
-        res = try_request(request_fn, self.common_cfg.retry, check_fn)
+        res = try_request(request_fn, self.common_cfg.retry, check_fn, url)
         return process_result(ctx, res, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote)
 
     def post(self, ctx, url, data=None, json=None, pretty=False, print_res=True, is_jsonp=False, is_normal_jsonp=False, need_unquote=True, extra_cookies="", check_fn: Callable[[requests.Response], Optional[Exception]] = None,
-             extra_headers: Optional[Dict[str, str]] = None):
+             extra_headers: Optional[Dict[str, str]] = None, shared=False):
+        """
+        :param shared: 返回内容与账号无关时可设为True，此时将在各账号（进程）间共享一段时间内的结果
+        """
+        if shared:
+            return with_shared_response_cache(ctx, url, data or json, lambda: self.post(ctx, url, data, json, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote, extra_cookies, check_fn, extra_headers))
+
         def request_fn():
             cookies = self.base_cookies + extra_cookies
             content_type = "application/x-www-form-urlencoded"
@@ -61,17 +74,70 @@ class Network:
                 post_headers = {**post_headers, **extra_headers}
             return requests.post(url, data=data, json=json, headers=post_headers, timeout=self.common_cfg.http_timeout)
 
-        res = try_request(request_fn, self.common_cfg.retry, check_fn)
+        res = try_request(request_fn, self.common_cfg.retry, check_fn, url)
         logger.debug(f"{data}")
         return process_result(ctx, res, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote)
 
 
-def try_request(request_fn, retryCfg, check_fn: Callable[[requests.Response], Optional[Exception]] = None):
+# 共享请求结果的缓存时长
+shared_response_cache_seconds = 5 * 60
+
+# 这些参数用于标识账号（登录凭据）或仅用于防止缓存，计算共享缓存的key时将忽略它们
+# 注意：角色与大区相关的参数（如 sRoleId、sArea、sPartition、uniqueRoleId）会影响返回内容，需保留在key中，从而仅在同一角色的请求间共享
+user_identifying_params = {
+    "uin", "skey", "p_skey", "p_tk", "g_tk", "openid", "access_token", "acctype",
+    "sDeviceID", "sDjcSign", "sSDID", "userId", "token",
+    "_", "t", "r", "rand", "random", "sMiloTag",
+}
+
+
+def with_shared_response_cache(ctx, url: str, data, fetch_fn: Callable[[], Any]):
+    """
+    对于与账号无关的请求，在各账号（进程）间共享一段时间内的结果
+    注意：仅可用于返回内容不包含任何账号相关信息的请求，否则将会把一个账号的数据共享给其他账号
+    """
+    cache_key = get_shared_response_cache_key(url, data)
+    logger.debug(f"{ctx} 使用共享缓存 key={cache_key}")
+
+    return with_cache(cache_name_shared_response, cache_key, fetch_fn,
+                      cache_validate_func=lambda res: res is not None,
+                      cache_max_seconds=shared_response_cache_seconds)
+
+
+def get_shared_response_cache_key(url: str, data=None) -> str:
+    parsed = parse.urlparse(url)
+
+    key = parsed.netloc + parsed.path
+    query = remove_user_identifying_params(parse.parse_qsl(parsed.query, keep_blank_values=True))
+    if query != "":
+        key += "?" + query
+
+    if data is not None:
+        if type(data) is dict:
+            data = remove_user_identifying_params(list(data.items()))
+        else:
+            data = remove_user_identifying_params(parse.parse_qsl(str(data), keep_blank_values=True))
+        key += "|" + md5(data)
+
+    return key
+
+
+def remove_user_identifying_params(params: List[Tuple[str, Any]]) -> str:
+    return parse.urlencode(sorted((k, str(v)) for k, v in params if k not in user_identifying_params))
+
+
+def try_request(request_fn, retryCfg, check_fn: Callable[[requests.Response], Optional[Exception]] = None, url=""):
     """
     :param check_fn: func(requests.Response) -> bool
     :type retryCfg: RetryConfig
+    :param url: 请求的链接，用于按接口进行熔断，为空时不启用熔断
     """
+    endpoint = get_circuit_breaker_endpoint(url)
+    if circuit_breaker_is_open(endpoint, retryCfg):
+        return None
+
     for i in range(retryCfg.max_retry_count):
+        start_time = time.time()
         try:
             response = request_fn()  # type: requests.Response
             fix_encoding(response)
@@ -81,6 +147,7 @@ def try_request(request_fn, retryCfg, check_fn: Callable[[requests.Response], Op
                 if check_exception is not None:
                     raise check_exception
 
+            circuit_breaker_on_success(endpoint)
             return response
         except Exception as exc:
             def get_log_func(log_func):
@@ -89,17 +156,204 @@ def try_request(request_fn, retryCfg, check_fn: Callable[[requests.Response], Op
                 else:
                     return log_func
 
+            is_last_try = i + 1 == retryCfg.max_retry_count
+            wait_time = get_backoff_wait_time(retryCfg, i)
+
             extra_info = check_some_exception(exc)
-            get_log_func(logger.exception)("request failed, detail as below:" + extra_info, exc_info=exc)
-            stack_info = color("bold_black") + ''.join(traceback.format_stack())
-            get_log_func(logger.error)(f"full call stack=\n{stack_info}")
-            get_log_func(logger.warning)(color("thin_yellow") + f"{i + 1}/{retryCfg.max_retry_count}: request failed, wait {retryCfg.retry_wait_time}s。异常补充说明如下：{extra_info}")
-            if i + 1 != retryCfg.max_retry_count:
-                time.sleep(retryCfg.retry_wait_time)
+            if is_last_try:
+                get_log_func(logger.exception)("request failed, detail as below:" + extra_info, exc_info=exc)
+                stack_info = color("bold_black") + ''.join(traceback.format_stack())
+                get_log_func(logger.error)(f"full call stack=\n{stack_info}")
+            else:
+                # 中间的失败只简要提示，详细信息仅记录到日志文件中，避免刷屏
+                logger.debug("request failed, detail as below:" + extra_info, exc_info=exc)
+            get_log_func(logger.warning)(color("thin_yellow") + f"{i + 1}/{retryCfg.max_retry_count}: request failed, wait {wait_time:.1f}s。异常补充说明如下：{extra_info}")
+
+            if str(exc) != "请求过快":
+                # 请求过快只是临时被限频，不计入熔断
+                circuit_breaker_on_failure(endpoint, retryCfg, time.time() - start_time)
+                if is_circuit_open(endpoint, retryCfg):
+                    break
+
+            if not is_last_try:
+                time.sleep(wait_time)
 
     logger.error(f"重试{retryCfg.max_retry_count}次后仍失败")
 
 
+def get_backoff_wait_time(retryCfg, retry_index: int) -> float:
+    """
+    指数退避，并加上随机抖动，避免多个进程同时重试
+    :type retryCfg: RetryConfig
+    """
+    wait_time = min(retryCfg.retry_wait_time * (2 ** retry_index), retryCfg.max_retry_wait_time)
+    return wait_time * random.uniform(0.5, 1.0)
+
+
+def get_circuit_breaker_endpoint(url: str) -> str:
+    """
+    熔断的粒度为 域名+路径，若链接中带有用于区分具体接口或活动的参数（如活动ID），则进一步按这些参数区分
+    """
+    if url == "":
+        return ""
+
+    parsed = parse.urlparse(url)
+    endpoint = f"{parsed.netloc}{parsed.path}"
+
+    query = parse.parse_qs(parsed.query)
+    key_params = [(key, query[key][0]) for key in circuit_breaker_key_params if key in query]
+    if len(key_params) != 0:
+        endpoint += "?" + parse.urlencode(key_params)
+
+    return endpoint
+
+
+# 同一路径下通过这些参数区分实际调用的接口或活动，如道聚城的 _service、ams的 iActivityId、ide的 iChartId、各游戏的 sServiceType
+circuit_breaker_key_params = ["_service", "sServiceType", "iActivityId", "iChartId"]
+
+# 各进程中缓存的熔断数据库，仅在数据库文件被修改后才重新读取，避免每次请求都读取一次文件
+_circuit_breaker_db = None  # type: Optional[CircuitBreakerDB]
+_circuit_breaker_db_mtime = 0.0
+_circuit_breaker_db_lock = threading.Lock()
+
+
+def get_circuit_breaker_db() -> CircuitBreakerDB:
+    global _circuit_breaker_db, _circuit_breaker_db_mtime
+
+    with _circuit_breaker_db_lock:
+        db = CircuitBreakerDB()
+        try:
+            mtime = os.stat(db.prepare_env_and_get_db_filepath()).st_mtime
+        except OSError:
+            mtime = 0.0
+
+        if _circuit_breaker_db is None or mtime != _circuit_breaker_db_mtime:
+            _circuit_breaker_db = db.load()
+            _circuit_breaker_db_mtime = mtime
+
+        return _circuit_breaker_db
+
+
+def update_circuit_breaker_db(op: Callable[[CircuitBreakerDB], Any]):
+    # 在文件锁的保护下基于最新的数据进行修改，之后由下一次 get_circuit_breaker_db 根据文件的修改时间重新读取
+    CircuitBreakerDB().update(op)
+
+
+def circuit_breaker_enabled(endpoint: str, retryCfg) -> bool:
+    return endpoint != "" and retryCfg.circuit_breaker_failure_threshold > 0
+
+
+def is_circuit_open(endpoint: str, retryCfg) -> bool:
+    """
+    仅判断对应接口是否处于熔断状态，不记录任何统计信息
+    :type retryCfg: RetryConfig
+    """
+    if not circuit_breaker_enabled(endpoint, retryCfg):
+        return False
+
+    info = get_circuit_breaker_db().endpoint_to_info.get(endpoint)
+    return info is not None and now_before(info.open_until)
+
+
+def circuit_breaker_is_open(endpoint: str, retryCfg) -> bool:
+    """
+    在发起请求前判断对应接口是否处于熔断状态，若是则记录一次快速失败
+    :type retryCfg: RetryConfig
+    """
+    if not is_circuit_open(endpoint, retryCfg):
+        return False
+
+    info = get_circuit_breaker_db().endpoint_to_info[endpoint]
+
+    def _record_fail_fast(db: CircuitBreakerDB):
+        info = db.endpoint_to_info.get(endpoint)
+        if info is None:
+            # 可能在此期间被其他进程重置了
+            return
+        info.fail_fast_count += 1
+
+        # 估算如果正常重试所需花费的时间
+        average_attempt_seconds = 0.0
+        if info.failed_attempt_count != 0:
+            average_attempt_seconds = info.failed_attempt_seconds / info.failed_attempt_count
+        info.saved_seconds += sum(average_attempt_seconds + get_backoff_wait_time(retryCfg, i) for i in range(retryCfg.max_retry_count))
+
+    update_circuit_breaker_db(_record_fail_fast)
+    logger.warning(color("bold_yellow") + f"接口 {endpoint} 连续失败过多，处于熔断状态，将直接跳过请求，直至 {info.open_until}")
+
+    return True
+
+
+def circuit_breaker_on_success(endpoint: str):
+    if endpoint == "":
+        return
+
+    info = get_circuit_breaker_db().endpoint_to_info.get(endpoint)
+    if info is None or info.consecutive_failures == 0:
+        # 大部分情况下无需改动，避免每次请求都写一次文件
+        return
+
+    def _reset(db: CircuitBreakerDB):
+        info = db.endpoint_to_info.get(endpoint)
+        if info is not None:
+            info.consecutive_failures = 0
+
+    update_circuit_breaker_db(_reset)
+
+
+def circuit_breaker_on_failure(endpoint: str, retryCfg, used_seconds: float):
+    """
+    :type retryCfg: RetryConfig
+    """
+    if not circuit_breaker_enabled(endpoint, retryCfg):
+        return
+
+    def _record_failure(db: CircuitBreakerDB):
+        if endpoint not in db.endpoint_to_info:
+            db.endpoint_to_info[endpoint] = CircuitBreakerInfo()
+        info = db.endpoint_to_info[endpoint]
+
+        info.consecutive_failures += 1
+        info.failed_attempt_count += 1
+        info.failed_attempt_seconds += used_seconds
+
+        if info.consecutive_failures >= retryCfg.circuit_breaker_failure_threshold and not now_before(info.open_until):
+            # 触发熔断（冷却结束后的试探请求再次失败时，也会立即重新熔断）
+            now = get_now()
+            if info.last_trip_at == "" or get_today(parse_time(info.last_trip_at)) != get_today(now):
+                # 统计信息按天计算
+                info.trip_count = 0
+                info.fail_fast_count = 0
+                info.saved_seconds = 0.0
+
+            info.open_until = format_time(now + datetime.timedelta(seconds=retryCfg.circuit_breaker_cooldown_seconds))
+            info.trip_count += 1
+            info.last_trip_at = format_time(now)
+            logger.warning(color("bold_yellow") + f"接口 {endpoint} 已连续失败{info.consecutive_failures}次，将熔断至 {info.open_until}，期间所有账号都将直接跳过该接口")
+
+    update_circuit_breaker_db(_record_failure)
+
+
+def show_circuit_breaker_stats():
+    db = get_circuit_breaker_db()
+
+    today = get_today(get_now())
+    tripped_today = [(endpoint, info) for endpoint, info in db.endpoint_to_info.items()
+                     if info.last_trip_at != "" and get_today(parse_time(info.last_trip_at)) == today]
+    if len(tripped_today) == 0:
+        return
+
+    logger.info("")
+    show_head_line("今日触发熔断的接口", color("fg_bold_yellow"))
+
+    heads = ["接口", "熔断次数", "快速失败次数", "节省时长"]
+    colSizes = [80, 8, 12, 10]
+
+    logger.info(tableify(heads, colSizes))
+    for endpoint, info in tripped_today:
+        logger.info(color("fg_bold_yellow") + tableify([endpoint, info.trip_count, info.fail_fast_count, f"{info.saved_seconds:.1f}s"], colSizes, need_truncate=True))
+
+
 # 每次处理完备份一次最后的报错，方便出错时打印出来~
 last_response_info = None  # type: Optional[ResponseInfo]
 
@@ -5,7 +5,12 @@ from const import downloads_dir
 from data_struct import to_raw_type
 from first_run import *
 from update import version_less
-from upload_lanzouyun import Uploader
+
+
+def new_uploader():
+    # 蓝奏云相关模块导入较慢，仅在实际需要时再导入
+    from upload_lanzouyun import Uploader
+    return Uploader()
 
 
 class NoticeShowType:
@@ -100,7 +105,7 @@ class NoticeManager:
         logger.info("公告读取完毕")
 
     def download_latest_notices(self):
-        uploader = Uploader()
+        uploader = new_uploader()
 
         dirpath, filename = os.path.dirname(self.cache_path), os.path.basename(self.cache_path)
         uploader.download_file_in_folder(uploader.folder_online_files, filename, dirpath, try_compressed_version_first=True)
@@ -113,7 +118,7 @@ class NoticeManager:
             logger.info("公告存盘完毕")
 
         # 上传到网盘
-        uploader = Uploader()
+        uploader = new_uploader()
         with open("upload_cookie.json") as fp:
             cookie = json.load(fp)
         uploader.login(cookie)
@@ -0,0 +1,156 @@
+# 按照声明的依赖关系执行启动与收尾流程中的各个步骤，互不依赖的步骤会在线程中并行执行
+# 每次运行结束后会打印各步骤的时间线，方便看出 run 之外的固定开销都花在了哪里
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from typing import Callable, Dict, List, Optional
+
+from log import color, logger
+from util import show_head_line, tableify
+
+phase_pending = "等待中"
+phase_running = "运行中"
+phase_done = "已完成"
+phase_failed = "出错"
+phase_skipped = "未执行"
+
+
+class Phase:
+    def __init__(self, name: str, func: Callable, depends: List[str], in_main_thread: bool):
+        self.name = name
+        self.func = func
+        self.depends = depends
+        self.in_main_thread = in_main_thread
+
+        self.status = phase_pending
+        self.thread_name = ""
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def used_seconds(self) -> float:
+        return self.end_time - self.start_time
+
+
+class PhaseRunner:
+    def __init__(self, name: str, max_workers: int = 4, timeline_width: int = 40):
+        self.name = name
+        self.max_workers = max_workers
+        self.timeline_width = timeline_width
+
+        self.phases = {}  # type: Dict[str, Phase]
+        self.start_time = 0.0
+        self.end_time = 0.0
+
+    def add(self, name: str, func: Callable, depends: Optional[List[str]] = None, in_main_thread=False):
+        """
+        添加一个步骤，depends 中的步骤必须已经添加过，从而保证不会出现循环依赖
+        in_main_thread 为 True 时将在调用 run 的线程中执行，适用于耗时最长、需要响应 ctrl+c 的主流程
+        """
+        depends = depends or []
+        if name in self.phases:
+            raise ValueError(f"步骤 {name} 已经添加过了")
+        for depend in depends:
+            if depend not in self.phases:
+                raise ValueError(f"步骤 {name} 依赖的 {depend} 尚未添加")
+
+        self.phases[name] = Phase(name, func, depends, in_main_thread)
+
+    def run(self):
+        """
+        执行全部步骤，任一步骤出错时将不再启动新的步骤，待已经开始的步骤结束后抛出最先出现的异常
+        """
+        self.start_time = time.time()
+
+        pending = list(self.phases.values())
+        running = {}  # type: Dict[Future, Phase]
+        first_exception = None  # type: Optional[BaseException]
+
+        try:
+            with ThreadPoolExecutor(self.max_workers, thread_name_prefix="phase") as pool:
+                while True:
+                    ready = []  # type: List[Phase]
+                    if first_exception is None:
+                        ready = [phase for phase in pending if all(self.phases[depend].status == phase_done for depend in phase.depends)]
+                    for phase in ready:
+                        pending.remove(phase)
+
+                    # 先把可以在后台进行的步骤都提交出去，再在当前线程中执行主流程
+                    for phase in ready:
+                        if not phase.in_main_thread:
+                            running[pool.submit(self._run_phase, phase)] = phase
+
+                    main_thread_phases = [phase for phase in ready if phase.in_main_thread]
+                    for phase in main_thread_phases:
+                        exception = self._run_phase(phase)
+                        if exception is not None and first_exception is None:
+                            first_exception = exception
+                    if len(main_thread_phases) != 0:
+                        # 主流程结束后可能有新的步骤可以开始了
+                        continue
+
+                    if len(running) == 0:
+                        break
+
+                    done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        exception = future.result()
+                        if exception is not None and first_exception is None:
+                            first_exception = exception
+        finally:
+            self.end_time = time.time()
+            for phase in pending:
+                phase.status = phase_skipped
+
+            self.show_timeline()
+
+        if first_exception is not None:
+            raise first_exception
+
+    def _run_phase(self, phase: Phase) -> Optional[BaseException]:
+        phase.status = phase_running
+        phase.thread_name = "主线程" if phase.in_main_thread else threading.current_thread().name
+        phase.start_time = time.time()
+        try:
+            phase.func()
+            phase.status = phase_done
+            return None
+        except BaseException as e:
+            # 包括 sys.exit 产生的 SystemExit，交由 run 在调用方的线程中重新抛出
+            phase.status = phase_failed
+            return e
+        finally:
+            phase.end_time = time.time()
+
+    def show_timeline(self):
+        total_seconds = max(self.end_time - self.start_time, 1e-6)
+        started_phases = [phase for phase in self.phases.values() if phase.status not in [phase_pending, phase_skipped]]
+        started_phases.sort(key=lambda phase: phase.start_time)
+
+        logger.info("")
+        show_head_line(f"{self.name} 各步骤时间线（共 {total_seconds:.2f} 秒，每格约 {total_seconds / self.timeline_width:.2f} 秒）", color("fg_bold_cyan"))
+
+        heads = ["步骤", "线程", "开始", "耗时", "时间线"]
+        colSizes = [30, 14, 8, 8, self.timeline_width + 2]
+
+        logger.info(tableify(heads, colSizes))
+        for phase in started_phases:
+            offset = phase.start_time - self.start_time
+            logger.info(tableify([phase.name, phase.thread_name, f"{offset:.2f}s", f"{phase.used_seconds():.2f}s", self._timeline_bar(offset, phase.used_seconds())], colSizes, need_truncate=True))
+
+        for phase in self.phases.values():
+            if phase.status in [phase_pending, phase_skipped]:
+                logger.info(tableify([phase.name, phase.status, "", "", ""], colSizes, need_truncate=True))
+
+        sum_seconds = sum(phase.used_seconds() for phase in started_phases)
+        logger.info(color("bold_cyan") + f"各步骤耗时之和为 {sum_seconds:.2f} 秒，并行执行后实际耗时 {total_seconds:.2f} 秒")
+
+    def _timeline_bar(self, offset: float, used_seconds: float) -> str:
+        seconds_per_cell = max(self.end_time - self.start_time, 1e-6) / self.timeline_width
+
+        begin = min(int(offset / seconds_per_cell), self.timeline_width - 1)
+        # 耗时极短的步骤也至少显示一格，以便看出其开始的时机
+        end = min(max(int((offset + used_seconds) / seconds_per_cell), begin + 1), self.timeline_width)
+
+        return "|" + " " * begin + "#" * (end - begin) + " " * (self.timeline_width - end) + "|"
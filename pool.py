@@ -1,27 +1,97 @@
-from multiprocessing import Pool
+import multiprocessing
+import platform
+import queue
+import sys
+import threading
+import time
 from multiprocessing.pool import Pool as TPool
-from typing import Optional
+from typing import List, Optional
 
 from log import color, logger
 
 pool = None  # type: Optional[TPool]
 
+# 进程池中各个进程从开始创建到完成初始化（即导入完毕所需的各个模块）所用的秒数
+worker_ready_seconds = []  # type: List[float]
 
-def init_pool(pool_size):
+
+# forkserver 进程中预先导入的模块，其中会导入各个进程都需要的模块，并预先解析好只读的数据
+forkserver_preload_modules = ["pool_preload"]
+
+
+def init_pool(pool_size, use_forkserver: Optional[bool] = None):
     if pool_size <= 0:
         return
 
+    if use_forkserver is None:
+        use_forkserver = can_use_forkserver()
+
     global pool
-    pool = Pool(pool_size)
-    logger.info(color("bold_cyan") + f"进程池已初始化完毕，大小为 {pool_size}")
+    ctx = get_pool_context(use_forkserver)
+    ready_queue = ctx.Queue()
+    pool = ctx.Pool(pool_size, initializer=on_worker_ready, initargs=(ready_queue, time.time()))
+    logger.info(color("bold_cyan") + f"进程池已初始化完毕，大小为 {pool_size}，创建方式为 {ctx.get_start_method()}")
+
+    threading.Thread(target=collect_worker_ready_seconds, args=(ready_queue, pool_size), daemon=True).start()
+
+
+def can_use_forkserver() -> bool:
+    # 打包后的exe无法作为forkserver启动，而windows下仅支持spawn
+    return platform.system() == "Linux" and not getattr(sys, "frozen", False) and "forkserver" in multiprocessing.get_all_start_methods()
+
+
+def get_pool_context(use_forkserver: bool):
+    """
+    linux下使用forkserver：各个进程由预先导入好各个模块、解析好只读数据的单线程的forkserver进程fork而来，因此启动很快，且与之共享这部分内存。
+    同时也避免了直接从已经启动了多个后台线程的主进程fork，可能导致子进程中某些锁永远处于被持有的状态的问题
+    其他情况下则保持默认的创建方式
+    """
+    if not use_forkserver:
+        return multiprocessing.get_context()
+
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(forkserver_preload_modules)
+    return ctx
+
+
+def on_worker_ready(ready_queue, spawn_time: float):
+    ready_queue.put(time.time() - spawn_time)
+
+
+def collect_worker_ready_seconds(ready_queue, pool_size: int, timeout=120):
+    for _ in range(pool_size):
+        try:
+            worker_ready_seconds.append(ready_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+
+    if len(worker_ready_seconds) == 0:
+        return
+
+    avg_seconds = sum(worker_ready_seconds) / len(worker_ready_seconds)
+    max_seconds = max(worker_ready_seconds)
+    logger.info(f"进程池中已有{len(worker_ready_seconds)}/{pool_size}个进程就绪，从创建到就绪平均用时 {avg_seconds:.2f} 秒，最长 {max_seconds:.2f} 秒")
+
+    from usage_count import increase_counter
+    increase_counter(ga_category="pool_worker_ready_seconds", name=round(max_seconds, 1))
 
 
-def close_pool():
+def close_pool(join_timeout=10):
     if pool is None:
         return
 
     pool.close()
     logger.info(color("bold_cyan") + "程序运行完毕，将清理线程池，释放相应资源")
+    # 等待各个进程正常退出，从而让其在退出前将尚未上报的使用统计上报或暂存到本地，而不是在主进程退出时被直接终止
+    # 若仍有任务未完成（如出现异常或按下ctrl+c后），则最多等待一段时间，避免卡住程序退出
+    join_thread = threading.Thread(target=pool.join, daemon=True)
+    join_thread.start()
+    try:
+        join_thread.join(join_timeout)
+    finally:
+        if join_thread.is_alive():
+            logger.warning(f"等待进程池退出超过{join_timeout}秒，将直接终止各个进程")
+            pool.terminate()
 
 
 def get_pool() -> Optional[TPool]:
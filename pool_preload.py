@@ -0,0 +1,21 @@
+# 使用 forkserver 方式创建进程池时，forkserver 进程会预先导入本模块：导入各个进程都会用到的模块，并解析好只读的数据
+# 之后由 forkserver fork 出的各个进程将直接继承这些结果，并以写时复制的方式共享内存，无需再各自导入和解析一遍
+import gc
+import multiprocessing
+import os
+
+# forkserver 进程本身的进程名也是 MainProcess，需要在导入 log 之前改掉，从而让其与其他子进程一样读取主进程确定好的日志文件名，而不是另建一个日志文件
+multiprocessing.current_process().name = "ForkServer"
+
+import main_def  # noqa: F401
+from game_info import djc_biz_list_path, lazy_load
+from setting import dnf_server_list_config, zzconfig
+
+zzconfig()
+dnf_server_list_config()
+if os.path.isfile(djc_biz_list_path):
+    # 文件缺失时交由实际用到的地方去提示，forkserver 中无法与用户交互
+    lazy_load()
+
+# 将目前已有的对象移出垃圾回收的追踪范围，避免子进程中的垃圾回收遍历这些对象时触发写时复制
+gc.freeze()
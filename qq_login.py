@@ -2,24 +2,43 @@
 from collections import Counter
 from urllib.parse import parse_qs, quote_plus, unquote_plus
 
-from selenium import webdriver
-from selenium.common.exceptions import (StaleElementReferenceException,
-                                        TimeoutException)
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.support import expected_conditions
-from selenium.webdriver.support.ui import WebDriverWait
-
 from compress import decompress_dir_with_bandizip
 from config import *
-from upload_lanzouyun import Uploader
 from urls import get_act_url
 from util import async_message_box, get_screen_size
 from version import now_version
 
+# selenium 导入较慢，而只有实际需要打开浏览器登录时才会用到，因此推迟到首次创建 QQLogin 时再导入
+webdriver = None
+StaleElementReferenceException = None
+TimeoutException = None
+Options = None
+WebDriver = None
+ActionChains = None
+By = None
+DesiredCapabilities = None
+expected_conditions = None
+WebDriverWait = None
+
+
+def import_selenium():
+    global webdriver, StaleElementReferenceException, TimeoutException, Options, WebDriver, ActionChains, By, DesiredCapabilities, expected_conditions, WebDriverWait
+
+    if webdriver is not None:
+        return
+
+    from selenium import webdriver
+    from selenium.common.exceptions import (StaleElementReferenceException,
+                                            TimeoutException)
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.webdriver import WebDriver
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.desired_capabilities import \
+        DesiredCapabilities
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+
 
 # 在github action环境下登录异常
 class GithubActionLoginException(Exception):
@@ -97,6 +116,8 @@ class QQLogin():
     default_window_height = 360
 
     def __init__(self, common_config, window_index=1):
+        import_selenium()
+
         self.cfg = common_config  # type: CommonConfig
         self.driver = None  # type: Optional[WebDriver]
         self.window_title = ""
@@ -253,6 +274,7 @@ class QQLogin():
         logger.info("检查driver是否存在")
         if not os.path.isfile(self.chrome_driver_executable_path()):
             logger.info(color("bold_yellow") + f"未在小助手utils目录里发现 {chrome_driver_exe_name} ，将尝试从网盘下载")
+            from upload_lanzouyun import Uploader
             uploader = Uploader()
             uploader.download_file_in_folder(uploader.folder_djc_helper_tools, chrome_driver_exe_name, chrome_root_directory)
 
@@ -274,6 +296,7 @@ class QQLogin():
         # 尝试从网盘下载合适版本的便携版chrome
         if not os.path.isfile(self.chrome_binary_7z()):
             logger.info(color("bold_yellow") + f"本地未发现便携版chrome的压缩包，尝试自动从网盘下载 {zip_name}，需要下载大概80MB的压缩包，请耐心等候")
+            from upload_lanzouyun import Uploader
             uploader = Uploader()
             uploader.download_file_in_folder(uploader.folder_djc_helper_tools, zip_name, chrome_root_directory)
 
@@ -297,6 +320,7 @@ class QQLogin():
 
         # 走到这里，大概率是多线程并行下载导致文件出错了，尝试重新下载
         logger.info(color("bold_yellow") + "似乎chrome相关文件损坏了，尝试重新下载并解压")
+        from upload_lanzouyun import Uploader
         uploader = Uploader()
         uploader.download_file_in_folder(uploader.folder_djc_helper_tools, chrome_driver_exe_name, chrome_root_directory, cache_max_seconds=0, download_only_if_server_version_is_newer=False)
         uploader.download_file_in_folder(uploader.folder_djc_helper_tools, zip_name, chrome_root_directory, cache_max_seconds=0, download_only_if_server_version_is_newer=False)
@@ -400,7 +400,7 @@ class QzoneActivity:
         retry_cfg = self.djc_helper.common_cfg.retry
         for i in range(retry_cfg.max_retry_count):
             try:
-                res = try_request(request_fn, self.djc_helper.common_cfg.retry)
+                res = try_request(request_fn, self.djc_helper.common_cfg.retry, url=activity_page_url)
                 page_html = res.text
 
                 prefix_idx = page_html.index(data_prefix) + len(data_prefix)
@@ -438,6 +438,6 @@ class QzoneActivity:
         )
 
         request_fn = lambda: requests.post(url, raw_data, headers=self.headers, timeout=self.djc_helper.common_cfg.http_timeout)
-        res = try_request(request_fn, self.djc_helper.common_cfg.retry)
+        res = try_request(request_fn, self.djc_helper.common_cfg.retry, url=url)
         logger.debug(f"{raw_data}")
         return process_result(ctx, res, pretty, print_res)
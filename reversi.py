@@ -9,12 +9,12 @@ logger.removeHandler(fileHandler)
 logger.addHandler(new_file_handler())
 logger.setLevel(logging.INFO)
 
-import copy
 import random
 import sys
 import time
 from collections import Counter
 from datetime import datetime, timedelta
+from multiprocessing import cpu_count, freeze_support
 from typing import Callable, Dict, Optional, Tuple
 
 from PyQt5.Qt import (QApplication, QBrush, QDialog, QDialogButtonBox, QIcon,
@@ -24,6 +24,8 @@ from PyQt5.QtGui import QPixmap
 
 from log import asciiReset, color
 from qt_wrapper import *
+from reversi_engine import ParallelEngine, Position, SearchSettings
+from reversi_opening_book import OpeningBook
 from util import range_from_one
 
 board_size = 8
@@ -80,6 +82,10 @@ class ConfigDialog(QDialog):
         self.enable_presearch = create_checkbox(True)
         self.ai_dfs_presearch_depth = create_spin_box(2)
         self.ai_dfs_max_choice_per_depth = create_spin_box(5)
+        self.ai_parallel_workers = create_spin_box(min(max(cpu_count() - 1, 0), 7), maximum=cpu_count())
+        self.ai_endgame_empties = create_spin_box(12, maximum=64)
+        self.enable_opening_book = create_checkbox(True)
+        self.ai_max_extra_time_per_move = create_double_spin_box(3, maximum=99999)
 
         buttonBox = QDialogButtonBox(QDialogButtonBox.Ok, self)
 
@@ -94,6 +100,10 @@ class ConfigDialog(QDialog):
         layout.addRow("是否启用预搜索（加快搜索速度）", self.enable_presearch)
         layout.addRow("预搜索层数（越大速度越慢，精度越高）", self.ai_dfs_presearch_depth)
         layout.addRow("预搜索后实际最多搜索子节点数（越小速度越快，精度越小）", self.ai_dfs_max_choice_per_depth)
+        layout.addRow("并行搜索额外使用的进程数（越大同样时间内搜索越深，0表示仅单进程搜索）", self.ai_parallel_workers)
+        layout.addRow("剩余空位不超过该数目时直接计算出确切胜负（越大越慢，0表示不启用）", self.ai_endgame_empties)
+        layout.addRow("是否使用开局库（需先通过 _build_reversi_opening_book.py 生成）", self.enable_opening_book)
+        layout.addRow("命中开局库节省的时间，之后每步搜索最多可额外使用多少秒（最大等待时间加上该值也需避免超出30秒）", self.ai_max_extra_time_per_move)
         layout.addWidget(buttonBox)
 
         buttonBox.accepted.connect(self.accept)
@@ -123,6 +133,8 @@ class Reversi(QWidget):
         # ai托管，默认不托管
         self.ai_cells = {}
         self.ai_to_avg_stat = {}  # type: Dict[int, AvgStat]
+        # 各方命中开局库时未用完的思考时间，之后搜索时可以额外使用
+        self.ai_to_time_bank = {}  # type: Dict[int, float]
 
         self.ai_moving = False
 
@@ -140,6 +152,27 @@ class Reversi(QWidget):
         self.enable_presearch = cd.enable_presearch.isChecked()
         self.ai_dfs_max_choice_per_depth = cd.ai_dfs_max_choice_per_depth.value()
         self.ai_dfs_presearch_depth = cd.ai_dfs_presearch_depth.value()
+        self.ai_parallel_workers = cd.ai_parallel_workers.value()
+        self.ai_endgame_empties = cd.ai_endgame_empties.value()
+        self.enable_opening_book = cd.enable_opening_book.isChecked()
+        self.ai_max_extra_time_per_move = cd.ai_max_extra_time_per_move.value()
+
+        # 复用同一个引擎，以便置换表中的结果可以在之后的落子中继续使用，同时避免每局都重新启动并行搜索进程
+        settings = SearchSettings()
+        settings.max_depth = self.ai_dfs_max_depth
+        settings.max_seconds = self.ai_max_decision_time.total_seconds()
+        settings.enable_presearch = self.enable_presearch
+        settings.presearch_depth = self.ai_dfs_presearch_depth
+        settings.max_choice_per_depth = self.ai_dfs_max_choice_per_depth
+        settings.parallel_workers = self.ai_parallel_workers
+        settings.endgame_empties = self.ai_endgame_empties
+        if getattr(self, "ai_engine", None) is None:
+            self.ai_engine = ParallelEngine(settings)
+        else:
+            self.ai_engine.settings = settings
+        if self.enable_opening_book and getattr(self, "opening_book", None) is None:
+            # 开局库需要通过 _build_reversi_opening_book.py 针对所用的棋盘布局离线生成，不存在时直接搜索
+            self.opening_book = OpeningBook.load_if_exists()
 
         if blue_set_ai:
             self.set_ai(cell_blue, self.ai_min_max)
@@ -417,6 +450,7 @@ class Reversi(QWidget):
     def set_ai(self, cell_color, ai_algorithm_fn):
         self.ai_cells[cell_color] = ai_algorithm_fn
         self.ai_to_avg_stat[cell_color] = AvgStat()
+        self.ai_to_time_bank[cell_color] = 0.0
         logger.info(self.cell_name(cell_color) + color("bold_green") + f"将被ai托管，算法为{ai_algorithm_fn}")
 
     def play_with_cgi(self):
@@ -491,186 +525,50 @@ class Reversi(QWidget):
         return random.choice(valid_cells)
 
     def ai_min_max(self, valid_cells: List[Tuple[int, int]]) -> Tuple[int, int]:
-        # save
-        backup_board = copy.deepcopy(self.board)
-        backup_step_cell = self.step_cell
-
-        alpha = -0x7fffffff
-        beta = 0x7fffffff
-
-        self.ai_start_time = datetime.now()
-        self.last_update_time = datetime.now()
-
-        # # re: 调试用代码
-        # self.iter_count = 0
-        # self.avg_choice = AvgStat()
-        #
-        # self.ai_min_decision_seconds = timedelta(seconds=0.01)
-        # # 为方便测试，单独设置双方AI的参数
-        # if self.step_cell == cell_blue:
-        #     self.enable_presearch = True
-        #     self.ai_dfs_max_depth = 7
-        #     self.ai_dfs_presearch_depth = 2
-        #     self.ai_dfs_max_choice_per_depth = 5
-        #     # 红方算力：4层搜索，无预搜索
-        #     # 层数 预搜索 最大子节点 平均耗时 蓝方局面分
-        #     # 6     2       6       1.3     2067
-        #     #
-        #     # 7     2       5       3.4     2471/1523/1034/2037
-        #     #
-        #     # 8     2       5       9.5     2223
-        # else:
-        #     self.enable_presearch = False
-        #     self.ai_dfs_max_depth = 4
-        #
-        # logger.info(
-        #     self.cell_name(self.step_cell) + f"ai参数：max_depth={self.ai_dfs_max_depth}, enable_presearch={self.enable_presearch}, max_choice_per_depth={self.ai_dfs_max_choice_per_depth}, presearch_depth={self.ai_dfs_presearch_depth}")
-
-        res = self.ai_min_max_dfs(0, valid_cells, self.step_cell, alpha, beta)
-
-        used_time = datetime.now() - self.ai_start_time
-        self.ai_to_avg_stat[self.step_cell].add(used_time.total_seconds())
-
-        # if self.step_cell == cell_blue:
-        #     logfunc = logger.warning
-        # else:
-        #     logfunc = logger.info
-        #
-        # logfunc(f"count={self.iter_count}, avg_choice={self.avg_choice.avg()}, expected_score={res[1]}")
-
-        # resume
-        self.board = backup_board
-        self.step_cell = backup_step_cell
-
-        return res[0]
-
-    def ai_min_max_dfs(self, depth, valid_cells: List[Tuple[int, int]], ai_step_cell, alpha, beta, presearch=False) -> Tuple[Optional[Tuple[int, int]], int]:
-        # self.iter_count += 1
-        # if len(valid_cells) != 0:
-        #     self.avg_choice.add(len(valid_cells))
-
-        if datetime.now() - self.last_update_time >= timedelta(seconds=1 / 60):
-            since_start = datetime.now() - self.ai_start_time
-            remaining_time = (self.ai_max_decision_time - since_start)
-
+        # 实际搜索由不依赖界面的位棋盘引擎完成，这里只负责转换局面、刷新倒计时以及统计耗时
+        ai_step_cell = self.step_cell
+        max_decision_seconds = self.ai_max_decision_time.total_seconds()
+
+        position = Position.from_cells(self.board, self.step_cell)
+        if self.enable_opening_book and self.opening_book is not None:
+            start_time = time.time()
+            book_move = self.opening_book.lookup(position)
+            if book_move is not None:
+                used_seconds = time.time() - start_time
+                self.ai_to_avg_stat[ai_step_cell].add(used_seconds)
+                # 本步几乎没有花费时间，将剩余的时间存起来，留给之后需要搜索的步骤
+                self.ai_to_time_bank[ai_step_cell] += max(max_decision_seconds - used_seconds, 0)
+                logger.info(self.cell_name(ai_step_cell) + f"ai命中开局库，直接落子 {book_move}，目前累计节省 {self.ai_to_time_bank[ai_step_cell]:.1f} 秒")
+                return book_move
+
+        # 每步最多额外使用一部分之前节省的时间，避免单步用时超出限制
+        extra_seconds = min(self.ai_to_time_bank[ai_step_cell], self.ai_max_extra_time_per_move)
+        move_max_seconds = max_decision_seconds + extra_seconds
+        self.ai_engine.settings.max_seconds = move_max_seconds
+
+        def on_progress(used_seconds: float):
+            remaining_seconds = move_max_seconds - used_seconds
             avg_used_time = self.ai_to_avg_stat[ai_step_cell].avg()
 
-            self.label_count_down.setText(f"{remaining_time.total_seconds():.1f}(平均{avg_used_time:.1f})")
-            self.last_update_time = datetime.now()
-
-        if depth == self.ai_dfs_max_depth:
-            return (None, self.evaluate(ai_step_cell))
-
-        if self.step_cell == ai_step_cell:
-            min_max = max
-            alpha = -0x7fffffff
-            need_reverse_weights = True
-        else:
-            min_max = min
-            beta = 0x7fffffff
-            need_reverse_weights = False
-
-        best_next_move = None
+            self.label_count_down.setText(f"{remaining_seconds:.1f}(平均{avg_used_time:.1f})")
 
-        if len(valid_cells) != 0:
-            # 子搜索流程（实际搜索和预搜索将共用该逻辑）
-            def subsearch(valid_cells, alpha, beta, current_depth, presearch=False, subresult_cb=None):
-                best_next_move = None
+        res = self.ai_engine.search(position, should_stop=lambda: self.game_restarted, on_progress=on_progress)
 
-                for idx, next_move_index in enumerate(valid_cells):
-                    next_move_row_index, next_move_col_index = next_move_index
-
-                    revoke_op = self.put_cell(next_move_row_index, next_move_col_index, ai_probe=True)
-
-                    next_depth_best_move = self.ai_min_max_dfs(current_depth + 1, self.get_valid_cells(self.current_step_cell()), ai_step_cell, alpha, beta, presearch)
-                    if next_depth_best_move is None:
-                        continue
-
-                    next_depth_min_max_score = next_depth_best_move[1]
-
-                    next_move = ((next_move_row_index, next_move_col_index), next_depth_min_max_score)
-                    if best_next_move is None:
-                        best_next_move = next_move
-                    else:
-                        best_next_move = min_max(best_next_move, next_move, key=lambda v: v[1])
-
-                    revoke_op()
-
-                    # 更新alpha、beta
-                    if self.step_cell == ai_step_cell:
-                        if next_depth_min_max_score > alpha:
-                            alpha = next_depth_min_max_score
-                    else:
-                        if next_depth_min_max_score < beta:
-                            beta = next_depth_min_max_score
-
-                    # 子节点结果回调
-                    if subresult_cb is not None:
-                        subresult_cb(idx, next_depth_min_max_score)
-
-                    # 剪枝
-                    if alpha >= beta:
-                        logger.debug(f"剪枝 alpha={alpha}, beta={beta}")
-                        break
-
-                    # 如果运行时间超限，停止处理
-                    since_start = datetime.now() - self.ai_start_time
-                    if since_start >= self.ai_max_decision_time:
-                        logger.info(f"depth={depth}/{self.ai_dfs_max_depth} valid_cells={idx + 1}/{len(valid_cells)} 等待时间已达到{since_start}，将强制停止搜索")
-                        break
-
-                    # 如果重开了，停止处理
-                    if self.game_restarted:
-                        logger.info(f"游戏重开，将强制停止搜索")
-                        break
-
-                return best_next_move
-
-            need_presearch = self.enable_presearch and \
-                             not presearch and \
-                             len(valid_cells) > self.ai_dfs_max_choice_per_depth and \
-                             depth + self.ai_dfs_presearch_depth < self.ai_dfs_max_depth
-
-            if need_presearch:
-                # 预计算若干层得到各落子的评分，按照该评分排序
-                # 预搜索时本层实际不需要剪枝，因为目的是为了计算出各个子节点的排序权重
-                presearch_alpha, presearch_beta = -0x7fffffff, 0x7fffffff
-                presearch_current_depth = self.ai_dfs_max_depth - self.ai_dfs_presearch_depth
-                valid_cells_weights = [0 for cell in valid_cells]
-
-                def subresult_cb(child_idx, next_depth_min_max_score):
-                    valid_cells_weights[child_idx] = next_depth_min_max_score
-
-                subsearch(valid_cells, presearch_alpha, presearch_beta, presearch_current_depth, presearch=True, subresult_cb=subresult_cb)
-
-                # 根据计算出的权重进行排序
-                valid_cells = [cell for weight, cell in sorted(zip(valid_cells_weights, valid_cells), reverse=need_reverse_weights)]
-                # 取前几个
-                valid_cells = valid_cells[:self.ai_dfs_max_choice_per_depth]
+        self.ai_to_avg_stat[ai_step_cell].add(res.seconds)
+        self.ai_to_time_bank[ai_step_cell] -= min(max(res.seconds - max_decision_seconds, 0), extra_seconds)
+        if res.stopped:
+            if self.game_restarted:
+                logger.info("游戏重开，已强制停止搜索")
             else:
-                # 以下情况则直接按照权重排序
-                # 1. 如果可选落子数不多
-                # 2. 已经接近叶节点
-                # 3. 预搜索流程
-                valid_cells = sorted(valid_cells, key=lambda v: weight_map[v[0] - 1][v[1] - 1], reverse=need_reverse_weights)
-
-            # 正式开始搜索
-            best_next_move = subsearch(valid_cells, alpha, beta, depth)
-        else:
-            # 本方无可行下子，跳过本轮
-            old_step_cell = self.step_cell
-
-            self.next_turn()
-            next_depth_best_move = self.ai_min_max_dfs(depth + 1, self.get_valid_cells(self.current_step_cell()), ai_step_cell, alpha, beta)
-            if next_depth_best_move is not None:
-                next_depth_min_max_score = next_depth_best_move[1]
-
-                next_move = ((0, 0), next_depth_min_max_score)
-                best_next_move = next_move
+                logger.info(f"等待时间已达到{res.seconds:.1f}秒，已强制停止搜索，将使用已完整搜索的{res.depth}层的结果")
+        if res.exact:
+            logger.info(self.cell_name(ai_step_cell) + f"ai已算出残局的确切结果：最终胜方为{self.cell_name(res.winner)}，本方最终将比对方多{res.score}子")
+        logger.debug(self.cell_name(ai_step_cell) + f"ai搜索结果：{res}")
 
-            self.step_cell = old_step_cell
+        if res.move is None:
+            return (0, 0)
 
-        return best_next_move
+        return res.move
 
     def evaluate(self, current_step_cell, ignore_game_over=False) -> int:
         if self.is_game_over() and not ignore_game_over:
@@ -1148,6 +1046,8 @@ class AiThread(QThread):
 
 
 if __name__ == '__main__':
+    freeze_support()
+
     app = QApplication(sys.argv)
     re = Reversi()
     # re.play()
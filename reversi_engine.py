@@ -0,0 +1,1354 @@
+# 黑白棋（reversi.py）AI使用的无界面搜索引擎
+# 棋盘使用64位整数表示（bitboard），第 row*8+col 位对应第row行第col列（均从0开始），无效格子（洞）单独用一个掩码记录，不属于任何一方，也不可落子
+import atexit
+import multiprocessing
+import queue
+import random
+import time
+from array import array
+from typing import Any, Callable, List, Optional, Tuple
+
+from log import logger
+
+board_size = 8
+
+# 与 reversi.py 中的格子取值保持一致
+cell_blue = -1
+cell_empty = 0
+cell_red = 1
+
+full_mask = 0xFFFFFFFFFFFFFFFF
+not_edge_files = 0x7E7E7E7E7E7E7E7E  # 去掉第0列与第7列
+not_a_file = 0xFEFEFEFEFEFEFEFE  # 去掉第0列
+not_h_file = 0x7F7F7F7F7F7F7F7F  # 去掉第7列
+corner_mask = 0x8100000000000081
+
+win_score = 0x7FFFFFFF
+score_inf = win_score + 1
+
+weight_map = [
+    [500, -25, 10, 5, 5, 10, -25, 500],
+    [-25, -45, 1, 1, 1, 1, -45, -25],
+    [10, 1, 3, 2, 2, 3, 1, 10],
+    [5, 1, 2, 1, 1, 2, 1, 5],
+    [5, 1, 2, 1, 1, 2, 1, 5],
+    [10, 1, 3, 2, 2, 3, 1, 10],
+    [-25, -45, 1, 1, 1, 1, -45, -25],
+    [500, -25, 10, 5, 5, 10, -25, 500],
+]
+cell_weights = [weight_map[idx // board_size][idx % board_size] for idx in range(board_size * board_size)]
+# 相同权重的格子合并为一个掩码，计算权重和时只需按掩码数子
+weight_masks = [(weight, sum(1 << idx for idx, w in enumerate(cell_weights) if w == weight)) for weight in sorted(set(cell_weights))]
+# 按位值索引的位置权重，落子方得到落子处的权重，被翻转的棋子则从一方转移到另一方，差值变化为两倍权重
+place_weights = {1 << idx: weight for idx, weight in enumerate(cell_weights)}
+flip_weights = {1 << idx: 2 * weight for idx, weight in enumerate(cell_weights)}
+# 搜索时按位置权重从高到低的顺序依次尝试各组格子
+move_order_masks = [mask for weight, mask in reversed(weight_masks)]
+
+# 四条边，每条边按从一个角到另一个角的顺序排列
+edge_lines = [
+    [col for col in range(8)],  # 上
+    [56 + col for col in range(8)],  # 下
+    [row * 8 for row in range(8)],  # 左
+    [row * 8 + 7 for row in range(8)],  # 右
+]
+
+
+def _popcount(bb: int) -> int:
+    return bin(bb).count("1")
+
+
+# python 3.10 起才有 int.bit_count
+popcount = getattr(int, "bit_count", _popcount)  # type: Callable[[int], int]
+
+
+def bit_to_row_col(bit: int) -> Tuple[int, int]:
+    """
+    返回 reversi.py 中使用的从1开始的行列
+    """
+    idx = bit.bit_length() - 1
+    return idx // board_size + 1, idx % board_size + 1
+
+
+def row_col_to_bit(row: int, col: int) -> int:
+    return 1 << ((row - 1) * board_size + (col - 1))
+
+
+def iter_bits(bb: int):
+    while bb:
+        bit = bb & -bb
+        yield bit
+        bb ^= bit
+
+
+def get_moves(player: int, opponent: int, empty: int) -> int:
+    """
+    通过沿八个方向整体移位，一次性计算出player的所有可落子位置
+    """
+    return get_lane_moves(player, opponent, empty, not_edge_files)
+
+
+def get_lane_moves(player: int, opponent: int, empty: int, lane_not_edge_files: int) -> int:
+    """
+    同 get_moves，但参数中可以每隔128位（称为一条通道）放入一个棋盘，一次移位即可同时计算所有通道中的棋盘
+    python的整数没有位数限制，且移位等运算的开销主要在于解释器本身，因此同时计算多个棋盘的耗时与只计算一个相差不大
+    通道中空出的64位在每次扩散时都会被对方棋子的掩码清零，因此各个通道之间不会互相干扰
+    lane_not_edge_files 为每条通道中的 not_edge_files
+    每对相反的方向一起计算，先逐格扩散两步，再利用相邻两格均为对方棋子的掩码每次跨两格扩散，减少移位次数
+    """
+    # 东 / 西 方向需要屏蔽跨行的位
+    o = opponent & lane_not_edge_files
+    flip_l = o & (player << 1)
+    flip_r = o & (player >> 1)
+    flip_l |= o & (flip_l << 1)
+    flip_r |= o & (flip_r >> 1)
+    pre_l = o & (o << 1)
+    pre_r = pre_l >> 1
+    flip_l |= pre_l & (flip_l << 2)
+    flip_r |= pre_r & (flip_r >> 2)
+    flip_l |= pre_l & (flip_l << 2)
+    flip_r |= pre_r & (flip_r >> 2)
+    moves = (flip_l << 1) | (flip_r >> 1)
+
+    # 南 / 北
+    o = opponent
+    flip_l = o & (player << 8)
+    flip_r = o & (player >> 8)
+    flip_l |= o & (flip_l << 8)
+    flip_r |= o & (flip_r >> 8)
+    pre_l = o & (o << 8)
+    pre_r = pre_l >> 8
+    flip_l |= pre_l & (flip_l << 16)
+    flip_r |= pre_r & (flip_r >> 16)
+    flip_l |= pre_l & (flip_l << 16)
+    flip_r |= pre_r & (flip_r >> 16)
+    moves |= (flip_l << 8) | (flip_r >> 8)
+
+    # 四个对角方向
+    o = opponent & lane_not_edge_files
+    flip_l = o & (player << 9)
+    flip_r = o & (player >> 9)
+    flip_l |= o & (flip_l << 9)
+    flip_r |= o & (flip_r >> 9)
+    pre_l = o & (o << 9)
+    pre_r = pre_l >> 9
+    flip_l |= pre_l & (flip_l << 18)
+    flip_r |= pre_r & (flip_r >> 18)
+    flip_l |= pre_l & (flip_l << 18)
+    flip_r |= pre_r & (flip_r >> 18)
+    moves |= (flip_l << 9) | (flip_r >> 9)
+
+    flip_l = o & (player << 7)
+    flip_r = o & (player >> 7)
+    flip_l |= o & (flip_l << 7)
+    flip_r |= o & (flip_r >> 7)
+    pre_l = o & (o << 7)
+    pre_r = pre_l >> 7
+    flip_l |= pre_l & (flip_l << 14)
+    flip_r |= pre_r & (flip_r >> 14)
+    flip_l |= pre_l & (flip_l << 14)
+    flip_r |= pre_r & (flip_r >> 14)
+    moves |= (flip_l << 7) | (flip_r >> 7)
+
+    return moves & empty
+
+
+lane_bits = 128
+# 下标为通道数
+lanes_not_edge_files = [0]
+for _ in range(2 * board_size * board_size):
+    lanes_not_edge_files.append((lanes_not_edge_files[-1] << lane_bits) | not_edge_files)
+two_lanes_mask = (1 << (2 * lane_bits)) - 1
+# 下标为子局面数，每个子局面占两条通道，每个子局面的第一条通道的最低位为1
+lanes_repeat = [0]
+for _ in range(board_size * board_size):
+    lanes_repeat.append((lanes_repeat[-1] << (2 * lane_bits)) | 1)
+
+
+def get_both_moves(player: int, opponent: int, empty: int) -> int:
+    """
+    同时计算双方的可落子位置：player的结果位于第一条通道，opponent的结果位于第二条通道
+    """
+    return get_lane_moves(player | (opponent << lane_bits), opponent | (player << lane_bits), empty | (empty << lane_bits), lanes_not_edge_files[2])
+
+
+def _build_flip_rays(increasing: bool):
+    """
+    按位值索引，每个格子沿位序递增（或递减）的四个方向上的 (相邻格子, 射线（不含该格子本身）)
+    长度为1的射线上不可能有被夹住的棋子，因此直接跳过
+    """
+    rays = {}
+    for idx in range(board_size * board_size):
+        row, col = idx // board_size, idx % board_size
+        rays[1 << idx] = []
+        for delta_row, delta_col in [(0, 1), (1, -1), (1, 0), (1, 1)]:
+            if not increasing:
+                delta_row, delta_col = -delta_row, -delta_col
+
+            adjacent, ray, length = 0, 0, 0
+            r, c = row + delta_row, col + delta_col
+            while 0 <= r < board_size and 0 <= c < board_size:
+                if length == 0:
+                    adjacent = 1 << (r * board_size + c)
+                ray |= 1 << (r * board_size + c)
+                length += 1
+                r, c = r + delta_row, c + delta_col
+
+            if length >= 2:
+                rays[1 << idx].append((adjacent, ray))
+
+    return rays
+
+
+_increasing_flip_rays = _build_flip_rays(True)
+_decreasing_flip_rays = _build_flip_rays(False)
+
+
+def get_flips(player: int, opponent: int, move: int) -> int:
+    """
+    计算player在move处落子后被翻转的对方棋子
+    沿每条相邻格子为对方棋子的射线找到离落子处最近的非对方棋子的格子，若它是己方棋子，则两者之间的对方棋子均被翻转
+    """
+    flips = 0
+    for adjacent, ray in _increasing_flip_rays[move]:
+        if adjacent & opponent:
+            blockers = ray & ~opponent
+            # 位序递增时，最近的即为最低位
+            first = blockers & -blockers
+            if first & player:
+                flips |= ray & (first - 1)
+
+    for adjacent, ray in _decreasing_flip_rays[move]:
+        if adjacent & opponent:
+            blockers = ray & ~opponent
+            if blockers:
+                # 位序递减时，最近的即为最高位
+                first = 1 << (blockers.bit_length() - 1)
+                if first & player:
+                    flips |= ray & ~((first << 1) - 1)
+
+    return flips
+
+
+# zobrist哈希所用的随机数，固定种子以便不同进程、不同次运行得到相同的哈希值（多进程共享置换表、开局库均依赖这一点）
+_zobrist_rand = random.Random(20211010)
+zobrist_blue = [_zobrist_rand.getrandbits(64) for _ in range(board_size * board_size)]
+zobrist_red = [_zobrist_rand.getrandbits(64) for _ in range(board_size * board_size)]
+zobrist_hole = [_zobrist_rand.getrandbits(64) for _ in range(board_size * board_size)]
+# 轮到红方行动时额外异或该值
+zobrist_red_to_move = _zobrist_rand.getrandbits(64)
+# 按位值索引，落子时异或对应颜色的值，翻转时同时异或两种颜色的值
+zobrist_place = {
+    cell_blue: {1 << idx: key for idx, key in enumerate(zobrist_blue)},
+    cell_red: {1 << idx: key for idx, key in enumerate(zobrist_red)},
+}
+zobrist_flip = {1 << idx: zobrist_blue[idx] ^ zobrist_red[idx] for idx in range(board_size * board_size)}
+
+
+def zobrist_hash(player: int, opponent: int, holes: int, color: int) -> int:
+    if color == cell_blue:
+        blue, red = player, opponent
+    else:
+        blue, red = opponent, player
+
+    key = zobrist_red_to_move if color == cell_red else 0
+    for bb, keys in [(blue, zobrist_blue), (red, zobrist_red), (holes, zobrist_hole)]:
+        for bit in iter_bits(bb):
+            key ^= keys[bit.bit_length() - 1]
+
+    return key
+
+
+def weight_sum(player: int, opponent: int) -> int:
+    weights = 0
+    for weight, mask in weight_masks:
+        weights += weight * (popcount(player & mask) - popcount(opponent & mask))
+
+    return weights
+
+
+def move_key_delta(color: int, move: int, flips: int) -> int:
+    """
+    color方在move处落子并翻转flips后，zobrist哈希需要异或的值（包含换手）
+    """
+    key = zobrist_place[color][move] ^ zobrist_red_to_move
+    while flips:
+        bit = flips & -flips
+        key ^= zobrist_flip[bit]
+        flips ^= bit
+
+    return key
+
+
+def move_weights_delta(move: int, flips: int) -> int:
+    """
+    落子后，落子方与另一方的位置权重之差的变化量（从落子方的角度计算）
+    """
+    weights = place_weights[move]
+    while flips:
+        bit = flips & -flips
+        weights += flip_weights[bit]
+        flips ^= bit
+
+    return weights
+
+
+class Position:
+    """
+    当前局面，player为当前行动方的棋子，opponent为另一方的棋子，color为当前行动方的颜色
+    make/unmake 均在原对象上修改，且不分配额外的对象，搜索时无需复制棋盘
+    以下字段随落子增量维护，不需要在评估时重新扫描整个棋盘：
+        key       zobrist哈希（包含洞的位置）
+        weights   当前行动方与另一方的位置权重之差
+    """
+
+    __slots__ = ("player", "opponent", "holes", "color", "key", "weights")
+
+    def __init__(self, player: int = 0, opponent: int = 0, holes: int = 0, color: int = cell_blue, key: Optional[int] = None, weights: Optional[int] = None):
+        self.player = player
+        self.opponent = opponent
+        self.holes = holes
+        self.color = color
+        if key is None:
+            key = zobrist_hash(player, opponent, holes, color)
+        self.key = key
+        if weights is None:
+            weights = weight_sum(player, opponent)
+        self.weights = weights
+
+    @classmethod
+    def from_cells(cls, board: List[List[int]], step_cell: int) -> 'Position':
+        """
+        从 reversi.py 中带边框的二维棋盘（行列均从1开始）创建局面，step_cell为当前行动方
+        """
+        player, opponent, holes = 0, 0, 0
+        for row in range(1, board_size + 1):
+            for col in range(1, board_size + 1):
+                cell = board[row][col]
+                bit = row_col_to_bit(row, col)
+                if cell == step_cell:
+                    player |= bit
+                elif cell == -step_cell:
+                    opponent |= bit
+                elif cell != cell_empty:
+                    holes |= bit
+
+        return cls(player, opponent, holes, step_cell)
+
+    @classmethod
+    def initial(cls, holes: int = 0) -> 'Position':
+        # 与 reversi.py 一致，d4 e5 为蓝方，d5 e4 为红方，蓝方先手
+        blue = row_col_to_bit(4, 4) | row_col_to_bit(5, 5)
+        red = row_col_to_bit(4, 5) | row_col_to_bit(5, 4)
+        return cls(blue, red, holes, cell_blue)
+
+    def copy(self) -> 'Position':
+        return Position(self.player, self.opponent, self.holes, self.color, self.key, self.weights)
+
+    def empty(self) -> int:
+        return ~(self.player | self.opponent | self.holes) & full_mask
+
+    def moves(self) -> int:
+        return get_moves(self.player, self.opponent, self.empty())
+
+    def opponent_moves(self) -> int:
+        return get_moves(self.opponent, self.player, self.empty())
+
+    def is_game_over(self) -> bool:
+        return self.moves() == 0 and self.opponent_moves() == 0
+
+    def make(self, move: int) -> int:
+        """
+        在move处落子并换手，返回被翻转的棋子，供unmake使用
+        """
+        flips = get_flips(self.player, self.opponent, move)
+
+        self.key ^= move_key_delta(self.color, move, flips)
+        # 换手后改为从新的行动方的角度计算
+        self.weights = -(self.weights + move_weights_delta(move, flips))
+        self.player, self.opponent = self.opponent & ~flips, self.player | move | flips
+        self.color = -self.color
+        return flips
+
+    def unmake(self, move: int, flips: int):
+        # 增量项都可以由落子与被翻转的棋子直接反推回去，无需记录落子前的值
+        self.player, self.opponent = self.opponent & ~(move | flips), self.player | flips
+        self.color = -self.color
+        self.key ^= move_key_delta(self.color, move, flips)
+        self.weights = -self.weights - move_weights_delta(move, flips)
+
+    def make_pass(self):
+        self.player, self.opponent = self.opponent, self.player
+        self.color = -self.color
+        self.key ^= zobrist_red_to_move
+        self.weights = -self.weights
+
+    unmake_pass = make_pass
+
+    def empty_count(self) -> int:
+        return popcount(self.empty())
+
+    def disc_count(self, color: int) -> int:
+        if color == self.color:
+            return popcount(self.player)
+        else:
+            return popcount(self.opponent)
+
+    def to_cells(self) -> List[List[int]]:
+        """
+        转换为 reversi.py 中带边框的二维棋盘
+        """
+        cell_invalid = 2
+        board = [[cell_invalid for col in range(board_size + 2)] for row in range(board_size + 2)]
+        for row in range(1, board_size + 1):
+            for col in range(1, board_size + 1):
+                bit = row_col_to_bit(row, col)
+                if self.player & bit:
+                    board[row][col] = self.color
+                elif self.opponent & bit:
+                    board[row][col] = -self.color
+                elif self.holes & bit:
+                    board[row][col] = cell_invalid
+                else:
+                    board[row][col] = cell_empty
+
+        return board
+
+
+def random_holes(hole_count: int = 5, rand: random.Random = None) -> int:
+    """
+    与 reversi.py 的 init_invalid_cells_randomly 一致，随机选择不在初始四子上的若干位置作为洞
+    """
+    if rand is None:
+        rand = random.Random()
+
+    initial = Position.initial()
+    candidates = [idx for idx in range(board_size * board_size) if not (initial.player | initial.opponent) >> idx & 1]
+    holes = 0
+    for idx in rand.sample(candidates, k=hole_count):
+        holes |= 1 << idx
+
+    return holes
+
+
+def terminal_score(player: int, opponent: int, color: int) -> int:
+    """
+    终局时color方（即player）的得分，与 Reversi.evaluate 一致，平局时视为红方胜
+    """
+    player_count, opponent_count = popcount(player), popcount(opponent)
+    if color == cell_blue:
+        blue_win = player_count > opponent_count
+    else:
+        blue_win = opponent_count > player_count
+
+    winner = cell_blue if blue_win else cell_red
+    return win_score if winner == color else -win_score
+
+
+def evaluate(position: Position) -> int:
+    """
+    当前行动方的局面分，与 Reversi.evaluate 的计算方式一致：位置权重 + 15 * 行动力之差 + 10 * 稳定子之差
+    """
+    return evaluate_board(position.player, position.opponent, position.empty(), position.color, position.weights)
+
+
+def evaluate_board(player: int, opponent: int, empty: int, color: int, weights: int) -> int:
+    """
+    同 evaluate，color为player的颜色，weights为player与opponent的位置权重之差
+    局面分对双方是对称的，因此无论轮到哪一方行动，都可以直接从任意一方的角度计算
+    """
+    return score_board(player, opponent, empty, color, weights, get_both_moves(player, opponent, empty))
+
+
+def score_board(player: int, opponent: int, empty: int, color: int, weights: int, both_moves: int) -> int:
+    """
+    同 evaluate_board，both_moves为双方的可落子位置，布局与 get_both_moves 的结果相同
+    """
+    if both_moves == 0:
+        return terminal_score(player, opponent, color)
+
+    stable = stable_mask(empty)
+
+    return weights + 15 * (popcount(both_moves & full_mask) - popcount(both_moves >> lane_bits)) + 10 * (popcount(player & stable) - popcount(opponent & stable))
+
+
+def stable_mask(empty: int) -> int:
+    """
+    按 Reversi.stable_score 的规则视为稳定的位置，全部通过整体移位与查表计算
+    """
+    occupied = ~empty & full_mask
+
+    # 边：从某个角开始到该格子为止都没有空位（洞也视为非空），将每条边的占用情况压缩为8位后查表
+    stable = corner_mask | \
+        top_edge_stable[occupied & 0xFF] | \
+        bottom_edge_stable[occupied >> 56] | \
+        left_edge_stable[((occupied & a_file) * _gather_file_magic & full_mask) >> 56] | \
+        right_edge_stable[(((occupied >> 7) & a_file) * _gather_file_magic & full_mask) >> 56]
+
+    # 其他：非边角位置所在的行、列、两条对角线都没有空位
+    # 将空位沿各条线扩散到整条线上，得到含有空位的线所覆盖的格子。中局时通常每一行都有空位，因此依次检查，尽早返回
+    row_bytes = empty
+    row_bytes |= (row_bytes >> 1) & 0x7F7F7F7F7F7F7F7F
+    row_bytes |= (row_bytes >> 2) & 0x3F3F3F3F3F3F3F3F
+    row_bytes |= (row_bytes >> 4) & 0x0F0F0F0F0F0F0F0F
+    candidates = interior_mask & ~((row_bytes & 0x0101010101010101) * 0xFF)
+    if not candidates:
+        return stable
+
+    col_bits = empty | (empty >> 32)
+    col_bits |= col_bits >> 16
+    col_bits |= col_bits >> 8
+    candidates &= ~((col_bits & 0xFF) * 0x0101010101010101)
+    if not candidates:
+        return stable
+
+    candidates &= ~_smear(empty, 9, not_a_file, not_h_file)
+    if not candidates:
+        return stable
+
+    candidates &= ~_smear(empty, 7, not_h_file, not_a_file)
+
+    return stable | candidates
+
+
+def _smear(bb: int, shift: int, left_mask: int, right_mask: int) -> int:
+    # 将bb中的每一位沿某个方向的两侧扩散到整条线上，left_mask/right_mask用于去掉左移/右移时跨行绕回的位
+    left = bb | (left_mask & (bb << shift))
+    left_mask &= left_mask << shift
+    left |= left_mask & (left << (shift * 2))
+    left_mask &= left_mask << (shift * 2)
+    left |= left_mask & (left << (shift * 4))
+
+    right = bb | (right_mask & (bb >> shift))
+    right_mask &= right_mask >> shift
+    right |= right_mask & (right >> (shift * 2))
+    right_mask &= right_mask >> (shift * 2)
+    right |= right_mask & (right >> (shift * 4))
+
+    return left | right
+
+
+interior_mask = 0x007E7E7E7E7E7E00
+a_file = 0x0101010101010101
+# 将第0列的8个位收集到最高的8位中
+_gather_file_magic = 0x0102040810204080
+
+
+def _build_edge_stable_table(line: List[int], index_of: Callable[[int], int]) -> List[int]:
+    """
+    line为一条边从一个角到另一个角的格子，index_of将棋盘占用情况映射为查表的下标
+    """
+    table = [0] * 256
+    for pattern in range(256):
+        occupied = 0
+        for pos, idx in enumerate(line):
+            if pattern >> pos & 1:
+                occupied |= 1 << idx
+
+        stable = 0
+        for ordered_line in [line, line[::-1]]:
+            for idx in ordered_line:
+                if not occupied >> idx & 1:
+                    break
+                stable |= 1 << idx
+
+        table[index_of(occupied)] = stable
+
+    return table
+
+
+top_edge_stable = _build_edge_stable_table(edge_lines[0], lambda occupied: occupied & 0xFF)
+bottom_edge_stable = _build_edge_stable_table(edge_lines[1], lambda occupied: occupied >> 56)
+left_edge_stable = _build_edge_stable_table(edge_lines[2], lambda occupied: ((occupied & a_file) * _gather_file_magic & full_mask) >> 56)
+right_edge_stable = _build_edge_stable_table(edge_lines[3], lambda occupied: (((occupied >> 7) & a_file) * _gather_file_magic & full_mask) >> 56)
+
+
+# 四个4x4的区域，用于残局求解的奇偶性排序
+quadrant_masks = [0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000]
+endgame_inf = 256
+
+
+def endgame_value(player: int, opponent: int, color: int) -> int:
+    """
+    终局时当前行动方的残局求解分数：2 * 子数之差，平局时视为红方胜，因此红方再加1，蓝方再减1
+    分数的正负即为胜负，绝对值越大子数差越大
+    """
+    return 2 * (popcount(player) - popcount(opponent)) + (1 if color == cell_red else -1)
+
+
+def endgame_disc_diff(value: int, color: int) -> int:
+    return (value - (1 if color == cell_red else -1)) // 2
+
+
+# 置换表中记录的分数类型
+bound_exact = 1
+bound_lower = 2
+bound_upper = 3
+
+# 置换表数据字段的布局：分数(33位) | 深度(8位) | 分数类型(2位) | 最佳落子序号+1(7位) | 代数(8位)
+_tt_score_bits = 33
+_tt_depth_shift = _tt_score_bits
+_tt_bound_shift = _tt_depth_shift + 8
+_tt_move_shift = _tt_bound_shift + 2
+_tt_generation_shift = _tt_move_shift + 7
+_tt_score_mask = (1 << _tt_score_bits) - 1
+
+
+class TranspositionTable:
+    """
+    固定大小的置换表，每个槽位占用两个64位整数：key ^ data 与 data
+    读取时用两者异或的结果校验key，即使两个值不是同时写入的，也只会被当作未命中，而不会读到错误的数据
+    替换策略：总是覆盖之前的搜索留下的条目，本次搜索中则优先保留更深的条目
+    buffer不为空时，直接使用该内存（如多个进程共享的 multiprocessing.RawArray）作为存储
+    """
+
+    def __init__(self, size_bits: int = 20, buffer: Any = None):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        if buffer is None:
+            self.table = array("Q", bytes(16 * self.size))
+        else:
+            self.table = memoryview(buffer).cast("B").cast("Q")
+        self.generation = 0
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        self.table[:] = array("Q", bytes(16 * self.size))
+
+    def probe(self, key: int) -> int:
+        """
+        返回打包后的数据，未命中时返回0
+        """
+        index = (key & self.mask) << 1
+        data = self.table[index + 1]
+        if self.table[index] ^ data != key:
+            return 0
+
+        return data
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int):
+        index = (key & self.mask) << 1
+        table = self.table
+
+        old_data = table[index + 1]
+        if old_data >> _tt_generation_shift == self.generation and table[index] ^ old_data != key and (old_data >> _tt_depth_shift) & 0xFF > depth:
+            return
+
+        data = (score + score_inf) | (depth << _tt_depth_shift) | (bound << _tt_bound_shift) | (move.bit_length() << _tt_move_shift) | (self.generation << _tt_generation_shift)
+        table[index] = key ^ data
+        table[index + 1] = data
+
+
+def tt_score(data: int) -> int:
+    return (data & _tt_score_mask) - score_inf
+
+
+def tt_depth(data: int) -> int:
+    return (data >> _tt_depth_shift) & 0xFF
+
+
+def tt_bound(data: int) -> int:
+    return (data >> _tt_bound_shift) & 0x3
+
+
+def tt_move(data: int) -> int:
+    move_index = (data >> _tt_move_shift) & 0x7F
+    if move_index == 0:
+        return 0
+
+    return 1 << (move_index - 1)
+
+
+class SearchSettings:
+    def __init__(self):
+        # 最大搜索层数
+        self.max_depth = 7
+        # 单步最大思考时间（秒）
+        self.max_seconds = 26.0
+        # 是否启用预搜索，用于对子节点排序并只保留其中较好的若干个
+        self.enable_presearch = True
+        self.presearch_depth = 2
+        self.max_choice_per_depth = 5
+        # 置换表大小为 2**tt_size_bits 个槽位，每个槽位16字节
+        self.tt_size_bits = 20
+        # 并行搜索时额外使用的进程数，为0时只在当前线程中搜索，此时结果是确定的
+        self.parallel_workers = 0
+        # 空位不超过该数目时，直接搜索到终局，求出确切的胜负与子数差，为0时不启用
+        self.endgame_empties = 12
+        # 残局求解最多使用的时间比例，超时后使用剩余时间进行普通搜索
+        self.endgame_time_ratio = 0.5
+
+
+class SearchResult:
+    def __init__(self):
+        # 最佳落子，为None表示当前方无子可下，需要轮空
+        self.move = None  # type: Optional[Tuple[int, int]]
+        self.score = 0
+        # 最后一次完整搜索完毕的层数
+        self.depth = 0
+        self.nodes = 0
+        self.seconds = 0.0
+        self.stopped = False
+        # 是否已通过残局求解得到确切的结果，此时score为终局时当前行动方与另一方的子数之差，winner为最终的胜方
+        self.exact = False
+        self.winner = cell_empty
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / max(self.seconds, 1e-9)
+
+    def __repr__(self):
+        exact_info = f" exact winner={self.winner}" if self.exact else ""
+        return f"move={self.move} score={self.score} depth={self.depth} nodes={self.nodes} seconds={self.seconds:.2f} nps={self.nodes_per_second():.0f} stopped={self.stopped}{exact_info}"
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class Engine:
+    """
+    迭代加深的alpha-beta搜索，供 reversi.py 的 AiThread 调用
+    置换表在多次搜索间保留，因此同一局中应复用同一个Engine
+    """
+
+    # 每搜索这么多个节点检查一次是否超时或需要停止
+    check_interval_nodes = 1024
+    progress_interval_seconds = 1 / 60
+    # 已用时间超过该比例时，下一层大概率无法在剩余时间内完成，不再继续加深
+    deepen_time_ratio = 0.5
+    # 残局求解中，空位多于该数目时使用快速优先排序，否则只按奇偶性排序，因为此时排序本身的开销已经超过其收益
+    fastest_first_min_empties = 6
+
+    def __init__(self, settings: SearchSettings = None, tt: TranspositionTable = None, helper_id: int = 0):
+        if settings is None:
+            settings = SearchSettings()
+        if tt is None:
+            tt = TranspositionTable(settings.tt_size_bits)
+
+        self.settings = settings
+        self.tt = tt
+        # 并行搜索中的辅助搜索的编号，0表示主搜索
+        self.helper_id = helper_id
+        self.nodes = 0
+        self.stopped = False
+        # 每一层的两个杀手着法（在同层其他节点引发剪枝的落子）
+        self.killers = []  # type: List[List[int]]
+
+        self._deadline = 0.0
+        self._start_time = 0.0
+        self._last_progress_time = 0.0
+        self._should_stop = None  # type: Optional[Callable[[], bool]]
+        self._on_progress = None  # type: Optional[Callable[[float], None]]
+
+    def search(self, position: Position, should_stop: Callable[[], bool] = None, on_progress: Callable[[float], None] = None) -> SearchResult:
+        """
+        从1层开始逐层加深搜索当前行动方的最佳落子，超时或被要求停止时，返回最后一次完整搜索的结果
+        :param should_stop: 返回True时立即停止搜索，如游戏已重开
+        :param on_progress: 定期回调已用时长（秒），用于更新界面倒计时
+        """
+        settings = self.settings
+
+        self.nodes = 0
+        self.stopped = False
+        self.killers = [[0, 0] for _ in range(settings.max_depth + 1)]
+        if self.helper_id == 0:
+            # 辅助搜索直接沿用主搜索设置的代数
+            self.tt.new_search()
+        self._start_time = time.perf_counter()
+        self._deadline = self._start_time + settings.max_seconds
+        self._last_progress_time = self._start_time
+        self._should_stop = should_stop
+        self._on_progress = on_progress
+
+        # 停止搜索时通过抛出 SearchStopped 直接退出，此时局面不会被还原，因此这里需要复制一份
+        position = position.copy()
+
+        result = SearchResult()
+        moves = position.moves()
+        if moves == 0:
+            # 无子可下时只能轮空，无需搜索
+            if position.opponent_moves() == 0:
+                result.score = terminal_score(position.player, position.opponent, position.color)
+        elif moves & (moves - 1) == 0:
+            # 只有一个选择时也无需搜索
+            result.move = bit_to_row_col(moves)
+        else:
+            # 万一第一层都未能完成，也保证返回一个合法落子
+            result.move = bit_to_row_col(self._order_moves(position.player, position.opponent, position.empty(), position.color, position.key, position.weights, moves, 0, 0, True, 0)[0])
+
+            solved = False
+            if position.empty_count() <= settings.endgame_empties and self.helper_id == 0:
+                solved = self._try_solve_endgame(position, result)
+
+            # 并行搜索时，一半的辅助搜索从第2层开始，与其他搜索错开
+            for depth in range(1 + self.helper_id % 2, 0 if solved else settings.max_depth + 1):
+                try:
+                    result.move, result.score = self._search_root(position, depth)
+                    result.depth = depth
+                except SearchStopped:
+                    self.stopped = True
+                    break
+
+                if time.perf_counter() - self._start_time >= settings.max_seconds * self.deepen_time_ratio:
+                    break
+
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - self._start_time
+        result.stopped = self.stopped
+
+        return result
+
+    def _try_solve_endgame(self, position: Position, result: SearchResult) -> bool:
+        """
+        尝试在限定时间内求出确切结果，成功时填充result并返回True
+        """
+        search_deadline = self._deadline
+        self._deadline = min(search_deadline, self._start_time + self.settings.max_seconds * self.settings.endgame_time_ratio)
+        try:
+            move, value = self._solve_root(position)
+        except SearchStopped:
+            logger.debug(f"残局求解超时，已搜索{self.nodes}个节点，将改为普通搜索")
+            return False
+        finally:
+            self._deadline = search_deadline
+
+        result.move = bit_to_row_col(move)
+        result.score = endgame_disc_diff(value, position.color)
+        result.depth = position.empty_count()
+        result.exact = True
+        result.winner = position.color if value > 0 else -position.color
+        return True
+
+    def _solve_root(self, position: Position) -> Tuple[int, int]:
+        player, opponent, color = position.player, position.opponent, position.color
+        empty = position.empty()
+        empties = popcount(empty)
+
+        alpha, beta = -endgame_inf, endgame_inf
+        best_move, best_value = 0, -endgame_inf
+        for move in self._order_endgame_moves(player, opponent, empty, empties, get_moves(player, opponent, empty)):
+            flips = get_flips(player, opponent, move)
+            value = -self._solve(opponent & ~flips, player | move | flips, empty ^ move, empties - 1, -color, -beta, -alpha)
+            if value > best_value:
+                best_move, best_value = move, value
+            if value > alpha:
+                alpha = value
+
+        return best_move, best_value
+
+    def _solve(self, player: int, opponent: int, empty: int, empties: int, color: int, alpha: int, beta: int) -> int:
+        """
+        搜索到终局的alpha-beta，返回当前行动方的 endgame_value
+        残局中不需要撤销落子，直接传递新的位棋盘即可，因此不使用 Position
+        """
+        self.nodes += 1
+        if self.nodes % self.check_interval_nodes == 0:
+            self._check_stop()
+
+        moves = get_moves(player, opponent, empty)
+        if moves == 0:
+            if get_moves(opponent, player, empty) == 0:
+                return endgame_value(player, opponent, color)
+
+            return -self._solve(opponent, player, empty, empties, -color, -beta, -alpha)
+
+        best_value = -endgame_inf
+        for move in self._order_endgame_moves(player, opponent, empty, empties, moves):
+            flips = get_flips(player, opponent, move)
+            value = -self._solve(opponent & ~flips, player | move | flips, empty ^ move, empties - 1, -color, -beta, -alpha)
+            if value > best_value:
+                best_value = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        return best_value
+
+    def _order_endgame_moves(self, player: int, opponent: int, empty: int, empties: int, moves: int) -> List[int]:
+        # 奇偶性：优先在剩余空位为奇数的区域落子，从而争取在各个区域中最后落子。洞不是空位，不参与计数
+        odd_regions = 0
+        for quadrant in quadrant_masks:
+            if popcount(empty & quadrant) & 1:
+                odd_regions |= quadrant
+
+        if empties <= self.fastest_first_min_empties:
+            return list(iter_bits(moves & odd_regions)) + list(iter_bits(moves & ~odd_regions))
+
+        # 快速优先：优先选择落子后对方可落子数目最少的，这样的分支通常更快被剪枝
+        scored_moves = []
+        for move in iter_bits(moves):
+            flips = get_flips(player, opponent, move)
+            opponent_mobility = popcount(get_moves(opponent & ~flips, player | move | flips, empty ^ move))
+            scored_moves.append((2 * opponent_mobility + (0 if move & odd_regions else 1), move))
+
+        scored_moves.sort()
+        return [move for _, move in scored_moves]
+
+    def _check_stop(self):
+        now = time.perf_counter()
+        if now >= self._deadline or (self._should_stop is not None and self._should_stop()):
+            raise SearchStopped()
+
+        if self._on_progress is not None and now - self._last_progress_time >= self.progress_interval_seconds:
+            self._last_progress_time = now
+            self._on_progress(now - self._start_time)
+
+    def _search_root(self, position: Position, depth: int) -> Tuple[Tuple[int, int], int]:
+        player, opponent, empty, color, key, weights = position.player, position.opponent, position.empty(), position.color, position.key, position.weights
+        moves = get_moves(player, opponent, empty)
+
+        # 上一层迭代得到的最佳落子会作为置换表中的最佳落子排在最前面
+        hash_move = tt_move(self.tt.probe(key))
+
+        move_list = self._order_moves(player, opponent, empty, color, key, weights, moves, depth, 0, False, hash_move)
+        if self.helper_id != 0 and len(move_list) > 1:
+            # 辅助搜索轮换第一个之后的落子顺序，从而优先搜索不同的子树，并将结果写入共享的置换表
+            rotate = self.helper_id % (len(move_list) - 1)
+            move_list = move_list[:1] + move_list[1 + rotate:] + move_list[1:1 + rotate]
+
+        alpha, beta = -score_inf, score_inf
+        best_move, best_score = 0, -score_inf
+        for move in move_list:
+            score = self._search_move(player, opponent, empty, color, key, weights, move, get_flips(player, opponent, move), depth, alpha, beta, 0, False)
+
+            if score > best_score or best_move == 0:
+                best_move, best_score = move, score
+            if score > alpha:
+                alpha = score
+
+        self.tt.store(key, depth, bound_exact, best_score, best_move)
+
+        return bit_to_row_col(best_move), best_score
+
+    def _search_move(self, player: int, opponent: int, empty: int, color: int, key: int, weights: int, move: int, flips: int, depth: int, alpha: int, beta: int, ply: int, presearch: bool) -> int:
+        """
+        在move处落子并翻转flips，从当前行动方的角度返回对落子后的局面进行depth-1层搜索的分数
+        """
+        if depth == 1:
+            # 叶节点占了绝大部分，直接在这里评估，省去递归调用以及叶节点用不到的哈希计算。局面分对双方是对称的，直接从当前行动方的角度计算落子后的局面
+            self._count_nodes(1)
+            return evaluate_board(player | move | flips, opponent & ~flips, empty ^ move, color, weights + move_weights_delta(move, flips))
+
+        child_key = key ^ zobrist_place[color][move] ^ zobrist_red_to_move
+        child_weights = weights + place_weights[move]
+        remaining_flips = flips
+        while remaining_flips:
+            bit = remaining_flips & -remaining_flips
+            child_key ^= zobrist_flip[bit]
+            child_weights += flip_weights[bit]
+            remaining_flips ^= bit
+
+        return -self._negamax(opponent & ~flips, player | move | flips, empty ^ move, -color, child_key, -child_weights, depth - 1, -beta, -alpha, ply + 1, presearch)
+
+    def _negamax(self, player: int, opponent: int, empty: int, color: int, key: int, weights: int, depth: int, alpha: int, beta: int, ply: int, presearch: bool) -> int:
+        """
+        与残局求解类似，直接传递位棋盘及增量维护的哈希与位置权重，而不是在 Position 上 make/unmake，减少每个节点的开销
+        """
+        if depth == 1:
+            return self._search_frontier(player, opponent, empty, color, key, weights, alpha, beta, ply, presearch)
+
+        self.nodes += 1
+        if self.nodes % self.check_interval_nodes == 0:
+            self._check_stop()
+
+        if depth <= 0:
+            return evaluate_board(player, opponent, empty, color, weights)
+
+        data = self.tt.probe(key)
+        hash_move = 0
+        if data:
+            hash_move = tt_move(data)
+            if tt_depth(data) >= depth:
+                score, bound = tt_score(data), tt_bound(data)
+                if bound == bound_exact or (bound == bound_lower and score >= beta) or (bound == bound_upper and score <= alpha):
+                    return score
+
+        # 置换表或杀手着法中的落子通常就会引发剪枝，因此先单独搜索，引发剪枝时即可省去生成全部落子并排序的开销
+        move_list = None  # type: Optional[List[int]]
+        first_move, first_flips = self._find_first_move(player, opponent, empty, depth, ply, presearch, hash_move)
+        if first_move == 0:
+            moves = get_moves(player, opponent, empty)
+            if moves == 0:
+                if get_moves(opponent, player, empty) == 0:
+                    return terminal_score(player, opponent, color)
+
+                return -self._negamax(opponent, player, empty, -color, key ^ zobrist_red_to_move, -weights, depth - 1, -beta, -alpha, ply + 1, presearch)
+
+            move_list = self._order_moves(player, opponent, empty, color, key, weights, moves, depth, ply, presearch, hash_move)
+            first_move = move_list[0]
+            first_flips = get_flips(player, opponent, first_move)
+
+        original_alpha = alpha
+        best_move, best_score = first_move, self._search_move(player, opponent, empty, color, key, weights, first_move, first_flips, depth, alpha, beta, ply, presearch)
+        if best_score > alpha:
+            alpha = best_score
+
+        if alpha < beta:
+            if move_list is None:
+                # _order_moves 同样会将其排在最前面
+                move_list = self._order_moves(player, opponent, empty, color, key, weights, get_moves(player, opponent, empty), depth, ply, presearch, hash_move)
+
+            for move in move_list[1:]:
+                score = self._search_move(player, opponent, empty, color, key, weights, move, get_flips(player, opponent, move), depth, alpha, beta, ply, presearch)
+                if score > best_score:
+                    best_move, best_score = move, score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            break
+
+        self._store_result(key, depth, original_alpha, beta, ply, best_move, best_score)
+
+        return best_score
+
+    def _search_frontier(self, player: int, opponent: int, empty: int, color: int, key: int, weights: int, alpha: int, beta: int, ply: int, presearch: bool) -> int:
+        """
+        剩余深度为1的节点，同 _negamax。这类节点与其下的叶节点占了搜索的绝大部分，因此单独处理：
+        叶节点直接在这里评估，省去递归调用以及叶节点用不到的哈希计算。局面分对双方是对称的，直接从当前行动方的角度计算落子后的局面
+        先评估的置换表或杀手着法中的落子未能引发剪枝时，才需要当前局面的全部落子，因此在计算该落子后双方行动力的同时顺便计算
+        """
+        self.nodes += 1
+        if self.nodes % self.check_interval_nodes == 0:
+            self._check_stop()
+
+        data = self.tt.probe(key)
+        hash_move = 0
+        if data:
+            hash_move = tt_move(data)
+            if tt_depth(data) >= 1:
+                score, bound = tt_score(data), tt_bound(data)
+                if bound == bound_exact or (bound == bound_lower and score >= beta) or (bound == bound_upper and score <= alpha):
+                    return score
+
+        move_list = None  # type: Optional[List[int]]
+        first_move, first_flips = self._find_first_move(player, opponent, empty, 1, ply, presearch, hash_move)
+        if first_move != 0:
+            child_player, child_opponent, child_empty = player | first_move | first_flips, opponent & ~first_flips, empty ^ first_move
+            # 前两条通道与 get_both_moves 相同，第三条通道为当前局面的可落子位置
+            lane_moves = get_lane_moves(
+                child_player | (child_opponent << lane_bits) | (player << (2 * lane_bits)),
+                child_opponent | (child_player << lane_bits) | (opponent << (2 * lane_bits)),
+                child_empty | (child_empty << lane_bits) | (empty << (2 * lane_bits)),
+                lanes_not_edge_files[3],
+            )
+            moves = lane_moves >> (2 * lane_bits)
+            both_moves = lane_moves & two_lanes_mask
+        else:
+            moves = get_moves(player, opponent, empty)
+            if moves == 0:
+                if get_moves(opponent, player, empty) == 0:
+                    return terminal_score(player, opponent, color)
+
+                return -self._negamax(opponent, player, empty, -color, key ^ zobrist_red_to_move, -weights, 0, -beta, -alpha, ply + 1, presearch)
+
+            move_list = self._order_moves(player, opponent, empty, color, key, weights, moves, 1, ply, presearch, hash_move)
+            first_move = move_list[0]
+            first_flips = get_flips(player, opponent, first_move)
+            child_player, child_opponent, child_empty = player | first_move | first_flips, opponent & ~first_flips, empty ^ first_move
+            both_moves = get_both_moves(child_player, child_opponent, child_empty)
+
+        self._count_nodes(1)
+        best_move, best_score = first_move, score_board(child_player, child_opponent, child_empty, color, weights + move_weights_delta(first_move, first_flips), both_moves)
+
+        if best_score < beta:
+            if move_list is None:
+                # _order_moves 同样会将其排在最前面
+                move_list = self._order_moves(player, opponent, empty, color, key, weights, moves, 1, ply, presearch, hash_move)
+
+            best_move, best_score = self._search_leaves(player, opponent, empty, color, weights, move_list[1:], beta, best_move, best_score)
+
+        self._store_result(key, 1, alpha, beta, ply, best_move, best_score)
+
+        return best_score
+
+    def _store_result(self, key: int, depth: int, alpha: int, beta: int, ply: int, best_move: int, best_score: int):
+        """
+        搜索完一个节点后，更新杀手着法，并将结果写入置换表，alpha/beta为搜索该节点时的窗口
+        """
+        if best_score >= beta:
+            killers = self.killers[ply]
+            if killers[0] != best_move:
+                killers[1] = killers[0]
+                killers[0] = best_move
+
+        if best_score <= alpha:
+            bound = bound_upper
+        elif best_score >= beta:
+            bound = bound_lower
+        else:
+            bound = bound_exact
+        self.tt.store(key, depth, bound, best_score, best_move)
+
+    def _search_leaves(self, player: int, opponent: int, empty: int, color: int, weights: int, move_list: List[int], beta: int, best_move: int, best_score: int) -> Tuple[int, int]:
+        """
+        依次评估剩余深度为1的节点中除第一个落子以外的其余落子，返回 (最佳落子, 分数)，best_move/best_score为第一个落子的结果
+        第一个落子未能引发剪枝时，其余落子通常大部分都需要评估，因此将这些子局面放入各自的通道中，一次性计算行动力
+        """
+        if not move_list:
+            return best_move, best_score
+
+        # 每个子局面占两条通道，分别为落子后的双方
+        flips_list = []
+        packed_move, packed_flips, shift = 0, 0, 0
+        for move in move_list:
+            flips = get_flips(player, opponent, move)
+            flips_list.append(flips)
+            packed_move |= move << shift
+            packed_flips |= flips << shift
+            shift += 2 * lane_bits
+
+        # 乘以 lanes_repeat 即可将当前局面复制到每个子局面的第一条通道中，再统一加上各自的落子与翻转
+        repeat = lanes_repeat[len(move_list)]
+        packed_player = player * repeat | packed_move | packed_flips
+        packed_opponent = opponent * repeat & ~packed_flips
+        packed_empty = empty * repeat ^ packed_move
+        packed_moves = get_lane_moves(
+            packed_player | (packed_opponent << lane_bits),
+            packed_opponent | (packed_player << lane_bits),
+            packed_empty | (packed_empty << lane_bits),
+            lanes_not_edge_files[2 * len(move_list)],
+        )
+
+        evaluated = 0
+        for move, flips in zip(move_list, flips_list):
+            evaluated += 1
+            score = score_board(player | move | flips, opponent & ~flips, empty ^ move, color, weights + move_weights_delta(move, flips), packed_moves & two_lanes_mask)
+            packed_moves >>= 2 * lane_bits
+
+            if score > best_score:
+                best_move, best_score = move, score
+                if score >= beta:
+                    break
+
+        self._count_nodes(evaluated)
+        return best_move, best_score
+
+    def _find_first_move(self, player: int, opponent: int, empty: int, depth: int, ply: int, presearch: bool, hash_move: int) -> Tuple[int, int]:
+        """
+        不生成全部落子，直接找出 _order_moves 排在最前面的置换表或杀手着法，返回 (落子, 被翻转的棋子)，均不可落子时返回 (0, 0)
+        需要预搜索时，落子顺序由预搜索的结果决定，因此同样返回 (0, 0)
+        """
+        settings = self.settings
+        if settings.enable_presearch and not presearch and depth > settings.presearch_depth:
+            return 0, 0
+
+        killers = self.killers[ply]
+        for move in [hash_move, killers[0], killers[1]]:
+            if move & empty:
+                flips = get_flips(player, opponent, move)
+                if flips:
+                    return move, flips
+
+        return 0, 0
+
+    def _count_nodes(self, count: int):
+        nodes = self.nodes + count
+        if nodes // self.check_interval_nodes != self.nodes // self.check_interval_nodes:
+            self.nodes = nodes
+            self._check_stop()
+        self.nodes = nodes
+
+    def _order_moves(self, player: int, opponent: int, empty: int, color: int, key: int, weights: int, moves: int, depth: int, ply: int, presearch: bool, hash_move: int) -> List[int]:
+        settings = self.settings
+        need_presearch = settings.enable_presearch and \
+            not presearch and \
+            popcount(moves) > settings.max_choice_per_depth and \
+            depth > settings.presearch_depth
+
+        if need_presearch:
+            # 预先浅层搜索各个落子得到评分，按照该评分排序，并只保留前几个
+            scored_moves = []
+            for move in iter_bits(moves):
+                score = self._search_move(player, opponent, empty, color, key, weights, move, get_flips(player, opponent, move), settings.presearch_depth, -score_inf, score_inf, ply, True)
+                scored_moves.append((score, move))
+
+            scored_moves.sort(key=lambda v: v[0], reverse=True)
+            move_list = [move for score, move in scored_moves[:settings.max_choice_per_depth]]
+        else:
+            # 否则按照位置权重从高到低排列（相同权重的按位序排列），再将杀手着法提前
+            move_list = []
+            for mask in move_order_masks:
+                remaining_moves = moves & mask
+                while remaining_moves:
+                    move = remaining_moves & -remaining_moves
+                    move_list.append(move)
+                    remaining_moves ^= move
+
+            for killer in reversed(self.killers[ply]):
+                if killer & moves and killer != move_list[0]:
+                    move_list.remove(killer)
+                    move_list.insert(0, killer)
+
+        # 置换表中记录的最佳落子（主要变例）优先搜索
+        if hash_move & moves and hash_move in move_list and hash_move != move_list[0]:
+            move_list.remove(hash_move)
+            move_list.insert(0, hash_move)
+
+        return move_list
+
+
+class ParallelEngine:
+    """
+    lazy SMP 并行搜索：当前线程与若干辅助进程同时对同一局面进行迭代加深搜索，通过共享内存中的置换表交换结果
+    辅助进程以不同的根节点落子顺序和起始层数搜索，主搜索可以直接使用它们写入置换表的结果，在相同时间内搜索得更深
+    parallel_workers为0或无法创建子进程时，退化为单进程的 Engine
+    """
+
+    # 停止后等待辅助进程返回结果的最长时间
+    collect_result_timeout = 1.0
+
+    def __init__(self, settings: SearchSettings = None):
+        if settings is None:
+            settings = SearchSettings()
+
+        self.settings = settings
+        self.engine = Engine(settings)
+
+        self._processes = []  # type: List[multiprocessing.Process]
+        self._task_queues = []  # type: List[multiprocessing.Queue]
+        self._result_queue = None  # type: Optional[multiprocessing.Queue]
+        self._stop_event = None  # type: Optional[Any]
+        self._search_id = 0
+        self._started_settings = (0, 0)
+        self._atexit_registered = False
+
+    def search(self, position: Position, should_stop: Callable[[], bool] = None, on_progress: Callable[[float], None] = None) -> SearchResult:
+        settings = self.settings
+        self.engine.settings = settings
+
+        # 残局求解只在主搜索中进行，无需辅助进程
+        if settings.parallel_workers <= 0 or position.empty_count() <= settings.endgame_empties or not self._ensure_workers():
+            return self.engine.search(position, should_stop, on_progress)
+
+        self._search_id += 1
+        search_id = self._search_id
+        self._stop_event.clear()
+
+        # 先让主搜索设置本次搜索的代数，辅助搜索沿用同一个值
+        tt = self.engine.tt
+        generation = (tt.generation + 1) & 0xFF
+        task = (search_id, settings, generation, (position.player, position.opponent, position.holes, position.color))
+        for task_queue in self._task_queues:
+            task_queue.put(task)
+
+        def main_should_stop() -> bool:
+            return should_stop is not None and should_stop()
+
+        try:
+            result = self.engine.search(position, main_should_stop, on_progress)
+        finally:
+            # 主搜索结束（完成、超时或被要求停止）后，辅助搜索也随之停止
+            self._stop_event.set()
+
+        helper_results = self._collect_results(search_id)
+
+        # 选择完整搜索层数最深的结果，相同时以主搜索为准
+        best = result
+        for helper_result in helper_results:
+            if helper_result.depth > best.depth and helper_result.move is not None:
+                best = helper_result
+
+        merged = SearchResult()
+        merged.move, merged.score, merged.depth = best.move, best.score, best.depth
+        merged.nodes = result.nodes + sum(helper_result.nodes for helper_result in helper_results)
+        merged.seconds = result.seconds
+        merged.stopped = result.stopped
+
+        return merged
+
+    def _collect_results(self, search_id: int) -> List[SearchResult]:
+        results = []
+        deadline = time.perf_counter() + self.collect_result_timeout
+        while len(results) < len(self._processes):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                logger.debug(f"等待辅助搜索结果超时，已收到{len(results)}/{len(self._processes)}个")
+                break
+
+            try:
+                result_search_id, helper_id, result = self._result_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            # 忽略之前超时未收集的结果
+            if result_search_id == search_id:
+                results.append(result)
+
+        return results
+
+    def _ensure_workers(self) -> bool:
+        settings = self.settings
+        if self._started_settings == (settings.parallel_workers, settings.tt_size_bits) and all(process.is_alive() for process in self._processes):
+            return True
+
+        self.close()
+        try:
+            self._start_workers()
+            return True
+        except Exception as e:
+            logger.warning(f"启动并行搜索进程失败，将仅使用单进程搜索: {e}")
+            self.close()
+            self.engine = Engine(settings)
+            return False
+
+    def _start_workers(self):
+        settings = self.settings
+
+        ctx = multiprocessing.get_context()
+        shared_table = ctx.RawArray("Q", 2 * (1 << settings.tt_size_bits))
+        self.engine = Engine(settings, TranspositionTable(settings.tt_size_bits, shared_table))
+
+        self._result_queue = ctx.Queue()
+        self._stop_event = ctx.Event()
+        for helper_id in range(1, settings.parallel_workers + 1):
+            task_queue = ctx.Queue()
+            process = ctx.Process(
+                target=_parallel_search_worker,
+                args=(helper_id, shared_table, settings.tt_size_bits, task_queue, self._result_queue, self._stop_event),
+                daemon=True,
+            )
+            process.start()
+
+            self._task_queues.append(task_queue)
+            self._processes.append(process)
+
+        self._started_settings = (settings.parallel_workers, settings.tt_size_bits)
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+        logger.info(f"已启动{len(self._processes)}个并行搜索进程")
+
+    def close(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+        self._processes = []
+        self._task_queues = []
+        self._result_queue = None
+        self._stop_event = None
+        self._started_settings = (0, 0)
+
+
+def _parallel_search_worker(helper_id: int, shared_table: Any, tt_size_bits: int, task_queue: multiprocessing.Queue, result_queue: multiprocessing.Queue, stop_event: Any):
+    engine = Engine(SearchSettings(), TranspositionTable(tt_size_bits, shared_table), helper_id)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        search_id, settings, generation, (player, opponent, holes, color) = task
+        engine.settings = settings
+        engine.tt.generation = generation
+
+        result = engine.search(Position(player, opponent, holes, color), should_stop=stop_event.is_set)
+        result_queue.put((search_id, helper_id, result))
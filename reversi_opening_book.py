@@ -0,0 +1,206 @@
+# 黑白棋AI的开局库：由 _build_reversi_opening_book.py 通过引擎自我对弈离线生成，对局时命中则直接落子，无需搜索
+# 文件格式（小端序）：
+#   头部 16 字节：magic(4字节) 版本(4字节) 条目数n(8字节)
+#   n 个从小到大排序的 uint64 局面哈希
+#   n 个 uint8 落子位置（第 row*8+col 位，均从0开始）
+# 局面哈希为 zobrist 哈希（包含洞的位置与行动方），并取8种对称变换中最小的一个，使得对称的棋盘布局可以共用同一份结果
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log import logger
+from reversi_engine import (Position, bit_to_row_col, full_mask,
+                            row_col_to_bit, zobrist_hash)
+
+opening_book_magic = b"RVBK"
+opening_book_version = 1
+_header_format = "<4sIQ"
+_header_size = struct.calcsize(_header_format)
+
+default_opening_book_path = "reversi_opening_book.bin"
+
+
+def flip_vertical(bb: int) -> int:
+    # 上下翻转，即第row行与第7-row行互换
+    return int.from_bytes(bb.to_bytes(8, "little"), "big")
+
+
+def mirror_horizontal(bb: int) -> int:
+    # 左右翻转，即每一行内的第col列与第7-col列互换
+    bb = ((bb >> 1) & 0x5555555555555555) | ((bb & 0x5555555555555555) << 1)
+    bb = ((bb >> 2) & 0x3333333333333333) | ((bb & 0x3333333333333333) << 2)
+    bb = ((bb >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bb & 0x0F0F0F0F0F0F0F0F) << 4)
+    return bb
+
+
+def transpose(bb: int) -> int:
+    # 沿主对角线翻转，即行列互换
+    t = 0x0F0F0F0F00000000 & (bb ^ (bb << 28))
+    bb ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bb ^ (bb << 14))
+    bb ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bb ^ (bb << 7))
+    bb ^= t ^ (t >> 7)
+    return bb & full_mask
+
+
+def _compose(*transforms: Callable[[int], int]) -> Callable[[int], int]:
+    def _transform(bb: int) -> int:
+        for transform in transforms:
+            bb = transform(bb)
+        return bb
+
+    return _transform
+
+
+# 棋盘的8种对称变换，以及各自的逆变换
+symmetries = [
+    _compose(),
+    _compose(flip_vertical),
+    _compose(mirror_horizontal),
+    _compose(flip_vertical, mirror_horizontal),
+    _compose(transpose),
+    _compose(transpose, flip_vertical),
+    _compose(transpose, mirror_horizontal),
+    _compose(transpose, flip_vertical, mirror_horizontal),
+]
+inverse_symmetries = [
+    _compose(),
+    _compose(flip_vertical),
+    _compose(mirror_horizontal),
+    _compose(mirror_horizontal, flip_vertical),
+    _compose(transpose),
+    _compose(flip_vertical, transpose),
+    _compose(mirror_horizontal, transpose),
+    _compose(mirror_horizontal, flip_vertical, transpose),
+]
+
+
+def canonical_key(position: Position) -> Tuple[int, int]:
+    """
+    返回8种对称变换下最小的局面哈希，以及对应的变换序号
+    """
+    best_key, best_symmetry = -1, 0
+    for idx, transform in enumerate(symmetries):
+        key = zobrist_hash(transform(position.player), transform(position.opponent), transform(position.holes), position.color)
+        if best_key == -1 or key < best_key:
+            best_key, best_symmetry = key, idx
+
+    return best_key, best_symmetry
+
+
+def to_canonical_move(move: int, symmetry: int) -> int:
+    return symmetries[symmetry](move).bit_length() - 1
+
+
+def from_canonical_move(move_index: int, symmetry: int) -> int:
+    return inverse_symmetries[symmetry](1 << move_index)
+
+
+class OpeningBook:
+    """
+    通过mmap只读打开开局库文件，并在排序后的哈希数组上二分查找，无需将整个文件读入内存
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, count = struct.unpack_from(_header_format, self._mmap, 0)
+        if magic != opening_book_magic or version != opening_book_version or len(self._mmap) != _header_size + 9 * count:
+            self.close()
+            raise ValueError(f"开局库文件 {path} 格式不正确")
+
+        self.count = count
+        view = memoryview(self._mmap)
+        self._keys = view[_header_size:_header_size + 8 * count].cast("Q")
+        self._moves = view[_header_size + 8 * count:]
+
+    @classmethod
+    def load_if_exists(cls, path: str = default_opening_book_path) -> Optional['OpeningBook']:
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            book = cls(path)
+            logger.info(f"已加载开局库 {path}，共{book.count}个局面")
+            return book
+        except Exception as e:
+            logger.warning(f"加载开局库 {path} 失败，将不使用开局库: {e}")
+            return None
+
+    def lookup(self, position: Position) -> Optional[Tuple[int, int]]:
+        """
+        返回开局库中记录的落子（从1开始的行列），未收录时返回None
+        """
+        key, symmetry = canonical_key(position)
+        idx = bisect_left(self._keys, key)
+        if idx >= self.count or self._keys[idx] != key:
+            return None
+
+        move = from_canonical_move(self._moves[idx], symmetry)
+        if not move & position.moves():
+            # 理论上不会出现，除非哈希冲突
+            return None
+
+        return bit_to_row_col(move)
+
+    def entries(self) -> Dict[int, int]:
+        return {key: move for key, move in zip(self._keys, self._moves)}
+
+    def close(self):
+        if getattr(self, "_keys", None) is not None:
+            self._keys.release()
+            self._moves.release()
+            self._keys = self._moves = None
+        self._mmap.close()
+        self._file.close()
+
+
+def write_opening_book(path: str, entries: Dict[int, int]):
+    """
+    entries 为 局面哈希 -> 落子位置，先写入临时文件再替换，避免生成过程中中断导致文件损坏
+    """
+    keys = sorted(entries.keys())
+    key_array = array("Q", keys)
+    move_array = array("B", [entries[key] for key in keys])
+    if sys.byteorder != "little":
+        key_array.byteswap()
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(struct.pack(_header_format, opening_book_magic, opening_book_version, len(keys)))
+        key_array.tofile(f)
+        move_array.tofile(f)
+    os.replace(temp_path, path)
+
+
+def parse_holes(text: str) -> int:
+    """
+    解析 reversi.py 中 init_invalid_cells_by_input 所用的格式，如 a1 b1 c1 d1 e1，字母为行，数字为列
+    """
+    holes = 0
+    for row_col in text.split():
+        row, col = ord(row_col[0]) - ord('a') + 1, int(row_col[1:])
+        holes |= row_col_to_bit(row, col)
+
+    return holes
+
+
+def format_holes(holes: int) -> str:
+    cells = []  # type: List[str]
+    for idx in range(64):
+        if holes >> idx & 1:
+            cells.append(f"{chr(ord('a') + idx // 8)}{idx % 8 + 1}")
+
+    return " ".join(cells)
@@ -1,10 +1,24 @@
+from typing import Dict, List, Optional
+
 from config import ArkLotteryAwardConfig
 from setting_def import *
 from settings import ark_lottery, dnf_server_list
 
+# 以下配置均为只读数据，解析一次后即复用。使用 forkserver 方式创建的进程池中，各个进程会直接继承 forkserver 中预先解析好的结果
+_zzconfig = None  # type: Optional[ArkLotteryZzConfig]
+_area_servers = None  # type: Optional[List[DnfAreaServerListConfig]]
+_servers = None  # type: Optional[List[DnfServerConfig]]
+_server_id_to_name = {}  # type: Dict[str, str]
+_server_name_to_id = {}  # type: Dict[str, str]
+_server_id_to_area = {}  # type: Dict[str, DnfAreaServerListConfig]
+
 
-def zzconfig():
-    return ArkLotteryZzConfig().auto_update_config(ark_lottery.setting["zzconfig"])
+def zzconfig() -> ArkLotteryZzConfig:
+    global _zzconfig
+    if _zzconfig is None:
+        _zzconfig = ArkLotteryZzConfig().auto_update_config(ark_lottery.setting["zzconfig"])
+
+    return _zzconfig
 
 
 def parse_card_group_info_map(cfg: ArkLotteryZzConfig):
@@ -46,21 +60,35 @@ def parse_prize_list(cfg: ArkLotteryZzConfig):
 
 
 def dnf_area_server_list_config() -> List[DnfAreaServerListConfig]:
-    area_servers = []  # type: List[DnfAreaServerListConfig]
-    for area_server_setting in dnf_server_list.setting:
-        area_servers.append(DnfAreaServerListConfig().auto_update_config(area_server_setting))
+    global _area_servers
+    if _area_servers is None:
+        area_servers = []  # type: List[DnfAreaServerListConfig]
+        for area_server_setting in dnf_server_list.setting:
+            area_servers.append(DnfAreaServerListConfig().auto_update_config(area_server_setting))
+
+        _area_servers = area_servers
 
-    return area_servers
+    return _area_servers
 
 
-def dnf_server_list_config():
-    area_servers = dnf_area_server_list_config()
+def dnf_server_list_config() -> List[DnfServerConfig]:
+    global _servers
+    if _servers is None:
+        area_servers = dnf_area_server_list_config()
 
-    servers = []  # type: List[DnfServerConfig]
-    for area_server in area_servers:
-        servers.extend(area_server.opt_data_array)
+        servers = []  # type: List[DnfServerConfig]
+        for area_server in area_servers:
+            servers.extend(area_server.opt_data_array)
 
-    return servers
+            for server in area_server.opt_data_array:
+                # 与之前逐个查找的方式保持一致，同名或同id时以最先出现的为准
+                _server_id_to_name.setdefault(server.v, server.t)
+                _server_name_to_id.setdefault(server.t, server.v)
+                _server_id_to_area.setdefault(server.v, area_server)
+
+        _servers = servers
+
+    return _servers
 
 
 def dnf_server_name_list():
@@ -68,28 +96,21 @@ def dnf_server_name_list():
 
 
 def dnf_server_name_to_id(name):
-    for server in dnf_server_list_config():
-        if server.t == name:
-            return server.v
-
-    return ""
+    dnf_server_list_config()
+    return _server_name_to_id.get(name, "")
 
 
 def dnf_server_id_to_name(id):
-    for server in dnf_server_list_config():
-        if server.v == str(id):
-            return server.t
-
-    return ""
+    dnf_server_list_config()
+    return _server_id_to_name.get(str(id), "")
 
 
 def dnf_server_id_to_area_info(id: str) -> DnfAreaServerListConfig:
-    for area in dnf_area_server_list_config():
-        for server in area.opt_data_array:
-            if server.v == id:
-                return area
+    dnf_server_list_config()
+    if id not in _server_id_to_area:
+        return DnfAreaServerListConfig()
 
-    return DnfAreaServerListConfig()
+    return _server_id_to_area[id]
 
 
 if __name__ == '__main__':
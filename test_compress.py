@@ -0,0 +1,48 @@
+import io
+import lzma
+import os
+
+from compress import (_find_xz_stream_ranges, compress_file_with_lzma,
+                      compress_in_memory_with_lzma, decompress_file_with_lzma,
+                      decompress_in_memory_with_lzma)
+
+
+def test_compress_in_memory_with_lzma():
+    data = os.urandom(1000) + b"test" * 10000
+
+    for block_size in [100, 1024, 1024 * 1024]:
+        compressed = compress_in_memory_with_lzma(data, block_size)
+
+        # 分块压缩的结果需要能被标准lzma模块直接读取
+        assert lzma.decompress(compressed) == data
+        assert decompress_in_memory_with_lzma(compressed) == data
+
+    assert decompress_in_memory_with_lzma(compress_in_memory_with_lzma(b"")) == b""
+    assert decompress_in_memory_with_lzma(lzma.compress(data)) == data
+
+    # 过小或被截断的数据应当交给lzma模块处理，由其给出解压失败的错误
+    for invalid in [b"", b"ab", compress_in_memory_with_lzma(data, 100)[:3]]:
+        assert _find_xz_stream_ranges(io.BytesIO(invalid)) is None
+
+
+def test_compress_file_with_lzma(tmp_path):
+    data = b"test_file_compress" * 10000
+    filepath = str(tmp_path / "test_file")
+    compressed_filepath = filepath + ".7z"
+    decompressed_filepath = filepath + ".decompressed"
+    with open(filepath, "wb") as f:
+        f.write(data)
+
+    compress_file_with_lzma(filepath, compressed_filepath, block_size=4096)
+    with lzma.open(compressed_filepath, "rb") as f:
+        assert f.read() == data
+
+    decompress_file_with_lzma(compressed_filepath, decompressed_filepath)
+    with open(decompressed_filepath, "rb") as f:
+        assert f.read() == data
+
+    # 单个流的情况走流式解压
+    compress_file_with_lzma(filepath, compressed_filepath)
+    decompress_file_with_lzma(compressed_filepath, decompressed_filepath)
+    with open(decompressed_filepath, "rb") as f:
+        assert f.read() == data
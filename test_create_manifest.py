@@ -0,0 +1,24 @@
+import os
+
+from _create_manifest import get_deleted_files
+from _create_patches import extracted_release_cache_dir
+
+
+def test_get_deleted_files(tmp_path):
+    def make_release(release_dir: str, relpaths):
+        for relpath in relpaths:
+            filepath = os.path.join(release_dir, relpath)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(filepath, "w") as f:
+                f.write(relpath)
+
+    dir_all_release = str(tmp_path)
+    release_dir_name = "DNF蚊子腿小助手_v3.0.0_by风之凌殇"
+    current_files = {"a.txt", "utils/b.exe"}
+
+    make_release(os.path.join(dir_all_release, release_dir_name), current_files)
+    make_release(os.path.join(dir_all_release, "DNF蚊子腿小助手_v2.0.0_by风之凌殇"), ["a.txt", "old_in_release_dir.txt"])
+    # 本地不存在发布目录的旧版本会被解压到缓存目录中
+    make_release(os.path.join(dir_all_release, extracted_release_cache_dir, "md5", "DNF蚊子腿小助手_v1.0.0_by风之凌殇"), ["utils/b.exe", "utils/old_in_cache_dir.exe"])
+
+    assert get_deleted_files(dir_all_release, release_dir_name, current_files) == ["old_in_release_dir.txt", "utils/old_in_cache_dir.exe"]
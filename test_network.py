@@ -0,0 +1,79 @@
+import uuid
+
+from config import RetryConfig
+from db import CircuitBreakerDB
+from network import (get_backoff_wait_time, get_circuit_breaker_db,
+                     get_circuit_breaker_endpoint,
+                     get_shared_response_cache_key, try_request,
+                     update_circuit_breaker_db)
+
+
+def test_get_backoff_wait_time():
+    cfg = RetryConfig()
+    cfg.retry_wait_time = 1
+    cfg.max_retry_wait_time = 6
+
+    for retry_index, max_wait_time in enumerate([1, 2, 4, 6, 6]):
+        wait_time = get_backoff_wait_time(cfg, retry_index)
+        assert max_wait_time * 0.5 <= wait_time <= max_wait_time
+
+
+def test_get_circuit_breaker_endpoint():
+    assert get_circuit_breaker_endpoint("") == ""
+    assert get_circuit_breaker_endpoint("https://www.example.com/index?a=1&b=2") == "www.example.com/index"
+    assert get_circuit_breaker_endpoint("https://comm.ams.game.qq.com/ams/ame/amesvr?ameVersion=0.3&iActivityId=11117&sServiceDepartment=djc") == "comm.ams.game.qq.com/ams/ame/amesvr?iActivityId=11117"
+    assert get_circuit_breaker_endpoint("https://djcapp.game.qq.com/daoju/igw/main/?_service=buy.plug.swoole.judou&iAppId=1001") == "djcapp.game.qq.com/daoju/igw/main/?_service=buy.plug.swoole.judou"
+    assert get_circuit_breaker_endpoint("https://comm.ams.game.qq.com/ide/?iChartId=1&sServiceType=dnf") != get_circuit_breaker_endpoint("https://comm.ams.game.qq.com/ide/?iChartId=2&sServiceType=dnf")
+
+
+def test_get_shared_response_cache_key():
+    url_template = "https://example.com/api?api=lottery/receive&userId={user}&uin={user}&token={user}&t={user}"
+
+    assert get_shared_response_cache_key(url_template.format(user="1")) == get_shared_response_cache_key(url_template.format(user="2"))
+    assert get_shared_response_cache_key(url_template.format(user="1")) != get_shared_response_cache_key(url_template.replace("lottery/receive", "list/exchange").format(user="1"))
+    assert get_shared_response_cache_key("https://example.com/api", "a=1&uin=1") == get_shared_response_cache_key("https://example.com/api", "uin=2&a=1")
+    assert get_shared_response_cache_key("https://example.com/api", {"a": 1}) != get_shared_response_cache_key("https://example.com/api", {"a": 2})
+
+    # 角色相关的参数会影响返回内容，不同角色间不应共享
+    role_url_template = "https://example.com/api?uin=1&sArea={area}&sPartition={area}&sRoleId={role}"
+    assert get_shared_response_cache_key(role_url_template.format(area="11", role="1")) != get_shared_response_cache_key(role_url_template.format(area="11", role="2"))
+    assert get_shared_response_cache_key(role_url_template.format(area="11", role="1")) != get_shared_response_cache_key(role_url_template.format(area="12", role="1"))
+
+
+def test_circuit_breaker_stats():
+    cfg = RetryConfig()
+    cfg.max_retry_count = 3
+    cfg.retry_wait_time = 0
+    cfg.max_retry_wait_time = 0
+    cfg.circuit_breaker_failure_threshold = 1
+    cfg.circuit_breaker_cooldown_seconds = 60
+
+    url = f"https://www.example.com/test_circuit_breaker_stats_{uuid.uuid4().hex}"
+    endpoint = get_circuit_breaker_endpoint(url)
+
+    request_count = 0
+
+    def request_fn():
+        nonlocal request_count
+        request_count += 1
+        raise Exception("test")
+
+    def _remove_endpoint(db: CircuitBreakerDB):
+        db.endpoint_to_info.pop(endpoint, None)
+
+    try:
+        # 触发熔断的那次失败不应被记为快速失败
+        assert try_request(request_fn, cfg, url=url) is None
+        info = get_circuit_breaker_db().endpoint_to_info[endpoint]
+        assert request_count == 1
+        assert info.trip_count == 1
+        assert info.fail_fast_count == 0
+        assert info.saved_seconds == 0.0
+
+        # 熔断期间的请求将直接跳过，并记为快速失败
+        assert try_request(request_fn, cfg, url=url) is None
+        info = get_circuit_breaker_db().endpoint_to_info[endpoint]
+        assert request_count == 1
+        assert info.fail_fast_count == 1
+    finally:
+        update_circuit_breaker_db(_remove_endpoint)
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from phase_runner import PhaseRunner, phase_done, phase_failed, phase_skipped
+
+
+def test_phase_runner_order():
+    finished = []
+    lock = threading.Lock()
+
+    def make_phase(name: str):
+        def _phase():
+            with lock:
+                finished.append(name)
+
+        return _phase
+
+    runner = PhaseRunner("test")
+    runner.add("a", make_phase("a"))
+    runner.add("b", make_phase("b"), ["a"])
+    runner.add("c", make_phase("c"), ["a"])
+    runner.add("d", make_phase("d"), ["b", "c"], in_main_thread=True)
+    runner.add("e", make_phase("e"), ["d"])
+    runner.run()
+
+    assert sorted(finished) == ["a", "b", "c", "d", "e"]
+    assert finished[0] == "a"
+    assert finished.index("d") > max(finished.index("b"), finished.index("c"))
+    assert finished[-1] == "e"
+    assert runner.phases["d"].thread_name == "主线程"
+    assert all(phase.status == phase_done for phase in runner.phases.values())
+
+
+def test_phase_runner_concurrent():
+    # 两个互不依赖的步骤需要同时进行，才能都通过这个屏障
+    barrier = threading.Barrier(2, timeout=5)
+
+    runner = PhaseRunner("test")
+    runner.add("a", barrier.wait)
+    runner.add("b", barrier.wait)
+    runner.run()
+
+
+def test_phase_runner_exception():
+    def _fail():
+        raise ValueError("test")
+
+    runner = PhaseRunner("test")
+    runner.add("a", _fail)
+    runner.add("b", lambda: None, ["a"])
+    with pytest.raises(ValueError):
+        runner.run()
+
+    assert runner.phases["a"].status == phase_failed
+    assert runner.phases["b"].status == phase_skipped
+
+    with pytest.raises(ValueError):
+        runner.add("c", lambda: None, ["not_exists"])
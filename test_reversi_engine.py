@@ -0,0 +1,341 @@
+import random
+
+from reversi_engine import (Engine, ParallelEngine, Position, SearchSettings,
+                            TranspositionTable, bit_to_row_col, bound_lower,
+                            cell_blue, cell_red, endgame_disc_diff,
+                            endgame_value, evaluate, iter_bits, random_holes,
+                            row_col_to_bit, stable_mask, tt_bound, tt_depth,
+                            tt_move, tt_score, weight_sum, win_score,
+                            zobrist_hash)
+
+
+def naive_moves(position: Position):
+    # 逐个方向扫描的朴素实现，用于对照位运算版本
+    cells = position.to_cells()
+    color = position.color
+    moves = set()
+    for row in range(1, 9):
+        for col in range(1, 9):
+            if cells[row][col] != 0:
+                continue
+
+            for delta_row in [-1, 0, 1]:
+                for delta_col in [-1, 0, 1]:
+                    if delta_row == 0 and delta_col == 0:
+                        continue
+
+                    r, c = row + delta_row, col + delta_col
+                    count = 0
+                    while 1 <= r <= 8 and 1 <= c <= 8 and cells[r][c] == -color:
+                        r, c = r + delta_row, c + delta_col
+                        count += 1
+                    if count > 0 and 1 <= r <= 8 and 1 <= c <= 8 and cells[r][c] == color:
+                        moves.add((row, col))
+
+    return moves
+
+
+def random_positions(count: int, seed: int = 20211):
+    rand = random.Random(seed)
+    for _ in range(count):
+        position = Position.initial(random_holes(5, rand))
+        for _ in range(rand.randint(0, 50)):
+            moves = position.moves()
+            if moves == 0:
+                if position.opponent_moves() == 0:
+                    break
+                position.make_pass()
+                continue
+
+            position.make(rand.choice(list(iter_bits(moves))))
+
+        yield position
+
+
+def test_bit_row_col():
+    for row in range(1, 9):
+        for col in range(1, 9):
+            assert bit_to_row_col(row_col_to_bit(row, col)) == (row, col)
+
+
+def test_moves():
+    for position in random_positions(100):
+        moves = {bit_to_row_col(bit) for bit in iter_bits(position.moves())}
+        assert moves == naive_moves(position)
+        assert position.moves() & position.holes == 0
+
+
+def test_make_unmake():
+    for position in random_positions(50):
+        backup = position.copy()
+        for move in iter_bits(position.moves()):
+            flips = position.make(move)
+            assert flips != 0
+            assert position.color == -backup.color
+            position.unmake(move, flips)
+
+            assert (position.player, position.opponent, position.holes, position.color) == (backup.player, backup.opponent, backup.holes, backup.color)
+
+
+def test_incremental_terms():
+    # 增量维护的哈希与位置权重应当与重新计算的结果一致
+    for position in random_positions(50):
+        assert position.key == zobrist_hash(position.player, position.opponent, position.holes, position.color)
+        assert position.weights == weight_sum(position.player, position.opponent)
+
+        key, weights = position.key, position.weights
+        for move in iter_bits(position.moves()):
+            flips = position.make(move)
+            assert position.key == zobrist_hash(position.player, position.opponent, position.holes, position.color)
+            assert position.weights == weight_sum(position.player, position.opponent)
+            position.unmake(move, flips)
+            assert (position.key, position.weights) == (key, weights)
+
+    # 洞的位置不同，哈希也应不同
+    assert Position.initial().key != Position.initial(row_col_to_bit(1, 1)).key
+
+
+def test_transposition_table():
+    tt = TranspositionTable(4)
+    key = 0x123456789ABCDEF0
+
+    assert tt.probe(key) == 0
+    for score in [-win_score - 1, -win_score, -1, 0, 1, win_score, win_score + 1]:
+        tt.store(key, 5, bound_lower, score, row_col_to_bit(8, 8))
+        data = tt.probe(key)
+        assert (tt_score(data), tt_depth(data), tt_bound(data), tt_move(data)) == (score, 5, bound_lower, row_col_to_bit(8, 8))
+
+    # 同一次搜索中，映射到同一槽位的较浅条目不会覆盖较深的条目，但新的搜索中则会覆盖
+    other_key = key ^ (1 << 32)
+    tt.store(other_key, 3, bound_lower, 0, 0)
+    assert tt.probe(other_key) == 0 and tt.probe(key) != 0
+
+    tt.new_search()
+    tt.store(other_key, 3, bound_lower, 0, 0)
+    assert tt.probe(other_key) != 0 and tt.probe(key) == 0
+
+
+def test_cells_round_trip():
+    for position in random_positions(20):
+        restored = Position.from_cells(position.to_cells(), position.color)
+        assert (restored.player, restored.opponent, restored.holes) == (position.player, position.opponent, position.holes)
+
+
+def naive_stable_mask(empty: int) -> int:
+    stable = row_col_to_bit(1, 1) | row_col_to_bit(1, 8) | row_col_to_bit(8, 1) | row_col_to_bit(8, 8)
+
+    edges = [[(1, col) for col in range(1, 9)], [(8, col) for col in range(1, 9)], [(row, 1) for row in range(1, 9)], [(row, 8) for row in range(1, 9)]]
+    for edge in edges:
+        for line in [edge, edge[::-1]]:
+            for row, col in line:
+                if empty & row_col_to_bit(row, col):
+                    break
+                stable |= row_col_to_bit(row, col)
+
+    for row in range(2, 8):
+        for col in range(2, 8):
+            full = True
+            for delta_row, delta_col in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+                for direction in [1, -1]:
+                    r, c = row, col
+                    while 1 <= r <= 8 and 1 <= c <= 8:
+                        if empty & row_col_to_bit(r, c):
+                            full = False
+                        r, c = r + direction * delta_row, c + direction * delta_col
+            if full:
+                stable |= row_col_to_bit(row, col)
+
+    return stable
+
+
+def test_stable_mask():
+    rand = random.Random(7)
+    for _ in range(300):
+        # 空位从多到少都需要覆盖到
+        empty = rand.getrandbits(64) & rand.getrandbits(64) & rand.getrandbits(64) if rand.random() < 0.5 else rand.getrandbits(64)
+        assert stable_mask(empty) == naive_stable_mask(empty)
+
+    for position in random_positions(50):
+        assert stable_mask(position.empty()) == naive_stable_mask(position.empty())
+
+
+def test_evaluate_symmetric():
+    # 交换双方后局面分应当互为相反数
+    for position in random_positions(50):
+        if position.is_game_over():
+            continue
+
+        swapped = Position(position.opponent, position.player, position.holes, -position.color)
+        assert evaluate(position) == -evaluate(swapped)
+
+
+def test_search():
+    settings = SearchSettings()
+    settings.max_depth = 3
+    settings.enable_presearch = False
+
+    position = Position.initial()
+    res = Engine(settings).search(position)
+    assert res.move in naive_moves(position)
+    assert res.nodes > 0
+    assert res.depth == settings.max_depth
+    assert not res.stopped
+
+    # 双方都无子可下时不返回落子
+    full = Position(0xFFFFFFFF, 0xFFFFFFFF << 32, 0, cell_red)
+    res = Engine(settings).search(full)
+    assert res.move is None
+
+    # 外部要求停止时尽快返回，且仍然给出一个合法落子
+    settings.max_depth = 8
+    res = Engine(settings).search(Position.initial(), should_stop=lambda: True)
+    assert res.stopped
+    assert res.depth < settings.max_depth
+    assert res.move in naive_moves(Position.initial())
+
+
+def test_search_with_transposition_table():
+    # 不启用预搜索时，迭代加深+置换表的结果应与不使用置换表的搜索一致
+    settings = SearchSettings()
+    settings.max_depth = 4
+    settings.enable_presearch = False
+    settings.tt_size_bits = 12
+    settings.endgame_empties = 0
+
+    engine = Engine(settings)
+    for position in random_positions(10, seed=42):
+        if popcount_moves(position) < 2:
+            continue
+
+        assert engine.search(position).score == plain_negamax(position, settings.max_depth)
+
+
+def popcount_moves(position: Position) -> int:
+    return bin(position.moves()).count("1")
+
+
+def plain_negamax(position: Position, depth: int) -> int:
+    if depth == 0:
+        return evaluate(position)
+
+    moves = position.moves()
+    if moves == 0:
+        if position.opponent_moves() == 0:
+            return evaluate(position)
+
+        position.make_pass()
+        score = -plain_negamax(position, depth - 1)
+        position.make_pass()
+        return score
+
+    best = None
+    for move in iter_bits(moves):
+        flips = position.make(move)
+        score = -plain_negamax(position, depth - 1)
+        position.unmake(move, flips)
+        if best is None or score > best:
+            best = score
+
+    return best
+
+
+def test_search_pass():
+    # 蓝方无子可下但红方可以时，应当轮空
+    blue = row_col_to_bit(1, 2)
+    red = row_col_to_bit(1, 1)
+    position = Position(blue, red, 0, cell_blue)
+    assert position.moves() == 0 and position.opponent_moves() != 0
+
+    settings = SearchSettings()
+    settings.max_depth = 2
+    res = Engine(settings).search(position)
+    assert res.move is None
+
+
+def test_parallel_search():
+    settings = SearchSettings()
+    settings.max_depth = 4
+    settings.tt_size_bits = 12
+
+    position = next(random_positions(1, seed=7))
+
+    # 不启用并行时与单进程搜索的结果一致
+    serial_result = Engine(settings).search(position)
+    engine = ParallelEngine(settings)
+    res = engine.search(position)
+    assert (res.move, res.score, res.depth) == (serial_result.move, serial_result.score, serial_result.depth)
+
+    settings.parallel_workers = 2
+    try:
+        res = engine.search(position)
+        assert res.move in naive_moves(position)
+        assert res.depth == settings.max_depth
+
+        # 外部要求停止时，辅助进程也随之停止
+        settings.max_depth = 20
+        res = engine.search(position, should_stop=lambda: True)
+        assert res.stopped
+        assert res.move in naive_moves(position)
+    finally:
+        engine.close()
+
+
+def brute_force_endgame(player: int, opponent: int, holes: int, color: int) -> int:
+    position = Position(player, opponent, holes, color)
+    moves = position.moves()
+    if moves == 0:
+        if position.opponent_moves() == 0:
+            return endgame_value(player, opponent, color)
+
+        return -brute_force_endgame(opponent, player, holes, -color)
+
+    best = None
+    for move in iter_bits(moves):
+        flips = position.make(move)
+        value = -brute_force_endgame(position.player, position.opponent, holes, position.color)
+        position.unmake(move, flips)
+        if best is None or value > best:
+            best = value
+
+    return best
+
+
+def test_endgame_solver():
+    settings = SearchSettings()
+    settings.endgame_empties = 8
+
+    rand = random.Random(3)
+    solved = 0
+    while solved < 10:
+        position = Position.initial(random_holes(5, rand))
+        while position.empty_count() > 7 and not position.is_game_over():
+            moves = position.moves()
+            if moves == 0:
+                position.make_pass()
+                continue
+            position.make(rand.choice(list(iter_bits(moves))))
+
+        if bin(position.moves()).count("1") < 2:
+            continue
+
+        res = Engine(settings).search(position)
+        value = brute_force_endgame(position.player, position.opponent, position.holes, position.color)
+        assert res.exact
+        assert res.score == endgame_disc_diff(value, position.color)
+        assert res.winner == (position.color if value > 0 else -position.color)
+
+        # 选出的落子也应当能达到该结果
+        row, col = res.move
+        flips = position.make(row_col_to_bit(row, col))
+        assert -brute_force_endgame(position.player, position.opponent, position.holes, position.color) == value
+        position.unmake(row_col_to_bit(row, col), flips)
+
+        solved += 1
+
+
+def test_endgame_value():
+    # 平局时红方胜
+    assert endgame_value(0b11, 0b1100, cell_red) > 0
+    assert endgame_value(0b11, 0b1100, cell_blue) < 0
+    assert endgame_disc_diff(endgame_value(0b111, 0b1, cell_blue), cell_blue) == 2
+    assert endgame_disc_diff(endgame_value(0b1, 0b111, cell_red), cell_red) == -2
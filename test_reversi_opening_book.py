@@ -0,0 +1,83 @@
+import random
+
+from reversi_engine import (Engine, Position, SearchSettings, bit_to_row_col,
+                            iter_bits, random_holes, row_col_to_bit)
+from reversi_opening_book import (OpeningBook, canonical_key, flip_vertical,
+                                  format_holes, from_canonical_move,
+                                  inverse_symmetries, mirror_horizontal,
+                                  parse_holes, symmetries, to_canonical_move,
+                                  transpose, write_opening_book)
+
+
+def test_symmetries():
+    for row in range(1, 9):
+        for col in range(1, 9):
+            bit = row_col_to_bit(row, col)
+            assert bit_to_row_col(flip_vertical(bit)) == (9 - row, col)
+            assert bit_to_row_col(mirror_horizontal(bit)) == (row, 9 - col)
+            assert bit_to_row_col(transpose(bit)) == (col, row)
+
+    rand = random.Random(1)
+    for _ in range(20):
+        bb = rand.getrandbits(64)
+        for transform, inverse in zip(symmetries, inverse_symmetries):
+            assert inverse(transform(bb)) == bb
+
+
+def test_canonical_key():
+    rand = random.Random(2)
+    holes = random_holes(5, rand)
+    position = Position.initial(holes)
+    for _ in range(6):
+        position.make(rand.choice(list(iter_bits(position.moves()))))
+
+    key, symmetry = canonical_key(position)
+    for transform in symmetries:
+        # 对称的局面应得到相同的哈希，且记录的落子可以还原为各自局面中对应的落子
+        transformed = Position(transform(position.player), transform(position.opponent), transform(position.holes), position.color)
+        transformed_key, transformed_symmetry = canonical_key(transformed)
+        assert transformed_key == key
+
+        for move in iter_bits(position.moves()):
+            canonical_move = to_canonical_move(move, symmetry)
+            assert from_canonical_move(canonical_move, transformed_symmetry) == transform(move)
+
+
+def test_opening_book(tmp_path):
+    path = str(tmp_path / "book.bin")
+
+    settings = SearchSettings()
+    settings.max_depth = 2
+    engine = Engine(settings)
+
+    holes = parse_holes("a1 b3 c6 f2 h8")
+    assert format_holes(holes) == "a1 b3 c6 f2 h8"
+
+    position = Position.initial(holes)
+    entries = {}
+    positions = []
+    for _ in range(5):
+        row, col = engine.search(position).move
+        key, symmetry = canonical_key(position)
+        entries[key] = to_canonical_move(row_col_to_bit(row, col), symmetry)
+        positions.append((position.copy(), (row, col)))
+        position.make(row_col_to_bit(row, col))
+
+    write_opening_book(path, entries)
+    book = OpeningBook(path)
+    try:
+        assert book.count == len(entries)
+        assert book.entries() == entries
+        for position, move in positions:
+            assert book.lookup(position) == move
+
+        # 左右翻转后的布局可以共用同一份结果
+        position, (row, col) = positions[2]
+        mirrored = Position(mirror_horizontal(position.player), mirror_horizontal(position.opponent), mirror_horizontal(position.holes), position.color)
+        assert book.lookup(mirrored) == (row, 9 - col)
+
+        assert book.lookup(Position.initial()) is None
+    finally:
+        book.close()
+
+    assert OpeningBook.load_if_exists(str(tmp_path / "not_exists.bin")) is None
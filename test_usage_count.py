@@ -0,0 +1,73 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import ga
+import ga4
+from db import UsageReportSpoolDB
+from usage_count import UsageReporter
+
+
+def test_usage_reporter(monkeypatch):
+    requests_received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            requests_received.append((self.path, body))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server_addr = f"http://127.0.0.1:{server.server_address[1]}"
+
+    spool_context = "test_usage_reporter"
+    UsageReportSpoolDB().with_context(spool_context).reset()
+
+    try:
+        # 离线时应暂存到本地
+        monkeypatch.setattr(ga, "GA_BATCH_API_URL", "http://127.0.0.1:1/batch")
+        monkeypatch.setattr(ga4, "GA_API_URL", "http://127.0.0.1:1/mp/collect")
+
+        reporter = UsageReporter(batch_max_wait_seconds=0.1, spool_context=spool_context)
+        for idx in range(30):
+            reporter.report({
+                "name": f"test/event_{idx}",
+                "report_to_lean_cloud": False,
+                "report_to_google_analytics": True,
+                "ga_type": ga.GA_REPORT_TYPE_EVENT,
+                "ga_category": "",
+                "ga_misc_params": None,
+            })
+        reporter.close()
+
+        assert reporter.sent_count == 0
+        assert reporter.queue_depth() == 0
+        db = UsageReportSpoolDB().with_context(spool_context).load()
+        assert len(db.ga_hits) == 30
+        assert len(db.ga4_events) == 30
+
+        # 恢复网络后，新的上报线程启动时应批量补报之前暂存的统计
+        monkeypatch.setattr(ga, "GA_BATCH_API_URL", f"{server_addr}/batch")
+        monkeypatch.setattr(ga4, "GA_API_URL", f"{server_addr}/mp/collect")
+
+        reporter = UsageReporter(batch_max_wait_seconds=0.1, spool_context=spool_context)
+        reporter.ensure_started()
+        reporter.close()
+
+        assert reporter.sent_count == 60
+        assert UsageReportSpoolDB().with_context(spool_context).load().is_empty()
+
+        ga_bodies = [body for path, body in requests_received if path == "/batch"]
+        assert [len(body.splitlines()) for body in ga_bodies] == [20, 10]
+
+        ga4_bodies = [body for path, body in requests_received if path == "/mp/collect"]
+        assert [len(json.loads(body)["events"]) for body in ga4_bodies] == [25, 5]
+    finally:
+        UsageReportSpoolDB().with_context(spool_context).reset()
+        server.shutdown()
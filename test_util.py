@@ -9,6 +9,7 @@
 from math import pow
 
 import pytest
+import selenium.common.exceptions
 
 from network import set_last_response_info
 from util import *
@@ -2,20 +2,25 @@ import platform
 import random
 import re
 import webbrowser
-from datetime import datetime
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 import requests
 
 from config import CommonConfig
 from dao import UpdateInfo
+from db import UpdateInfoDB
 from first_run import is_first_run
 from log import color, logger
-from upload_lanzouyun import Uploader
-from util import (async_message_box, bypass_proxy, is_run_in_github_action,
-                  is_windows, try_except, use_proxy)
+from util import (async_message_box, bypass_proxy, format_time, get_now,
+                  is_run_in_github_action, is_windows, parse_time, try_except,
+                  use_proxy)
 from version import now_version, ver_time
 
+# 获取到的更新信息在这段时间内将直接使用，无需再发起请求
+update_info_cache_seconds = 10 * 60
+
 if is_windows():
     import win32api
     import win32con
@@ -23,6 +28,7 @@ if is_windows():
 
 def get_update_desc(config: CommonConfig):
     try:
+        from upload_lanzouyun import Uploader
         uploader = Uploader()
         latest_version = uploader.latest_version()
 
@@ -156,13 +162,46 @@ def show_update_info_on_first_run(ui: UpdateInfo):
 
 
 # 获取最新版本号与下载网盘地址
-def get_update_info(config: CommonConfig) -> UpdateInfo:
-    for changelog_page, readme_page in get_urls_and_mirrors(config):
-        try:
-            return _get_update_info(changelog_page, readme_page)
-        except:
-            # 尝试使用镜像来访问
-            logger.warning(f"使用 {changelog_page} 获取更新信息失败，尝试下一个镜像~")
+def get_update_info(config: CommonConfig, force_update=False) -> UpdateInfo:
+    db = UpdateInfoDB().load()
+
+    cached_update_info = None  # type: Optional[UpdateInfo]
+    if len(db.update_info) != 0:
+        cached_update_info = UpdateInfo()
+        cached_update_info.__dict__.update(db.update_info)
+
+        if not force_update and parse_time(db.fetched_at) + timedelta(seconds=update_info_cache_seconds) >= get_now():
+            logger.debug(f"更新信息缓存于{db.fetched_at}，尚未过期，直接使用")
+            return cached_update_info
+
+    # 同时请求原始地址与各个镜像，使用最先成功返回的结果
+    urls_and_mirrors = get_urls_and_mirrors(config)
+    pool = ThreadPoolExecutor(len(urls_and_mirrors))
+    try:
+        future_to_changelog_page = {
+            pool.submit(_get_update_info, changelog_page, readme_page, cached_update_info, db.url_to_validators): changelog_page
+            for changelog_page, readme_page in urls_and_mirrors
+        }
+        for future in as_completed(future_to_changelog_page):
+            try:
+                update_info, url_to_validators = future.result()
+            except Exception as e:
+                logger.warning(f"使用 {future_to_changelog_page[future]} 获取更新信息失败，等待其他镜像的结果~ {e}")
+                continue
+
+            db.update_info = dict(update_info.__dict__)
+            db.fetched_at = format_time(get_now())
+            db.url_to_validators.update(url_to_validators)
+            db.save()
+
+            return update_info
+    finally:
+        # 无需等待其他较慢的镜像
+        pool.shutdown(wait=False)
+
+    if cached_update_info is not None:
+        logger.warning(f"所有镜像均无法获取更新信息，将使用{db.fetched_at}时缓存的更新信息")
+        return cached_update_info
 
     raise Exception("无法获取更新信息")
 
@@ -183,15 +222,34 @@ def get_mirror(original_url: str, github_mirror_site: str):
     return original_url.replace("github.com", github_mirror_site)
 
 
-def _get_update_info(changelog_page: str, readme_page: str) -> UpdateInfo:
+def _get_update_info(changelog_page: str, readme_page: str, cached_update_info: Optional[UpdateInfo] = None, url_to_validators: Optional[Dict[str, Dict[str, str]]] = None) -> Tuple[UpdateInfo, Dict[str, Dict[str, str]]]:
+    """
+    获取并解析更新信息，同时返回各页面最新的 ETag 与 Last-Modified
+    若传入了之前的更新信息，则会带上这些信息发起条件请求，两个页面都未变化时将直接返回之前的更新信息
+    """
     logger.info(f"尝试使用 {changelog_page} 来查询更新信息")
 
-    update_info = UpdateInfo()
+    if cached_update_info is None or url_to_validators is None:
+        url_to_validators = {}
 
-    # 获取github本项目的readme页面内容和changelog页面内容
-    timeout = 3  # 由于国内网络不太好，加个超时
-    changelog_html_text = requests.get(changelog_page, timeout=timeout).text
-    readme_html_text = requests.get(readme_page, timeout=timeout).text
+    # 并行获取github本项目的readme页面内容和changelog页面内容
+    with ThreadPoolExecutor(2) as pool:
+        changelog_res, readme_res = pool.map(lambda page: get_page(page, url_to_validators.get(page, {})), [changelog_page, readme_page])
+
+    if changelog_res.status_code == 304 and readme_res.status_code == 304:
+        logger.info(f"{changelog_page} 与 {readme_page} 均未变化，继续使用之前的更新信息")
+        return cached_update_info, url_to_validators
+
+    # 只有部分页面未变化时，仍需要获取其完整内容来重新解析
+    if changelog_res.status_code == 304:
+        changelog_res = get_page(changelog_page)
+    if readme_res.status_code == 304:
+        readme_res = get_page(readme_page)
+
+    changelog_html_text = changelog_res.text
+    readme_html_text = readme_res.text
+
+    update_info = UpdateInfo()
 
     # 从更新日志中提取所有版本信息
     versions = re.findall(r"(?<=[vV])[0-9.]+(?=\s+\d+\.\d+\.\d+)", changelog_html_text)
@@ -206,11 +264,14 @@ def _get_update_info(changelog_page: str, readme_page: str) -> UpdateInfo:
     # 然后随机从仍有效的网盘链接中随机一个作为最终结果
     random.seed(datetime.now())
     random.shuffle(netdisk_address_matches)
-    for match in netdisk_address_matches:
-        if not is_shared_content_blocked(match[0]):
-            update_info.netdisk_link = match[0]
-            update_info.netdisk_passcode = match[1]
-            break
+    if len(netdisk_address_matches) != 0:
+        with ThreadPoolExecutor(len(netdisk_address_matches)) as pool:
+            blocked_list = list(pool.map(lambda match: is_shared_content_blocked(match[0]), netdisk_address_matches))
+        for match, blocked in zip(netdisk_address_matches, blocked_list):
+            if not blocked:
+                update_info.netdisk_link = match[0]
+                update_info.netdisk_passcode = match[1]
+                break
 
     # 尝试提取更新信息
     update_message_list_match_groupdict = re.search(r"(?<=更新公告</h1>)\s*<ol>(?P<update_message_list>(\s|\S)+?)</ol>", changelog_html_text, re.MULTILINE).groupdict()
@@ -221,7 +282,33 @@ def _get_update_info(changelog_page: str, readme_page: str) -> UpdateInfo:
 
     logger.info(f"netdisk_address_matches={netdisk_address_matches}, selected=({update_info.netdisk_link}, {update_info.netdisk_passcode})")
 
-    return update_info
+    return update_info, {
+        changelog_page: get_validators(changelog_res),
+        readme_page: get_validators(readme_res),
+    }
+
+
+def get_page(page: str, validators: Optional[Dict[str, str]] = None) -> requests.Response:
+    headers = {}
+    if validators:
+        if validators.get("etag", "") != "":
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified", "") != "":
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    timeout = 3  # 由于国内网络不太好，加个超时
+    res = requests.get(page, headers=headers, timeout=timeout)
+    if res.status_code != 304:
+        res.raise_for_status()
+
+    return res
+
+
+def get_validators(res: requests.Response) -> Dict[str, str]:
+    return {
+        "etag": res.headers.get("ETag", ""),
+        "last_modified": res.headers.get("Last-Modified", ""),
+    }
 
 
 # 是否需要更新
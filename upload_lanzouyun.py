@@ -2,17 +2,22 @@ import json
 import os
 import re
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, Iterator, List
 
 from compress import compress_file_with_lzma, decompress_file_with_lzma
 from const import compressed_temp_dir, downloads_dir
 from lanzou.api import LanZouCloud
 from lanzou.api.types import FileInFolder, FolderDetail
-from log import color, get_log_func, logger
-from util import (cache_name_download, human_readable_size,
-                  make_sure_dir_exists, parse_time, parse_timestamp,
-                  with_cache)
+from log import color, consoleHandler, get_log_func, lanzou_logger, logger
+from util import (GiB, KiB, MiB, cache_name_download,
+                  cache_name_lanzou_folder_index, human_readable_size,
+                  make_sure_dir_exists, md5_file, parse_time, parse_timestamp,
+                  reset_cache, with_cache)
+
+# lanzou 在导入时会将其日志等级重置为ERROR，由于现在是用到时才导入的，这里需要重新与控制台的日志等级保持一致
+lanzou_logger.setLevel(consoleHandler.level)
 
 Folder = namedtuple('Folder', ['name', 'id', 'url', 'password'])
 
@@ -38,9 +43,17 @@ class Uploader:
     history_version_prefix = "DNF蚊子腿小助手_v"
     history_patches_prefix = "DNF蚊子腿小助手_增量更新文件_"
     history_dlc_version_prefix = "auto_updater.exe"
+    history_manifest_prefix = "DNF蚊子腿小助手_文件清单_v"
+    history_blob_pack_prefix = "DNF蚊子腿小助手_文件数据包_v"
 
     regex_version = r'DNF蚊子腿小助手_v(.+)_by风之凌殇.7z'
     regex_patches = r'DNF蚊子腿小助手_增量更新文件_v(.+)_to_v(.+).7z'
+    regex_file_size = r'^(\d+(?:\.\d+)?)\s*([BKMGbkmg]?)'
+
+    file_size_unit_to_bytes = {"": 1, "B": 1, "K": KiB, "M": MiB, "G": GiB}
+
+    # 本地已有文件时，仅对超过该大小的文件对比md5来判断是否需要重新下载
+    min_file_size_to_check_content_md5 = 5 * MiB
 
     # 保存购买了自动更新工具的用户信息
     buy_auto_updater_users_filename = "buy_auto_updater_users.txt"
@@ -57,6 +70,15 @@ class Uploader:
     compressed_version_prefix = "compressed_"
     compressed_version_suffix = ".7z"
 
+    # 上传时会将文件内容的md5记录在文件描述中，用于跳过内容未变化的上传和下载
+    regex_content_md5 = r'md5=([0-9a-f]{32})'
+
+    # 目录文件列表的缓存时长，上传或删除文件后会清空缓存
+    folder_index_cache_seconds = 60
+
+    # 按页获取目录文件列表时，每批同时请求的页数
+    folder_pages_concurrency = 4
+
     def __init__(self):
         self.lzy = LanZouCloud()
         self.login_ok = False
@@ -98,6 +120,11 @@ class Uploader:
             return False
 
         filename = os.path.basename(filepath)
+        content_md5 = md5_file(filepath)
+        if self.is_same_content_uploaded(target_folder, filename, content_md5):
+            logger.warning(color("bold_cyan") + f"{target_folder.name} 中的 {filename} 与本地文件内容一致(md5={content_md5})，无需重新上传")
+            return True
+
         logger.warning(f"开始上传 {filename} 到 {target_folder.name}")
         run_start_time = datetime.now()
 
@@ -107,6 +134,9 @@ class Uploader:
 
             logger.info(f"上传完成，fid={fid}")
 
+            # 记录文件内容的md5，方便后续跳过内容未变化的上传和下载
+            self.lzy.set_desc(fid, self.make_content_md5_desc(content_md5))
+
             folder_history_files = self.folder_history_files
             if target_folder.id == self.folder_online_files.id:
                 folder_history_files = self.folder_online_files_history_files
@@ -124,6 +154,9 @@ class Uploader:
             logger.info(f"将文件移到目录({target_folder.name})中")
             self.lzy.move_file(fid, target_folder.id)
 
+            # 目录内容已经变化，清空目录文件列表的缓存
+            reset_cache(cache_name_lanzou_folder_index)
+
         # 上传到指定的文件夹中
         retCode = self.lzy.upload_file(filepath, -1, callback=self.show_progress, uploaded_handler=on_uploaded)
         if retCode != LanZouCloud.SUCCESS:
@@ -135,6 +168,72 @@ class Uploader:
 
         return True
 
+    def is_same_content_uploaded(self, target_folder: Folder, filename: str, content_md5: str) -> bool:
+        """
+        检查目标目录中的同名文件是否与本地文件内容一致
+        """
+        file = self.lzy.get_file_list(target_folder.id).find_by_name(filename)
+        if file is None or not file.has_des:
+            return False
+
+        share_info = self.lzy.get_share_info(file.id)
+        if share_info.code != LanZouCloud.SUCCESS:
+            return False
+
+        return self.parse_content_md5_from_desc(share_info.desc) == content_md5
+
+    def is_same_content_as_local_file(self, fileinfo: FileInFolder, local_file_path: str) -> bool:
+        """
+        检查网盘中的文件是否与本地文件内容一致，若网盘中的文件未记录md5，则视为不一致
+        """
+        for possiable_url in self.all_possiable_urls(fileinfo.url):
+            file_detail = self.lzy.get_file_info_by_url(possiable_url)
+            if file_detail.code != LanZouCloud.SUCCESS:
+                logger.debug(f"请求{possiable_url}失败，将尝试下一个")
+                continue
+
+            server_md5 = self.parse_content_md5_from_desc(file_detail.desc)
+            return server_md5 != "" and server_md5 == md5_file(local_file_path)
+
+        return False
+
+    def need_check_content_md5(self, fileinfo: FileInFolder, local_file_path: str) -> bool:
+        """
+        仅对较大的文件额外请求其描述并计算本地文件的md5，小文件直接重新下载即可
+        同时先使用文件列表中的大小粗略对比，若大小明显不同，则内容必然不一致，无需额外请求
+        """
+        local_file_size = os.path.getsize(local_file_path)
+        if local_file_size < self.min_file_size_to_check_content_md5:
+            return False
+
+        server_file_size = self.parse_file_size(fileinfo.size)
+        if server_file_size < 0:
+            return True
+
+        # 蓝奏云显示的大小仅保留一位小数，因此允许一定的误差
+        return abs(server_file_size - local_file_size) <= 0.05 * local_file_size
+
+    def parse_file_size(self, size: str) -> int:
+        """
+        解析蓝奏云文件列表中形如 26.5 M 的文件大小，返回大致的字节数，无法解析时返回-1
+        """
+        match = re.match(self.regex_file_size, size.replace(",", "").strip())
+        if match is None:
+            return -1
+
+        number, unit = match.groups()
+        return int(float(number) * self.file_size_unit_to_bytes[unit.upper()])
+
+    def make_content_md5_desc(self, content_md5: str) -> str:
+        return f"md5={content_md5}"
+
+    def parse_content_md5_from_desc(self, desc: str) -> str:
+        match = re.search(self.regex_content_md5, desc)
+        if match is None:
+            return ""
+
+        return match.group(1)
+
     def get_compressed_version_filename(self, filename: str) -> str:
         return f"{self.compressed_version_prefix}{filename}{self.compressed_version_suffix}"
 
@@ -171,8 +270,7 @@ class Uploader:
         """
         查找最新版本，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
-        for file in folder_info.files:
+        for file in self.get_folder_files(self.folder_djc_helper):
             if file.name.startswith(self.history_version_prefix):
                 return file
 
@@ -202,8 +300,7 @@ class Uploader:
         """
         查找最新版本的补丁，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
-        for file in folder_info.files:
+        for file in self.get_folder_files(self.folder_djc_helper):
             if file.name.startswith(self.history_patches_prefix):
                 return file
 
@@ -219,13 +316,42 @@ class Uploader:
         """
         查找最新版本dlc，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
-        for file in folder_info.files:
+        for file in self.get_folder_files(self.folder_djc_helper):
             if file.name.startswith(self.history_dlc_version_prefix):
                 return file
 
         raise FileNotFoundError("latest version not found")
 
+    def download_latest_manifest(self, download_dir) -> str:
+        """
+        下载最新版本的文件清单到指定目录，并返回其完整路径
+        """
+        return self.download_file(self.find_latest_manifest(), download_dir)
+
+    def find_latest_manifest(self) -> FileInFolder:
+        """
+        查找最新版本的文件清单，如找到，返回lanzouyun提供的file信息，否则抛出异常
+        """
+        for file in self.get_folder_files(self.folder_djc_helper):
+            if file.name.startswith(self.history_manifest_prefix):
+                return file
+
+        raise FileNotFoundError("latest manifest not found")
+
+    def get_durl(self, fileinfo: FileInFolder) -> str:
+        """
+        获取文件的下载直链
+        """
+        for possiable_url in self.all_possiable_urls(fileinfo.url):
+            durl_info = self.lzy.get_durl_by_url(possiable_url)
+            if durl_info.code != LanZouCloud.SUCCESS:
+                logger.debug(f"请求{possiable_url}失败，将尝试下一个")
+                continue
+
+            return durl_info.durl
+
+        raise Exception(f"获取 {fileinfo.name} 的下载直链失败")
+
     def download_file_in_folder(self, folder: Folder, name: str, download_dir: str, overwrite=True, show_log=True, try_compressed_version_first=False, cache_max_seconds=600, download_only_if_server_version_is_newer=True) -> str:
         """
         下载网盘指定文件夹的指定文件到本地指定目录，并返回最终本地文件的完整路径
@@ -281,12 +407,59 @@ class Uploader:
         """
         在对应目录查找指定名称的文件，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(folder.url, folder.password)
-        for file in folder_info.files:
-            if file.name == name:
-                return file
+        file = self.get_folder_index(folder).get(name)
+        if file is None:
+            raise FileNotFoundError(f"file={name} not found in folder={folder.name}")
 
-        raise FileNotFoundError(f"file={name} not found in folder={folder.name}")
+        return file
+
+    def get_folder_files(self, folder: Folder) -> List[FileInFolder]:
+        """
+        获取目录下的全部文件，按网盘返回的顺序（最近上传的在前）排列，结果会缓存一段时间
+        """
+
+        def _fetch() -> List[FileInFolder]:
+            folder_info = self.get_folder_info_by_url(folder.url, folder.password)
+            if folder_info.code != LanZouCloud.SUCCESS:
+                raise Exception(f"获取目录 {folder.name} 的文件列表失败，code={folder_info.code}")
+
+            return list(folder_info.files)
+
+        raw_files = with_cache(cache_name_lanzou_folder_index, folder.url, _fetch, cache_max_seconds=self.folder_index_cache_seconds,
+                               cache_validate_func=lambda files: type(files) is list)
+        if type(raw_files) is not list:
+            return []
+
+        return [FileInFolder(*file) for file in raw_files]
+
+    def get_folder_index(self, folder: Folder) -> Dict[str, FileInFolder]:
+        """
+        获取目录下 文件名 => 文件信息 的索引，同名文件以最近上传的为准
+        """
+        index = {}
+        for file in self.get_folder_files(folder):
+            index.setdefault(file.name, file)
+
+        return index
+
+    def iter_folder_pages(self, folder: Folder, max_page=100) -> Iterator[List[FileInFolder]]:
+        """
+        按页依次返回目录下的文件列表，每批会同时请求多页，调用方停止迭代后将不再请求后续的页
+        """
+
+        def _get_page(page: int) -> List[FileInFolder]:
+            folder_info = self.get_folder_info_by_url(folder.url, folder.password, get_this_page=page)
+            return list(folder_info.files or [])
+
+        with ThreadPoolExecutor(self.folder_pages_concurrency) as pool:
+            for batch_start in range(1, max_page + 1, self.folder_pages_concurrency):
+                pages = range(batch_start, min(batch_start + self.folder_pages_concurrency, max_page + 1))
+                for files in pool.map(_get_page, pages):
+                    if len(files) == 0:
+                        # 已经没有更多文件了
+                        return
+
+                    yield files
 
     def download_file(self, fileinfo: FileInFolder, download_dir: str, overwrite=True, show_log=True, download_only_if_server_version_is_newer=True) -> str:
         """
@@ -311,6 +484,11 @@ class Uploader:
                 get_log_func(logger.info, show_log)(color("bold_cyan") + f"当前设置了对比修改时间参数，网盘中最新版本 {fileinfo.name} 上传于{server_version_upload_time}左右，在当前版本{local_version_last_modify_time}之前，无需重新下载")
                 return target_path.value
 
+        if os.path.isfile(target_path.value) and self.need_check_content_md5(fileinfo, target_path.value) and self.is_same_content_as_local_file(fileinfo, target_path.value):
+            # 内容完全一致时，无论网盘中的版本是否更新，都无需重新下载
+            get_log_func(logger.info, show_log)(color("bold_cyan") + f"网盘中的 {fileinfo.name} 与本地文件md5一致，无需重新下载")
+            return target_path.value
+
         def after_downloaded(file_name):
             """下载完成后的回调函数"""
             target_path.value = file_name
@@ -1,21 +1,43 @@
 # 使用次数统计脚本
+import atexit
+import multiprocessing
+import multiprocessing.util
 import os
-from typing import Any
-
-import leancloud
-import leancloud.object_
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List
 
 import ga
 import ga4
+from db import UsageReportSpoolDB
 from first_run import is_daily_first_run
 from log import logger
-from util import async_call, get_today, try_except
+from util import get_today, try_except
 
 LEAN_CLOUD_SERVER_ADDR = "https://d02na0oe.lc-cn-n1-shared.com"
 LEAN_CLOUD_APP_ID = "D02NA0OEBGXu0YqwpVQYUNl3-gzGzoHsz"
 LEAN_CLOUD_APP_KEY = "LAs9VtM5UtGHLksPzoLwuCvx"
 
-leancloud.init(LEAN_CLOUD_APP_ID, LEAN_CLOUD_APP_KEY)
+_leancloud_lock = threading.Lock()
+_leancloud_inited = False
+
+
+def get_leancloud():
+    """
+    leancloud 导入较慢，且只有上报和查询计数时才会用到，因此在首次用到时再导入并初始化，而不是每个进程启动时都导入一遍
+    """
+    global _leancloud_inited
+
+    import leancloud
+
+    with _leancloud_lock:
+        if not _leancloud_inited:
+            leancloud.init(LEAN_CLOUD_APP_ID, LEAN_CLOUD_APP_KEY)
+            _leancloud_inited = True
+
+    return leancloud
 
 
 def increase_counter(name: Any = "", report_to_lean_cloud=False, report_to_google_analytics=True, ga_type=ga.GA_REPORT_TYPE_EVENT, ga_category="", ga_misc_params: dict = None):
@@ -24,17 +46,245 @@ def increase_counter(name: Any = "", report_to_lean_cloud=False, report_to_googl
     if name == "":
         raise AssertionError("increase_counter name not set")
 
-    def _cb():
-        if report_to_lean_cloud and is_daily_first_run(name):
-            # lean_cloud的计数器每日最多上报一次
-            increase_counter_sync_lean_cloud(name)
+    # 统一交给后台的上报线程批量上报
+    usage_reporter.report({
+        "name": name,
+        "report_to_lean_cloud": report_to_lean_cloud,
+        "report_to_google_analytics": report_to_google_analytics,
+        "ga_type": ga_type,
+        "ga_category": ga_category,
+        "ga_misc_params": ga_misc_params,
+    })
 
-        if report_to_google_analytics:
-            increase_counter_sync_google_analytics(name, ga_type, ga_category, ga_misc_params)
+    # UNDONE: 增加自建的计数器上报
 
-        # UNDONE: 增加自建的计数器上报
 
-    async_call(_cb)
+class UsageReporter:
+    """
+    在单个后台线程中批量上报使用统计：谷歌分析使用批量接口，lean cloud使用批量操作
+    队列满时将丢弃新的统计，上报失败时暂存到本地，下次启动时再补报，退出时最多等待一定时长来上报剩余的统计
+    """
+
+    def __init__(self, max_queue_size=1000, batch_max_size=50, batch_max_wait_seconds=1.0, max_spool_size=2000, spool_context="global"):
+        self.max_queue_size = max_queue_size
+        self.batch_max_size = batch_max_size
+        self.batch_max_wait_seconds = batch_max_wait_seconds
+        self.max_spool_size = max_spool_size
+        self.spool_context = spool_context
+
+        self.queue = queue.Queue(max_queue_size)  # type: queue.Queue
+        self.lock = threading.Lock()
+        self.thread = None  # type: threading.Thread
+        self.stopping = threading.Event()
+
+        # 统计信息
+        self.reported_count = 0
+        self.dropped_count = 0
+        self.sent_count = 0
+        self.spooled_count = 0
+
+    def report(self, hit: Dict[str, Any]):
+        self.ensure_started()
+
+        try:
+            self.queue.put_nowait(hit)
+            with self.lock:
+                self.reported_count += 1
+        except queue.Full:
+            with self.lock:
+                self.dropped_count += 1
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> str:
+        return f"已提交={self.reported_count} 已上报={self.sent_count} 队列中={self.queue_depth()} 暂存到本地={self.spooled_count} 丢弃={self.dropped_count}"
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+
+            self.thread = threading.Thread(target=self._run, name="usage_reporter", daemon=True)
+            self.thread.start()
+            if is_main_process():
+                atexit.register(self.close)
+            else:
+                # 进程池中的进程退出时不会执行atexit注册的函数，而是执行multiprocessing的finalizer，因此需要在这里注册，确保在进程正常退出前上报或暂存剩余的统计
+                multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+
+    def close(self, timeout=3.0):
+        """
+        通知上报线程将队列中剩余的统计上报完毕后退出，最多等待timeout秒，超时仍未上报的统计将暂存到本地
+        """
+        if self.thread is None:
+            return
+
+        self.stopping.set()
+        self.thread.join(timeout)
+
+        remaining_hits = []
+        while True:
+            try:
+                remaining_hits.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if len(remaining_hits) != 0:
+            payload = self.make_payload(remaining_hits)
+            for key, items in payload.items():
+                self.spool(key, items)
+
+        logger.debug(f"使用统计上报线程已停止，{self.stats()}")
+
+    def _run(self):
+        # 先尝试补报之前上报失败而暂存到本地的统计，仅由主进程负责，避免进程池中的各个进程重复补报
+        if is_main_process():
+            self.flush_spool()
+
+        while not self.stopping.is_set() or not self.queue.empty():
+            hits = self.collect_batch()
+            if len(hits) != 0:
+                self.send_payload(self.make_payload(hits))
+
+    def collect_batch(self) -> List[Dict[str, Any]]:
+        hits = []
+
+        deadline = time.time() + self.batch_max_wait_seconds
+        while len(hits) < self.batch_max_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+
+            try:
+                hits.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return hits
+
+    def make_payload(self, hits: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        payload = {
+            "ga_hits": [],
+            "ga4_events": [],
+            "lean_cloud_names": [],
+        }  # type: Dict[str, List[Any]]
+
+        for hit in hits:
+            name = hit["name"]
+
+            if hit["report_to_lean_cloud"] and is_daily_first_run(name):
+                # lean_cloud的计数器每日最多上报一次
+                payload["lean_cloud_names"].append(name)
+
+            if hit["report_to_google_analytics"]:
+                ga_hit, ga4_event = make_google_analytics_hit(name, hit["ga_type"], hit["ga_category"], hit["ga_misc_params"])
+                if ga_hit is not None:
+                    payload["ga_hits"].append(ga_hit)
+                    payload["ga4_events"].append(ga4_event)
+
+        return payload
+
+    def send_payload(self, payload: Dict[str, List[Any]]):
+        senders = {
+            "ga_hits": (ga.send_hits, ga.GA_BATCH_MAX_HITS),
+            "ga4_events": (ga4.send_events, ga4.GA_MAX_EVENTS_PER_REQUEST),
+            "lean_cloud_names": (increase_counters_sync_lean_cloud, len(payload["lean_cloud_names"])),
+        }
+
+        for key, (send_func, batch_size) in senders.items():
+            items = payload[key]
+            for start in range(0, len(items), max(batch_size, 1)):
+                batch = items[start:start + batch_size]
+                try:
+                    send_func(batch)
+                    with self.lock:
+                        self.sent_count += len(batch)
+                except Exception as e:
+                    logger.debug(f"上报 {key} 失败，将暂存到本地，稍后再补报", exc_info=e)
+                    self.spool(key, items[start:])
+                    break
+
+    def spool(self, key: str, items: List[Any]):
+        if len(items) == 0:
+            return
+
+        def _update(db: UsageReportSpoolDB):
+            spooled = getattr(db, key)  # type: List[Any]
+            spooled.extend(items)
+
+            overflow = len(spooled) - self.max_spool_size
+            if overflow > 0:
+                # 暂存过多时，丢弃最早的那部分
+                del spooled[:overflow]
+                with self.lock:
+                    self.dropped_count += overflow
+
+        UsageReportSpoolDB().with_context(self.spool_context).update(_update)
+
+        with self.lock:
+            self.spooled_count += len(items)
+
+    def flush_spool(self):
+        if UsageReportSpoolDB().with_context(self.spool_context).load().is_empty():
+            return
+
+        def _claim(db: UsageReportSpoolDB) -> Dict[str, List[Any]]:
+            # 在数据库的文件锁内取出并清空暂存的统计，确保同时运行的多个实例中只有一个会补报这部分统计
+            payload = {
+                "ga_hits": db.ga_hits,
+                "ga4_events": db.ga4_events,
+                "lean_cloud_names": db.lean_cloud_names,
+            }
+            db.ga_hits, db.ga4_events, db.lean_cloud_names = [], [], []
+            return payload
+
+        payload = UsageReportSpoolDB().with_context(self.spool_context).update(_claim)
+        if all(len(items) == 0 for items in payload.values()):
+            return
+
+        logger.debug(f"尝试补报之前暂存的统计，数目为 {[len(items) for items in payload.values()]}")
+
+        # 补报再次失败的部分会重新暂存
+        self.send_payload(payload)
+
+
+def is_main_process() -> bool:
+    return multiprocessing.parent_process() is None
+
+
+usage_reporter = UsageReporter()
+
+
+def increase_counters_sync_lean_cloud(names: List[str]):
+    """
+    使用一次查询找出所有相关的计数器，然后通过批量操作一次性保存所有计数器的增量
+    """
+    logger.debug(f"report to lean cloud, names = {names}")
+    name_to_count = Counter(names)
+
+    leancloud = get_leancloud()
+    CounterClass = leancloud.Object.extend("CounterClass")
+    query = CounterClass.query
+    query.contained_in('name', list(name_to_count.keys()))
+    query.contained_in('time_period', time_periods)
+    query.limit(1000)
+    existing_counters = {(counter.get('name'), counter.get('time_period')): counter for counter in query.find()}
+
+    counters = []
+    for name, count in name_to_count.items():
+        for time_period in time_periods:
+            counter = existing_counters.get((name, time_period))
+            if counter is None:
+                counter = CounterClass()  # type: leancloud.Object
+                counter.set('name', name)
+                counter.set('time_period', time_period)
+                counter.set('count', 0)
+
+            counter.increment('count', count)
+            counters.append(counter)
+
+    leancloud.Object.save_all(counters)
 
 
 @try_except(show_exception_info=False)
@@ -50,6 +300,18 @@ def increase_counter_sync_google_analytics(name: str, ga_type: str, ga_category:
     #  上报谷歌分析（v3和v4同时上报）
     logger.debug(f"report to google analytics(v3 and v4), name = {name}")
 
+    ga_hit, ga4_event = make_google_analytics_hit(name, ga_type, ga_category, ga_misc_params)
+    if ga_hit is None:
+        return
+
+    ga.send_hits([ga_hit])
+    ga4.send_events([ga4_event])
+
+
+def make_google_analytics_hit(name: str, ga_type: str, ga_category: str, ga_misc_params: dict):
+    """
+    返回 [谷歌分析v3的hit, 谷歌分析v4的事件]，若类型未知，则均为None
+    """
     if ga_type == ga.GA_REPORT_TYPE_EVENT:
         if ga_category == "":
             # 如果ga_category为空，则尝试从name中解析，假设name中以/分隔的第一个部分作为ga_category
@@ -58,13 +320,12 @@ def increase_counter_sync_google_analytics(name: str, ga_type: str, ga_category:
                 ga_category, name = parts
             else:
                 ga_category = "counter"
-        ga.track_event(ga_category, name, ga_misc_params)
-        ga4.track_event(ga_category, name)
+        return ga.make_event_hit(ga_category, name, ga_misc_params=ga_misc_params), ga4.make_event(ga_category, name)
     elif ga_type == ga.GA_REPORT_TYPE_PAGE_VIEW:
-        ga.track_page(name, ga_misc_params)
-        ga4.track_event("page_view", name)
+        return ga.make_page_hit(name, ga_misc_params), ga4.make_event("page_view", name)
     else:
         logger.error(f"unknow ga_type={ga_type}")
+        return None, None
 
 
 time_periods = ["all", get_today()]
@@ -86,6 +347,7 @@ def get_count(name, time_period):
 
 @try_except(show_exception_info=False, return_val_on_except=0)
 def get_record_count_name_start_with(name_start_with, time_period):
+    leancloud = get_leancloud()
     CounterClass = leancloud.Object.extend("CounterClass")
     query = CounterClass.query
     query.startswith('name', name_start_with)
@@ -97,6 +359,7 @@ def get_counter(name, time_period):
     """
     获取指定计数器在指定时间段的计数实例
     """
+    leancloud = get_leancloud()
     CounterClass = leancloud.Object.extend("CounterClass")
     query = CounterClass.query
     query.equal_to('name', name)
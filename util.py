@@ -19,13 +19,13 @@ import time
 import traceback
 import uuid
 import webbrowser
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
 from typing import Callable, Optional
 from urllib import parse
 
 import psutil
 import requests.exceptions
-import selenium.common.exceptions
 import toml
 import urllib3.exceptions
 
@@ -421,7 +421,8 @@ def check_some_exception(e: Exception, show_last_process_result=True) -> str:
                      urllib3.exceptions.ConnectTimeoutError, urllib3.exceptions.MaxRetryError, urllib3.exceptions.ReadTimeoutError,
                      requests.exceptions.ConnectTimeout, requests.exceptions.ReadTimeout, ]:
         msg += format_msg("网络超时了，一般情况下是因为网络问题，也有可能是因为对应网页的服务器不太行，多试几次就好了<_<")
-    elif type(e) in [selenium.common.exceptions.TimeoutException, ]:
+    elif type(e).__name__ == "TimeoutException" and type(e).__module__ == "selenium.common.exceptions":
+        # selenium 仅在登录时才会按需导入，因此这里通过名称判断，避免为此导入selenium
         msg += format_msg("浏览器等待对应元素超时了，很常见的。如果一直超时导致无法正常运行，可去config.example.toml将登录超时相关配置加到config.toml中，并调大超时时间")
     elif type(e) in [PermissionError, ]:
         msg += format_msg((
@@ -493,6 +494,34 @@ def async_call(cb, *args, **params):
     threading.Thread(target=cb, args=args, kwargs=params, daemon=True).start()
 
 
+# 在后台预先发起的请求，名称 -> 对应的Future
+_prefetch_futures = {}  # type: Dict[str, Future]
+_prefetch_executor = ThreadPoolExecutor(thread_name_prefix="prefetch")
+
+
+def prefetch_in_background(name: str, func: Callable, *args, **params):
+    """
+    在后台线程中预先调用func，之后需要用到其结果的地方通过 wait_prefetch 等待这个已经在进行中的调用即可，无需再串行地重新请求一遍
+    """
+    logger.debug(f"开始在后台预取 {name}")
+    _prefetch_futures[name] = _prefetch_executor.submit(func, *args, **params)
+
+
+def wait_prefetch(name: str, default: Any = None) -> Any:
+    """
+    等待名为name的预取完成并返回其结果，若未发起过该预取或预取时出错，则返回default
+    """
+    future = _prefetch_futures.get(name)
+    if future is None:
+        return default
+
+    try:
+        return future.result()
+    except Exception as e:
+        logger.debug(f"预取 {name} 时出错了", exc_info=e)
+        return default
+
+
 def async_message_box(msg, title, print_log=True, icon=MB_ICONINFORMATION, open_url="", show_once=False, follow_flag_file=True, color_name="bold_cyan"):
     async_call(message_box, msg, title, print_log, icon, open_url, show_once, follow_flag_file, color_name)
 
@@ -726,6 +755,8 @@ def remove_none_from_list(vlist: list) -> list:
 _root_caches_key = "caches"
 cache_name_download = "download_cache"
 cache_name_user_buy_info = "user_buy_info"
+cache_name_shared_response = "shared_response"
+cache_name_lanzou_folder_index = "lanzou_folder_index"
 
 
 def with_cache(cache_category: str, cache_key: str, cache_miss_func: Callable[[], Any], cache_validate_func: Optional[Callable[[Any], bool]] = None, cache_max_seconds=600, force_update=False):